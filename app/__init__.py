@@ -3,6 +3,22 @@ from flask_migrate import Migrate
 from flask_bcrypt import Bcrypt
 from flask_cors import CORS
 from app.models import db
+from app import sqlite_pragmas
+from app.metrics import metrics
+from app.timing import server_timing
+from app.query_stats import query_instrumentation
+from app.neighbors import neighbor_table
+from app.probing import fleet_prober
+from app.poller import status_poller
+from app.events import event_broker
+from app.jobs import wake_job_worker
+from app.token_cache import token_cache
+from app.permissions import permission_index
+from app.versions import fleet_version, state_version
+from app.passwords import password_hasher
+from app.throttle import login_throttle
+from app.history import probe_history
+from app.usage import usage_rollups
 from config import config
 
 migrate = Migrate()
@@ -12,9 +28,27 @@ def create_app(config_name='default'):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
     
+    sqlite_pragmas.configure_pool(app)
     db.init_app(app)
+    sqlite_pragmas.init_app(app)
+    metrics.init_app(app)
+    server_timing.init_app(app)
+    query_instrumentation.init_app(app)
     migrate.init_app(app, db)
     bcrypt.init_app(app)
+    neighbor_table.init_app(app)
+    fleet_prober.init_app(app)
+    status_poller.init_app(app)
+    event_broker.init_app(app)
+    wake_job_worker.init_app(app)
+    token_cache.init_app(app)
+    permission_index.init_app(app)
+    fleet_version.init_app(app)
+    state_version.init_app(app)
+    password_hasher.init_app(app)
+    login_throttle.init_app(app)
+    probe_history.init_app(app)
+    usage_rollups.init_app(app)
     CORS(app)
     
     from app.auth import auth
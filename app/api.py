@@ -1,12 +1,27 @@
-from flask import Blueprint, request, jsonify, session
-from flask_bcrypt import Bcrypt
+from flask import Blueprint, Response, request, jsonify, session
 from functools import wraps
-from wakeonlan import send_magic_packet
-from app.models import User, Equipo, db
-from app.utils import obtenerPorMac, ping
+from app.models import User, Equipo, WakeJob, db, user_equipos
+from app.poller import refresh_requested, status_poller
+from app.events import event_broker
+from app.wol import send_magic_packets
+from app.jobs import wake_job_worker
+from app.token_cache import token_cache
+from app.permissions import permission_index
+from app.passwords import PasswordHasherBusy, password_hasher
+from app.throttle import login_throttle
+from app.versions import deleted_pairs, fleet_etag, fleet_version, not_modified
+from app.assignments import MODOS, EquiposInexistentes, set_user_equipos
+from app.history import epoch, iso, parse_instante_arg, probe_history
+from app.usage import AGRUPACIONES, parse_dia_arg, usage_rollups
+from app.inventory import FORMATOS, InventarioInvalido, detect_format, import_equipos, parse_inventory
+from app.pagination import ParametroInvalido, paginate_keyset, parse_fields, parse_int_arg, select_fields
+from app.timing import span
+from app.query_stats import query_budget
 from app.auth_middleware import token_required, admin_required, can_access_equipo
 import jwt
 import datetime
+import io
+import math
 from flask import current_app
 
 # Importar excepciones JWT correctas para PyJWT
@@ -25,7 +40,12 @@ except ImportError:
             pass
 
 api = Blueprint('api', __name__, url_prefix='/api')
-bcrypt = Bcrypt()
+
+# Campos seleccionables con ?fields= en los listados
+EQUIPO_FIELDS = ('id', 'nombre', 'descripcion', 'mac_address', 'ip_address',
+                 'estado', 'rtt_ms', 'checked_at', 'stale')
+EQUIPO_STATE_FIELDS = {'ip_address', 'estado', 'rtt_ms', 'checked_at', 'stale'}
+USER_FIELDS = ('id', 'username', 'role', 'equipos_count')
 
 def generate_token(user_id):
     """Generar token JWT para el usuario"""
@@ -41,25 +61,41 @@ def generate_token(user_id):
 
 def verify_token(token):
     """Verificar token JWT y retornar usuario"""
+    cached_user = token_cache.get(token)
+    if cached_user:
+        return cached_user
     try:
         payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
         user_id = payload['user_id']
-        return User.query.get(user_id)
+        user = User.query.get(user_id)
+        if user:
+            token_cache.put(token, payload, user)
+        return user
     except ExpiredSignatureError:
         return None
     except InvalidTokenError:
         return None
 
+def get_request_token(allow_query=False):
+    """Obtiene el token del header Authorization (o de ?token= si se permite)"""
+    auth_header = request.headers.get('Authorization')
+    if auth_header and auth_header.startswith('Bearer '):
+        return auth_header.split(' ')[1]
+    if allow_query:
+        # EventSource no permite enviar headers personalizados
+        return request.args.get('token')
+    return None
+
 def api_auth_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         # Verificar token en header
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
+        token = get_request_token(allow_query=getattr(f, 'allow_query_token', False))
+        if not token:
             return jsonify({'error': 'No autorizado', 'message': 'Se requiere token de autenticación'}), 401
         
-        token = auth_header.split(' ')[1]
-        current_user = verify_token(token)
+        with span('auth'):
+            current_user = verify_token(token)
         
         if not current_user:
             return jsonify({'error': 'Token inválido', 'message': 'Token expirado o inválido'}), 401
@@ -67,6 +103,11 @@ def api_auth_required(f):
         return f(current_user, *args, **kwargs)
     return decorated_function
 
+def allow_query_token(f):
+    """Permite autenticar con ?token= (aplicar antes de api_auth_required)"""
+    f.allow_query_token = True
+    return f
+
 def api_admin_required(f):
     @wraps(f)
     def decorated_function(current_user, *args, **kwargs):
@@ -78,11 +119,25 @@ def api_admin_required(f):
 def api_can_access_equipo(f):
     @wraps(f)
     def decorated_function(current_user, equipo_id, *args, **kwargs):
-        if not current_user.is_admin() and not current_user.can_access_equipo(equipo_id):
+        with span('auth'):
+            permitido = current_user.is_admin() or current_user.can_access_equipo(equipo_id)
+        if not permitido:
             return jsonify({'error': 'Acceso denegado', 'message': 'No tiene permisos para acceder a este equipo'}), 403
         return f(current_user, equipo_id, *args, **kwargs)
     return decorated_function
 
+def respuesta_saturada():
+    """503 cuando el pool de contraseñas no admite más trabajo"""
+    response = jsonify({'error': 'Servicio saturado', 'message': 'Demasiados inicios de sesión simultáneos, reintente en unos segundos'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+def respuesta_limitada(espera):
+    """429 para intentos de login por encima del límite"""
+    response = jsonify({'error': 'Demasiados intentos', 'message': 'Demasiados intentos de inicio de sesión, reintente más tarde'})
+    response.headers['Retry-After'] = str(math.ceil(espera))
+    return response, 429
+
 @api.route('/auth/login', methods=['POST'])
 def api_login():
     try:
@@ -96,8 +151,14 @@ def api_login():
         if not username or not password:
             return jsonify({'error': 'Datos faltantes', 'message': 'Se requieren usuario y contraseña'}), 400
         
-        user = User.query.filter_by(username=username).first()
-        if user and bcrypt.check_password_hash(user.password, password):
+        # Antes de bcrypt: los intentos excedidos no consumen CPU
+        espera = login_throttle.check(request.remote_addr, username)
+        if espera:
+            return respuesta_limitada(espera)
+        
+        user = User.by_username(username).first()
+        if user and password_hasher.check_user(user, password):
+            login_throttle.success(request.remote_addr, username)
             token = generate_token(user.id)
             if token:
                 return jsonify({
@@ -109,8 +170,11 @@ def api_login():
             else:
                 return jsonify({'error': 'Error interno', 'message': 'No se pudo generar el token'}), 500
         else:
+            login_throttle.failure(request.remote_addr, username)
             return jsonify({'error': 'Credenciales inválidas', 'message': 'Usuario o contraseña incorrectos'}), 401
     
+    except PasswordHasherBusy:
+        return respuesta_saturada()
     except Exception as e:
         return jsonify({'error': 'Error interno', 'message': str(e)}), 500
 
@@ -144,7 +208,7 @@ def api_register():
         if existing_user:
             return jsonify({'error': 'Usuario existente', 'message': 'El nombre de usuario ya está en uso'}), 409
         
-        hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
+        hashed_password = password_hasher.hash(password)
         new_user = User(username=username, password=hashed_password, role='user')
         db.session.add(new_user)
         db.session.commit()
@@ -158,42 +222,137 @@ def api_register():
             }
         }), 201
     
+    except PasswordHasherBusy:
+        return respuesta_saturada()
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'Error interno', 'message': str(e)}), 500
 
+def usa_version_flota():
+    """
+    El ETag solo es válido cuando el estado lo mantiene el poller: sin él
+    (o con ?refresh=true) cada request sondea y el resultado puede cambiar.
+    """
+    return status_poller.running and not refresh_requested()
+
+def respuesta_no_modificada(etag):
+    response = Response(status=304)
+    response.set_etag(etag, weak=True)
+    return response
+
 @api.route('/equipos', methods=['GET'])
+@query_budget(7)
 @api_auth_required
 def api_get_equipos(current_user):
     """Obtiene equipos según permisos del usuario"""
+    try:
+        campos = parse_fields(EQUIPO_FIELDS)
+        usuario_id = parse_int_arg('usuario')
+        con_estado = campos is None or bool(campos & EQUIPO_STATE_FIELDS)
+        
+        # Sin cambios desde la última respuesta: 304 sin consultar ni sondear
+        usar_etag = usa_version_flota()
+        if usar_etag and not_modified(fleet_etag(current_user, estado=con_estado)):
+            return respuesta_no_modificada(fleet_etag(current_user, estado=con_estado))
+        
+        query = Equipo.listing_query(
+            current_user, usuario_id=usuario_id,
+            estado=request.args.get('estado'), nombre=request.args.get('nombre')
+        )
+        
+        equipos, next_cursor, total = paginate_keyset(query, Equipo.id)
+        
+        # Solo se sondea la página pedida, y solo si se pidieron campos de estado
+        if con_estado:
+            resultados = status_poller.serialize_equipos(equipos, refresh=refresh_requested())
+        else:
+            resultados = [equipo.serialize() for equipo in equipos]
+        
+        response = jsonify({
+            'success': True,
+            'equipos': [select_fields(data, campos) for data in resultados],
+            'total': total,
+            'next_cursor': next_cursor,
+            'user_role': current_user.role
+        })
+        if usar_etag:
+            response.set_etag(fleet_etag(current_user, estado=con_estado), weak=True)
+        return response, 200
+    
+    except ParametroInvalido as e:
+        return jsonify({'error': 'Parámetro inválido', 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': 'Error interno', 'message': str(e)}), 500
+
+@api.route('/equipos/stream', methods=['GET'])
+@query_budget(2)
+@api_auth_required
+@allow_query_token
+def api_stream_equipos(current_user):
+    """
+    Stream SSE con los cambios de estado de los equipos permitidos. Cada
+    pedido responde enseguida con los eventos pendientes y el cliente
+    reconecta tras `retry`: ningún hilo queda esperando eventos.
+    """
     try:
         if current_user.is_admin():
-            # Admin ve todos los equipos
-            equipos = Equipo.query.all()
+            equipo_ids = None
         else:
-            # Usuario normal solo ve equipos asignados
-            equipos = current_user.get_equipos_permitidos()
+            equipo_ids = permission_index.equipo_ids(current_user.id)
         
-        # Enriquecer con información de estado
-        resultados = []
-        for equipo in equipos:
-            direccion_ip = obtenerPorMac(equipo.mac_address)
-            estado = "desconocido"
-            
-            if direccion_ip:
-                estado = "encendido" if ping(direccion_ip) else "apagado"
-                equipo.ip_address = direccion_ip
-                equipo.estado = estado
-            
-            resultados.append(equipo.serialize())
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        try:
+            last_event_id = int(last_event_id) if last_event_id else None
+        except ValueError:
+            last_event_id = None
+        
+        response = Response(event_broker.poll(last_event_id, equipo_ids=equipo_ids), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    
+    except Exception as e:
+        return jsonify({'error': 'Error interno', 'message': str(e)}), 500
+
+@api.route('/equipos/changes', methods=['GET'])
+@query_budget(5)
+@api_auth_required
+def api_get_equipos_changes(current_user):
+    """Cambios visibles para el usuario desde ?since=<version>"""
+    try:
+        since = parse_int_arg('since', minimo=0)
+        version, cambios = fleet_version.changes_since(since)
+        
+        query = Equipo.listing_query(current_user)
+        
+        if cambios is None:
+            # El log no cubre `since`: listado completo
+            equipos = query.order_by(Equipo.id).all()
+            eliminados = []
+        else:
+            ids = {equipo_id for equipo_id, _, _ in cambios}
+            equipos = query.filter(Equipo.id.in_(ids)).order_by(Equipo.id).all() if ids else []
+            vigentes = {equipo.id for equipo in equipos}
+            if current_user.is_admin():
+                eliminados = ids - vigentes
+            else:
+                # Solo bajas y desasignaciones de equipos que el usuario tenía
+                # asignados: no revelar otros equipos
+                eliminados = {
+                    equipo_id for equipo_id, user_id, tipo in cambios
+                    if equipo_id not in vigentes and user_id == current_user.id and
+                    tipo in ('delete', 'unassign')
+                }
         
         return jsonify({
             'success': True,
-            'equipos': resultados,
-            'total': len(resultados),
-            'user_role': current_user.role
+            'version': version,
+            'snapshot': cambios is None,
+            'equipos': status_poller.serialize_equipos(equipos),
+            'deleted': sorted(eliminados)
         }), 200
     
+    except ParametroInvalido as e:
+        return jsonify({'error': 'Parámetro inválido', 'message': str(e)}), 400
     except Exception as e:
         return jsonify({'error': 'Error interno', 'message': str(e)}), 500
 
@@ -216,7 +375,7 @@ def api_create_equipo(current_user):
         if not all(c in '0123456789ABCDEF:' for c in mac_address) or len(mac_address.replace(':', '')) != 12:
             return jsonify({'error': 'MAC inválida', 'message': 'Formato de dirección MAC inválido'}), 400
         
-        existing_equipo = Equipo.query.filter_by(mac_address=mac_address).first()
+        existing_equipo = Equipo.by_mac(mac_address).first()
         if existing_equipo:
             return jsonify({'error': 'MAC duplicada', 'message': 'Ya existe un equipo con esta dirección MAC'}), 409
         
@@ -229,7 +388,10 @@ def api_create_equipo(current_user):
         )
         
         db.session.add(nuevo_equipo)
+        db.session.flush()
+        version_flota = fleet_version.bump(upserts=[nuevo_equipo.id])
         db.session.commit()
+        fleet_version.confirm(version_flota)
         
         return jsonify({
             'success': True,
@@ -241,24 +403,69 @@ def api_create_equipo(current_user):
         db.session.rollback()
         return jsonify({'error': 'Error interno', 'message': str(e)}), 500
 
+@api.route('/equipos/import', methods=['POST'])
+@api_auth_required
+@api_admin_required
+def api_import_equipos(current_user):
+    """Importación masiva: archivo multipart 'file' o el cuerpo del request"""
+    try:
+        formato = request.args.get('formato')
+        if formato and formato not in FORMATOS:
+            return jsonify({'error': 'Parámetro inválido', 'message': f"formato debe ser uno de: {', '.join(FORMATOS)}"}), 400
+        
+        archivo = request.files.get('file')
+        if archivo:
+            stream, nombre_archivo = archivo.stream, archivo.filename
+        else:
+            # Cuerpo crudo: el tipo de contenido indica el formato
+            stream, nombre_archivo = request.stream, None
+            if not formato:
+                formato = {'text/csv': 'csv', 'application/json': 'json',
+                           'application/x-ndjson': 'json'}.get(request.mimetype)
+        
+        formato = detect_format(nombre_archivo, formato)
+        lineas = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        resultado = import_equipos(parse_inventory(lineas, formato))
+        
+        return jsonify({
+            'success': True,
+            'message': 'Importación completada',
+            **resultado
+        }), 200
+    
+    except InventarioInvalido as e:
+        return jsonify({'error': 'Archivo inválido', 'message': str(e)}), 400
+    except UnicodeDecodeError:
+        return jsonify({'error': 'Archivo inválido', 'message': 'El archivo debe estar en UTF-8'}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Error interno', 'message': str(e)}), 500
+
 @api.route('/equipos/<int:equipo_id>', methods=['GET'])
+@query_budget(6)
 @api_auth_required
 @api_can_access_equipo
 def api_get_equipo(current_user, equipo_id):
     try:
+        usar_etag = usa_version_flota()
+        if usar_etag and not_modified(fleet_etag(current_user, equipo_id)):
+            return respuesta_no_modificada(fleet_etag(current_user, equipo_id))
+        
         equipo = Equipo.query.get_or_404(equipo_id)
         include_users = current_user.is_admin()
         
-        # Actualizar estado en tiempo real
-        direccion_ip = obtenerPorMac(equipo.mac_address)
-        if direccion_ip:
-            equipo.ip_address = direccion_ip
-            equipo.estado = "encendido" if ping(direccion_ip) else "apagado"
+        # Estado persistido por el poller (o sondeo en vivo con ?refresh=true)
+        data = status_poller.serialize_equipos(
+            [equipo], refresh=refresh_requested(), include_users=include_users
+        )[0]
         
-        return jsonify({
+        response = jsonify({
             'success': True,
-            'equipo': equipo.serialize(include_users=include_users)
-        }), 200
+            'equipo': data
+        })
+        if usar_etag:
+            response.set_etag(fleet_etag(current_user, equipo_id), weak=True)
+        return response, 200
     
     except Exception as e:
         return jsonify({'error': 'Error interno', 'message': str(e)}), 500
@@ -281,7 +488,9 @@ def api_update_equipo(current_user, equipo_id):
         if 'ip_address' in data:
             equipo.ip_address = data['ip_address']
         
+        version_flota = fleet_version.bump(upserts=[equipo.id])
         db.session.commit()
+        fleet_version.confirm(version_flota)
         
         return jsonify({
             'success': True,
@@ -300,9 +509,17 @@ def api_delete_equipo(current_user, equipo_id):
     try:
         equipo = Equipo.query.get_or_404(equipo_id)
         nombre = equipo.nombre
+        # Antes del delete: la baja se registra para quienes tenían el equipo
+        bajas = deleted_pairs([equipo_id])
         
         db.session.delete(equipo)
+        probe_history.purge(equipo_id)
+        usage_rollups.purge_equipo(equipo_id)
+        version = permission_index.bump()
+        version_flota = fleet_version.bump(deletes=bajas)
         db.session.commit()
+        fleet_version.confirm(version_flota)
+        permission_index.apply(version, removed_equipos=[equipo_id])
         
         return jsonify({
             'success': True,
@@ -320,23 +537,105 @@ def api_wake_equipo(current_user, equipo_id):
     try:
         equipo = Equipo.query.get_or_404(equipo_id)
         
-        # Enviar paquete Wake-on-LAN
-        send_magic_packet(equipo.mac_address)
+        # Encolar trabajo: envío, reintentos y verificación en segundo plano
+        job = wake_job_worker.enqueue(equipo, current_user)
         
         # Log de la acción
-        print(f"Usuario {current_user.username} encendió equipo {equipo.nombre}")
+        current_app.logger.info(f"Usuario {current_user.username} encendió equipo {equipo.nombre} (job {job.id})")
         
         return jsonify({
             'success': True,
             'message': f'Comando de encendido enviado a {equipo.nombre}',
             'equipo_id': equipo_id,
+            'user': current_user.username,
+            'job': job.serialize()
+        }), 202
+    
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Error interno', 'message': str(e)}), 500
+
+@api.route('/equipos/encender-lote', methods=['POST'])
+@api_auth_required
+def api_wake_equipos_lote(current_user):
+    """Encender varios equipos con un solo request"""
+    try:
+        data = request.get_json()
+        if not data or not isinstance(data.get('ids'), list):
+            return jsonify({'error': 'Datos inválidos', 'message': 'Se requiere una lista de ids'}), 400
+        
+        try:
+            ids = list(dict.fromkeys(int(i) for i in data['ids']))
+            stagger_ms = int(data.get('stagger_ms', current_app.config['WOL_BATCH_STAGGER_MS']))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Datos inválidos', 'message': 'ids y stagger_ms deben ser enteros'}), 400
+        
+        if not ids:
+            return jsonify({'error': 'Datos faltantes', 'message': 'La lista de ids está vacía'}), 400
+        if len(ids) > current_app.config['WOL_BATCH_MAX_SIZE']:
+            return jsonify({
+                'error': 'Lote demasiado grande',
+                'message': f"Máximo {current_app.config['WOL_BATCH_MAX_SIZE']} equipos por lote"
+            }), 400
+        stagger_ms = max(0, min(stagger_ms, current_app.config['WOL_MAX_STAGGER_MS']))
+        # Las pausas ocupan el hilo del request: el total queda acotado
+        tope_ms = current_app.config['WOL_MAX_STAGGER_TOTAL_MS']
+        if stagger_ms * (len(ids) - 1) > tope_ms:
+            if 'stagger_ms' in data:
+                return jsonify({
+                    'error': 'Pausa demasiado larga',
+                    'message': f'stagger_ms * (equipos - 1) no puede superar {tope_ms} ms'
+                }), 400
+            # La pausa por defecto se reduce para que el lote entre en el tope
+            stagger_ms = tope_ms // (len(ids) - 1)
+        
+        # Permisos de todo el lote en una sola consulta
+        query = Equipo.query.filter(Equipo.id.in_(ids))
+        if not current_user.is_admin():
+            query = query.join(user_equipos, user_equipos.c.equipo_id == Equipo.id) \
+                         .filter(user_equipos.c.user_id == current_user.id)
+        permitidos = {equipo.id: equipo for equipo in query.all()}
+        
+        orden = [permitidos[i] for i in ids if i in permitidos]
+        envios = send_magic_packets([e.mac_address for e in orden], stagger_ms=stagger_ms)
+        errores = {equipo.id: error for equipo, (_, error) in zip(orden, envios)}
+        
+        resultados = []
+        for equipo_id in ids:
+            if equipo_id not in permitidos:
+                # No distinguir entre inexistente y sin permiso
+                resultados.append({'equipo_id': equipo_id, 'success': False, 'message': 'Acceso denegado'})
+            elif errores[equipo_id]:
+                resultados.append({'equipo_id': equipo_id, 'success': False, 'message': errores[equipo_id]})
+            else:
+                resultados.append({
+                    'equipo_id': equipo_id,
+                    'success': True,
+                    'message': f'Comando de encendido enviado a {permitidos[equipo_id].nombre}'
+                })
+        
+        enviados = sum(1 for r in resultados if r['success'])
+        ahora = datetime.datetime.utcnow()
+        for r in resultados:
+            if r['success']:
+                usage_rollups.record_wake(r['equipo_id'], current_user.id, ahora)
+        db.session.commit()
+        current_app.logger.info(f"Usuario {current_user.username} encendió {enviados} equipo(s) en lote")
+        
+        return jsonify({
+            'success': enviados > 0,
+            'resultados': resultados,
+            'enviados': enviados,
+            'fallidos': len(resultados) - enviados,
             'user': current_user.username
         }), 200
     
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': 'Error interno', 'message': str(e)}), 500
 
 @api.route('/equipos/<int:equipo_id>/estado', methods=['GET'])
+@query_budget(6)
 @api_auth_required
 @api_can_access_equipo
 def api_get_equipo_status(current_user, equipo_id):
@@ -344,16 +643,62 @@ def api_get_equipo_status(current_user, equipo_id):
         equipo = Equipo.query.get_or_404(equipo_id)
         
         # Verificar estado en tiempo real
-        direccion_ip = obtenerPorMac(equipo.mac_address)
-        if direccion_ip:
-            estado = "encendido" if ping(direccion_ip) else "apagado"
-            equipo.ip_address = direccion_ip
-            equipo.estado = estado
-            db.session.commit()
+        data = status_poller.serialize_equipos([equipo], refresh=True)[0]
         
         return jsonify({
             'success': True,
-            'equipo': equipo.serialize()
+            'equipo': data
+        }), 200
+    
+    except Exception as e:
+        return jsonify({'error': 'Error interno', 'message': str(e)}), 500
+
+@api.route('/equipos/<int:equipo_id>/historial', methods=['GET'])
+@query_budget(4)
+@api_auth_required
+@api_can_access_equipo
+def api_get_equipo_historial(current_user, equipo_id):
+    """Historial de sondeos en [from, to); por defecto las últimas 24 horas"""
+    try:
+        if db.session.get(Equipo, equipo_id) is None:
+            return jsonify({'error': 'Equipo no encontrado', 'message': f'No existe el equipo {equipo_id}'}), 404
+        
+        # Por defecto incluye las muestras del segundo actual
+        hasta = parse_instante_arg('to') or epoch(datetime.datetime.utcnow()) + 1
+        desde = parse_instante_arg('from')
+        if desde is None:
+            desde = hasta - 24 * 3600
+        if desde >= hasta:
+            raise ParametroInvalido('from debe ser anterior a to')
+        
+        resolucion, muestras = probe_history.query(equipo_id, desde, hasta)
+        
+        return jsonify({
+            'success': True,
+            'equipo_id': equipo_id,
+            'resolucion': resolucion,
+            'desde': iso(desde),
+            'hasta': iso(hasta),
+            'muestras': muestras
+        }), 200
+    
+    except ParametroInvalido as e:
+        return jsonify({'error': 'Parámetro inválido', 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': 'Error interno', 'message': str(e)}), 500
+
+@api.route('/jobs/<int:job_id>', methods=['GET'])
+@api_auth_required
+def api_get_job(current_user, job_id):
+    """Estado de un trabajo de encendido"""
+    try:
+        job = WakeJob.query.get_or_404(job_id)
+        if not current_user.is_admin() and job.user_id != current_user.id:
+            return jsonify({'error': 'Acceso denegado', 'message': 'No tiene permisos para ver este trabajo'}), 403
+        
+        return jsonify({
+            'success': True,
+            'job': job.serialize()
         }), 200
     
     except Exception as e:
@@ -373,12 +718,20 @@ def api_status():
             ],
             'equipos': [
                 'GET /api/equipos',
+                'GET /api/equipos/stream',
+                'GET /api/equipos/changes',
                 'POST /api/equipos',
+                'POST /api/equipos/import',
                 'GET /api/equipos/<id>',
                 'PUT /api/equipos/<id>',
                 'DELETE /api/equipos/<id>',
                 'POST /api/equipos/<id>/encender',
-                'GET /api/equipos/<id>/estado'
+                'POST /api/equipos/encender-lote',
+                'GET /api/equipos/<id>/estado',
+                'GET /api/equipos/<id>/historial'
+            ],
+            'jobs': [
+                'GET /api/jobs/<id>'
             ]
         }
     }), 200
@@ -388,17 +741,33 @@ def api_status():
 # ============================================================================
 
 @api.route('/admin/users', methods=['GET'])
+@query_budget(4)
 @api_auth_required
 @api_admin_required
 def api_get_all_users(current_user):
     """Obtiene todos los usuarios (solo admin)"""
     try:
-        users = User.query.all()
+        campos = parse_fields(USER_FIELDS)
+        
+        query = User.listing_query(role=request.args.get('role'), username=request.args.get('username'))
+        
+        if campos is None or 'equipos_count' in campos:
+            filas, next_cursor, total = paginate_keyset(
+                User.with_equipos_count(query), User.id, cursor=lambda fila: fila[0].id, contar=query
+            )
+            users = [user.serialize(equipos_count=count) for user, count in filas]
+        else:
+            filas, next_cursor, total = paginate_keyset(query, User.id)
+            users = [user.serialize(equipos_count=0) for user in filas]
+        
         return jsonify({
             'success': True,
-            'users': [user.serialize() for user in users],
-            'total': len(users)
+            'users': [select_fields(data, campos) for data in users],
+            'total': total,
+            'next_cursor': next_cursor
         })
+    except ParametroInvalido as e:
+        return jsonify({'error': 'Parámetro inválido', 'message': str(e)}), 400
     except Exception as e:
         return jsonify({'error': 'Error interno', 'message': str(e)}), 500
 
@@ -424,7 +793,7 @@ def api_create_user(current_user):
             }), 400
         
         # Crear usuario
-        hashed_password = bcrypt.generate_password_hash(data['password']).decode('utf-8')
+        hashed_password = password_hasher.hash(data['password'])
         nuevo_user = User(
             username=data['username'],
             password=hashed_password,
@@ -440,6 +809,8 @@ def api_create_user(current_user):
             'user': nuevo_user.serialize()
         }), 201
         
+    except PasswordHasherBusy:
+        return respuesta_saturada()
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'Error interno', 'message': str(e)}), 500
@@ -464,7 +835,7 @@ def api_assign_equipo_to_user(current_user):
         equipo = Equipo.query.get_or_404(equipo_id)
         
         # Verificar si ya está asignado
-        if equipo in user.equipos_asignados:
+        if permission_index.can_access(user.id, equipo.id):
             return jsonify({
                 'error': 'Equipo ya asignado',
                 'message': f'El equipo {equipo.nombre} ya está asignado a {user.username}'
@@ -475,7 +846,12 @@ def api_assign_equipo_to_user(current_user):
         
         # Los metadatos se pueden agregar directamente a la tabla user_equipos
         # por ahora solo hacemos la asignación básica
+        version = permission_index.bump()
+        version_flota = fleet_version.bump(assigned=[(user.id, equipo.id)])
         db.session.commit()
+        fleet_version.confirm(version_flota)
+        permission_index.apply(version, added=[(user.id, equipo.id)])
+        token_cache.invalidate_user(user.id)
         
         return jsonify({
             'success': True,
@@ -501,7 +877,7 @@ def api_unassign_equipo_from_user(current_user):
         user = User.query.get_or_404(user_id)
         equipo = Equipo.query.get_or_404(equipo_id)
         
-        if equipo not in user.equipos_asignados:
+        if not permission_index.can_access(user.id, equipo.id):
             return jsonify({
                 'error': 'Equipo no asignado',
                 'message': f'El equipo {equipo.nombre} no está asignado a {user.username}'
@@ -511,7 +887,12 @@ def api_unassign_equipo_from_user(current_user):
         user.equipos_asignados.remove(equipo)
         
         # Los metadatos se eliminan automáticamente con la relación
+        version = permission_index.bump()
+        version_flota = fleet_version.bump(unassigned=[(user.id, equipo.id)])
         db.session.commit()
+        fleet_version.confirm(version_flota)
+        permission_index.apply(version, removed=[(user.id, equipo.id)])
+        token_cache.invalidate_user(user.id)
         
         return jsonify({
             'success': True,
@@ -522,21 +903,92 @@ def api_unassign_equipo_from_user(current_user):
         db.session.rollback()
         return jsonify({'error': 'Error interno', 'message': str(e)}), 500
 
+@api.route('/admin/users/<int:user_id>/equipos', methods=['PUT'])
+@api_auth_required
+@api_admin_required
+def api_set_user_equipos(current_user, user_id):
+    """Asigna un conjunto de equipos a un usuario (solo admin)"""
+    try:
+        data = request.get_json()
+        if not data or not isinstance(data.get('equipo_ids'), list):
+            return jsonify({'error': 'Datos faltantes', 'message': 'equipo_ids debe ser una lista de ids'}), 400
+        
+        modo = data.get('mode', 'replace')
+        if modo not in MODOS:
+            return jsonify({'error': 'Datos inválidos', 'message': f"mode debe ser uno de: {', '.join(MODOS)}"}), 400
+        
+        if not all(isinstance(equipo_id, int) and not isinstance(equipo_id, bool) for equipo_id in data['equipo_ids']):
+            return jsonify({'error': 'Datos inválidos', 'message': 'equipo_ids debe contener enteros'}), 400
+        
+        user = db.session.get(User, user_id)
+        if not user:
+            return jsonify({'error': 'Usuario no encontrado', 'message': f'No existe el usuario {user_id}'}), 404
+        
+        agregados, quitados, actuales = set_user_equipos(user.id, data['equipo_ids'], modo)
+        
+        return jsonify({
+            'success': True,
+            'message': f'Asignaciones de {user.username} actualizadas',
+            'added': agregados,
+            'removed': quitados,
+            'equipo_ids': actuales
+        })
+    
+    except EquiposInexistentes as e:
+        return jsonify({'error': 'Equipo no encontrado', 'message': str(e), 'equipo_ids': e.ids}), 404
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Error interno', 'message': str(e)}), 500
+
+@api.route('/admin/reportes/uso', methods=['GET'])
+@query_budget(5)
+@api_auth_required
+@api_admin_required
+def api_reporte_uso(current_user):
+    """Horas encendido por equipo y encendidos por usuario, desde los acumulados diarios"""
+    try:
+        hasta = parse_dia_arg('to') or datetime.datetime.utcnow().date()
+        desde = parse_dia_arg('from') or hasta - datetime.timedelta(days=6)
+        agrupar = request.args.get('agrupar', 'total')
+        if agrupar not in AGRUPACIONES:
+            raise ParametroInvalido(f"agrupar debe ser uno de: {', '.join(AGRUPACIONES)}")
+        if desde > hasta:
+            raise ParametroInvalido('from debe ser anterior o igual a to')
+        if (hasta - desde).days > current_app.config['USAGE_REPORT_MAX_DAYS']:
+            raise ParametroInvalido(f"El rango no puede superar {current_app.config['USAGE_REPORT_MAX_DAYS']} días")
+        
+        equipos, usuarios = usage_rollups.report(desde, hasta, agrupar)
+        
+        return jsonify({
+            'success': True,
+            'desde': desde.isoformat(),
+            'hasta': hasta.isoformat(),
+            'agrupar': agrupar,
+            'equipos': equipos,
+            'usuarios': usuarios
+        }), 200
+    
+    except ParametroInvalido as e:
+        return jsonify({'error': 'Parámetro inválido', 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': 'Error interno', 'message': str(e)}), 500
+
 # ============================================================================
 # ENDPOINTS DE INFORMACIÓN DEL USUARIO
 # ============================================================================
 
 @api.route('/me', methods=['GET'])
+@query_budget(3)
 @api_auth_required
 def api_get_current_user_info(current_user):
     """Obtiene información del usuario actual"""
     try:
-        equipos = current_user.get_equipos_permitidos()
+        equipos_count = current_user.count_equipos_permitidos()
         
         return jsonify({
             'success': True,
             'user': current_user.serialize(),
-            'equipos_count': len(list(equipos)),
+            'equipos_count': equipos_count,
             'permissions': {
                 'is_admin': current_user.is_admin(),
                 'can_create_equipos': current_user.is_admin(),
@@ -0,0 +1,89 @@
+"""
+Asignación masiva de equipos a un usuario con semántica de conjunto: se
+calcula la diferencia contra user_equipos con una consulta y se aplica con
+INSERT/DELETE masivos en una sola transacción.
+"""
+
+from app.models import Equipo, db, user_equipos
+from app.permissions import permission_index
+from app.token_cache import token_cache
+from app.versions import fleet_version
+
+# replace: el conjunto final es exactamente el indicado
+# add/remove: el conjunto se suma o se quita de las asignaciones actuales
+MODOS = ('replace', 'add', 'remove')
+# Parámetros por consulta IN (límite de variables de SQLite)
+CHUNK = 500
+
+
+class EquiposInexistentes(ValueError):
+    """Algún id de equipo no existe"""
+
+    def __init__(self, ids):
+        self.ids = sorted(ids)
+        super().__init__(f"Equipos inexistentes: {', '.join(map(str, self.ids))}")
+
+
+def _existentes(ids):
+    ids = list(ids)
+    encontrados = set()
+    for i in range(0, len(ids), CHUNK):
+        encontrados.update(db.session.scalars(
+            db.select(Equipo.id).filter(Equipo.id.in_(ids[i:i + CHUNK]))
+        ))
+    return encontrados
+
+
+def assigned_ids_query(user_id):
+    return db.select(user_equipos.c.equipo_id).filter(user_equipos.c.user_id == user_id)
+
+
+def set_user_equipos(user_id, equipo_ids, modo='replace'):
+    """
+    Aplica el conjunto de equipos al usuario. Retorna (agregados,
+    quitados, actuales) como listas ordenadas de ids.
+    """
+    equipo_ids = set(equipo_ids)
+    actuales = set(db.session.scalars(assigned_ids_query(user_id)))
+
+    if modo == 'remove':
+        agregados, quitados = set(), equipo_ids & actuales
+    else:
+        faltantes = equipo_ids - actuales
+        inexistentes = faltantes - _existentes(faltantes)
+        if inexistentes:
+            raise EquiposInexistentes(inexistentes)
+        agregados = faltantes
+        quitados = actuales - equipo_ids if modo == 'replace' else set()
+
+    if agregados or quitados:
+        try:
+            if agregados:
+                db.session.execute(
+                    user_equipos.insert(),
+                    [{'user_id': user_id, 'equipo_id': equipo_id} for equipo_id in agregados]
+                )
+            if quitados:
+                db.session.execute(
+                    user_equipos.delete()
+                    .where(user_equipos.c.user_id == user_id)
+                    .where(user_equipos.c.equipo_id.in_(quitados))
+                )
+            version = permission_index.bump()
+            version_flota = fleet_version.bump(
+                assigned=[(user_id, equipo_id) for equipo_id in agregados],
+                unassigned=[(user_id, equipo_id) for equipo_id in quitados]
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        fleet_version.confirm(version_flota)
+        permission_index.apply(
+            version,
+            added=[(user_id, equipo_id) for equipo_id in agregados],
+            removed=[(user_id, equipo_id) for equipo_id in quitados]
+        )
+        token_cache.invalidate_user(user_id)
+
+    return sorted(agregados), sorted(quitados), sorted((actuales | agregados) - quitados)
@@ -1,20 +1,32 @@
 from flask import Blueprint, flash, redirect, render_template, request, jsonify, session, url_for
-from flask_bcrypt import Bcrypt
 from app.models import User, db
+from app.passwords import PasswordHasherBusy, password_hasher
+from app.throttle import login_throttle
+import math
 
 auth = Blueprint('auth', __name__)
-bcrypt = Bcrypt()
 
 @auth.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form.get('username')
         password = request.form.get('password')
-        user = User.query.filter_by(username=username).first()
-        if user and bcrypt.check_password_hash(user.password, password):
+        espera = login_throttle.check(request.remote_addr, username)
+        if espera:
+            flash('Demasiados intentos de inicio de sesión, reintente más tarde', 'danger')
+            return render_template('login.html'), 429, {'Retry-After': str(math.ceil(espera))}
+        user = User.by_username(username).first()
+        try:
+            valida = user is not None and password_hasher.check_user(user, password)
+        except PasswordHasherBusy:
+            flash('Demasiados inicios de sesión simultáneos, reintente en unos segundos', 'danger')
+            return render_template('login.html'), 503
+        if valida:
+            login_throttle.success(request.remote_addr, username)
             session['user_id'] = user.id
             return redirect(url_for('main.home'))
         else:
+            login_throttle.failure(request.remote_addr, username)
             flash('Credenciales incorrectas', 'danger')
             return render_template('login.html')
     else:
@@ -37,7 +49,10 @@ def register():
     if existing_user:
         return jsonify({'message': 'El nombre de usuario ya está en uso'}), 409
 
-    hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
+    try:
+        hashed_password = password_hasher.hash(password)
+    except PasswordHasherBusy:
+        return jsonify({'message': 'Servicio saturado, reintente en unos segundos'}), 503
     new_user = User(username=username, password=hashed_password, role='user')
     db.session.add(new_user)
     db.session.commit()
@@ -2,6 +2,8 @@ from functools import wraps
 from flask import request, jsonify, current_app
 import jwt
 from .models import User
+from .timing import span
+from .token_cache import token_cache
 
 # Importar excepciones JWT correctas para PyJWT
 try:
@@ -18,35 +20,51 @@ except ImportError:
         class InvalidTokenError(Exception):
             pass
 
+def _autenticar():
+    """Retorna (usuario, None) o (None, respuesta de error)"""
+    token = None
+    
+    # Buscar token en headers
+    if 'Authorization' in request.headers:
+        auth_header = request.headers['Authorization']
+        try:
+            token = auth_header.split(" ")[1]  # Bearer TOKEN
+        except IndexError:
+            return None, (jsonify({'message': 'Token mal formateado'}), 401)
+    
+    if not token:
+        return None, (jsonify({'message': 'Token faltante'}), 401)
+    
+    current_user = token_cache.get(token)
+    if current_user:
+        return current_user, None
+    
+    try:
+        # Decodificar token
+        data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+        current_user = User.query.filter_by(id=data['user_id']).first()
+        
+        if not current_user:
+            return None, (jsonify({'message': 'Token inválido'}), 401)
+        
+        token_cache.put(token, data, current_user)
+            
+    except ExpiredSignatureError:
+        return None, (jsonify({'message': 'Token expirado'}), 401)
+    except InvalidTokenError:
+        return None, (jsonify({'message': 'Token inválido'}), 401)
+    
+    return current_user, None
+
 def token_required(f):
     """Decorator para requerir token de autenticación"""
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
-        
-        # Buscar token en headers
-        if 'Authorization' in request.headers:
-            auth_header = request.headers['Authorization']
-            try:
-                token = auth_header.split(" ")[1]  # Bearer TOKEN
-            except IndexError:
-                return jsonify({'message': 'Token mal formateado'}), 401
-        
-        if not token:
-            return jsonify({'message': 'Token faltante'}), 401
-        
-        try:
-            # Decodificar token
-            data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-            current_user = User.query.filter_by(id=data['user_id']).first()
-            
-            if not current_user:
-                return jsonify({'message': 'Token inválido'}), 401
-                
-        except ExpiredSignatureError:
-            return jsonify({'message': 'Token expirado'}), 401
-        except InvalidTokenError:
-            return jsonify({'message': 'Token inválido'}), 401
+        # Tiempo de JWT y búsqueda del usuario en Server-Timing (auth)
+        with span('auth'):
+            current_user, error = _autenticar()
+        if error:
+            return error
         
         return f(current_user, *args, **kwargs)
     
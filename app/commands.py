@@ -6,7 +6,11 @@ import click
 from flask import current_app
 from flask.cli import with_appcontext
 # Removido: from werkzeug.security import generate_password_hash - usamos bcrypt
-from .models import db, User, Equipo
+from .models import db, User, Equipo, UsoUsuarioDia, WakeJob
+from .permissions import permission_index
+from .versions import fleet_version
+from .assignments import MODOS, EquiposInexistentes, set_user_equipos
+from .inventory import FORMATOS, InventarioInvalido, detect_format, import_equipos, parse_inventory
 
 
 @click.command()
@@ -20,8 +24,14 @@ def init_roles(reset):
         # Limpiar asignaciones existentes
         from sqlalchemy import text
         db.session.execute(text("DELETE FROM user_equipos"))
-        # Resetear usuarios a solo admin
+        # Resetear usuarios a solo admin (los trabajos de encendido quedan sin usuario:
+        # con foreign_keys=ON la base rechaza borrar usuarios referenciados)
+        otros = db.select(User.id).filter(User.username != 'admin')
+        WakeJob.query.filter(WakeJob.user_id.in_(otros)).update({WakeJob.user_id: None}, synchronize_session=False)
+        UsoUsuarioDia.query.filter(UsoUsuarioDia.user_id.in_(otros)).delete(synchronize_session=False)
         User.query.filter(User.username != 'admin').delete()
+        permission_index.bump()
+        fleet_version.bump(snapshot=True)
         db.session.commit()
     
     click.echo('🚀 Inicializando sistema de roles...')
@@ -53,6 +63,8 @@ def init_roles(reset):
         palula.password = bcrypt.generate_password_hash('palula123').decode('utf-8')
         click.echo('👤 Usuario palula actualizado')
     
+    permission_index.bump()
+    fleet_version.bump(snapshot=True)
     db.session.commit()
     
     # 3. Asignar todos los equipos al admin
@@ -69,6 +81,8 @@ def init_roles(reset):
         palula.equipos_asignados.append(equipos[0])
         click.echo(f'🔗 Equipo "{equipos[0].nombre}" asignado a palula')
     
+    permission_index.bump()
+    fleet_version.bump(snapshot=True)
     db.session.commit()
     
     # Mostrar resumen
@@ -139,6 +153,8 @@ def assign_equipment(username, equipo_id):
         return
     
     user.equipos_asignados.append(equipo)
+    permission_index.bump()
+    fleet_version.bump(assigned=[(user.id, equipo.id)])
     db.session.commit()
     
     click.echo(f'✅ Equipo "{equipo.nombre}" asignado a {username}')
@@ -166,11 +182,37 @@ def unassign_equipment(username, equipo_id):
         return
     
     user.equipos_asignados.remove(equipo)
+    permission_index.bump()
+    fleet_version.bump(unassigned=[(user.id, equipo.id)])
     db.session.commit()
     
     click.echo(f'✅ Equipo "{equipo.nombre}" desasignado de {username}')
 
 
+@click.command()
+@click.argument('username')
+@click.argument('equipo_ids', nargs=-1, type=int)
+@click.option('--mode', type=click.Choice(MODOS), default='replace',
+              help='replace: conjunto exacto; add/remove: sumar o quitar equipos')
+@with_appcontext
+def set_equipment(username, equipo_ids, mode):
+    """Asigna un conjunto de equipos a un usuario en una sola operación."""
+    
+    user = User.query.filter_by(username=username).first()
+    if not user:
+        click.echo(f'❌ Usuario {username} no encontrado')
+        return
+    
+    try:
+        agregados, quitados, actuales = set_user_equipos(user.id, equipo_ids, mode)
+    except EquiposInexistentes as e:
+        click.echo(f'❌ {e}')
+        return
+    
+    click.echo(f'✅ Asignaciones de {username}: +{len(agregados)} -{len(quitados)} '
+               f'(total {len(actuales)} equipos)')
+
+
 @click.command()
 @click.option('--force', is_flag=True, help='Forzar migración sin confirmación')
 @with_appcontext
@@ -288,6 +330,8 @@ def setup_system(force):
                 click.echo(f'👤 Usuario {username} actualizado')
             created_users.append(user)
         
+        permission_index.bump()
+        fleet_version.bump(snapshot=True)
         db.session.commit()
         
         # 3. Asignar equipos
@@ -313,6 +357,8 @@ def setup_system(force):
                         paula.equipos_asignados.append(equipos[0])
                         click.echo(f'🔗 Equipo "{equipos[0].nombre}" asignado a paula (por defecto)')
         
+        permission_index.bump()
+        fleet_version.bump(snapshot=True)
         db.session.commit()
         
     except Exception as e:
@@ -475,12 +521,81 @@ def create_user(username, password, role):
     click.echo(f'✅ Usuario creado: {role_emoji} {username} ({role})')
 
 
+@click.command('import-equipos')
+@click.argument('archivo', type=click.Path(exists=True, dir_okay=False))
+@click.option('--formato', type=click.Choice(FORMATOS), help='Formato del archivo (por defecto según la extensión)')
+@with_appcontext
+def import_equipos_command(archivo, formato):
+    """Importa o actualiza equipos desde puestos.txt, CSV o JSON."""
+    
+    formato = detect_format(archivo, formato)
+    click.echo(f'📥 Importando {archivo} ({formato})...')
+    
+    try:
+        with open(archivo, encoding='utf-8-sig', newline='') as f:
+            resultado = import_equipos(parse_inventory(f, formato))
+    except InventarioInvalido as e:
+        click.echo(f'❌ {e}')
+        return
+    except Exception as e:
+        click.echo(f'❌ Error importando equipos: {e}')
+        return
+    
+    for error in resultado['errors']:
+        click.echo(f'   ⚠️ {error}')
+    click.echo(f'✅ Creados: {resultado["created"]}  Actualizados: {resultado["updated"]}  '
+               f'Omitidos: {resultado["skipped"]}')
+
+
+@click.command('verify-indexes')
+@click.option('--verbose', is_flag=True, help='Mostrar el plan completo de cada consulta')
+@with_appcontext
+def verify_indexes(verbose):
+    """Verifica con EXPLAIN QUERY PLAN que las consultas usan índices."""
+    from .query_plans import verify
+    
+    click.echo('🔍 VERIFICACIÓN DE ÍNDICES')
+    click.echo('=' * 40)
+    
+    fallidas = 0
+    for descripcion, plan, recorridas in verify():
+        if recorridas:
+            fallidas += 1
+            click.echo(f'   ❌ {descripcion}: recorre {", ".join(recorridas)} sin índice')
+        else:
+            click.echo(f'   ✅ {descripcion}')
+        if verbose or recorridas:
+            for detalle in plan:
+                click.echo(f'      {detalle}')
+    
+    if fallidas:
+        click.echo(f'\n❌ {fallidas} consultas sin índice (¿falta aplicar migraciones?)')
+        raise SystemExit(1)
+    click.echo('\n✅ Todas las consultas usan índices')
+
+
+@click.command('compact-historial')
+@with_appcontext
+def compact_historial():
+    """Reduce a horas el historial crudo vencido y purga el historial antiguo."""
+    from .history import probe_history
+    
+    probe_history.flush()
+    db.session.commit()
+    horas, crudas, vencidas = probe_history.compact()
+    click.echo(f'✅ Historial compactado: {crudas} muestras crudas -> {horas} horas, {vencidas} horas vencidas borradas')
+
+
 def init_app(app):
     """Registra los comandos en la aplicación Flask."""
     app.cli.add_command(init_roles)
     app.cli.add_command(show_roles)
     app.cli.add_command(assign_equipment)
     app.cli.add_command(unassign_equipment)
+    app.cli.add_command(set_equipment)
     app.cli.add_command(setup_system)
     app.cli.add_command(verify_system)
-    app.cli.add_command(create_user)
\ No newline at end of file
+    app.cli.add_command(create_user)
+    app.cli.add_command(import_equipos_command)
+    app.cli.add_command(verify_indexes)
+    app.cli.add_command(compact_historial)
\ No newline at end of file
@@ -0,0 +1,96 @@
+"""
+Difusión de cambios de estado de equipos para el stream SSE.
+
+Un único productor (el poller o un sondeo en vivo) publica en un buffer
+circular compartido; cada suscriptor solo guarda el id del último evento
+que leyó. Cada pedido al stream responde enseguida con los eventos
+posteriores a ese id y EventSource vuelve a pedir tras `retry`: un
+suscriptor inactivo no retiene un hilo del servidor.
+"""
+
+import itertools
+import json
+import threading
+from collections import deque, namedtuple
+
+Event = namedtuple('Event', ['id', 'equipo_id', 'data'])
+
+
+class EventBroker:
+
+    def __init__(self, buffer_size=1024, retry_ms=3000):
+        self.retry_ms = retry_ms
+        self._events = deque(maxlen=buffer_size)
+        self._ids = itertools.count(1)
+        self._last_id = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault('SSE_BUFFER_SIZE', self._events.maxlen)
+        app.config.setdefault('SSE_RETRY_MS', self.retry_ms)
+        self._events = deque(self._events, maxlen=app.config['SSE_BUFFER_SIZE'])
+        self.retry_ms = app.config['SSE_RETRY_MS']
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    def publish(self, equipo_id, data):
+        with self._lock:
+            event = Event(next(self._ids), equipo_id, data)
+            self._events.append(event)
+            self._last_id = event.id
+        return event
+
+    @staticmethod
+    def payload(equipo):
+        """Datos del evento; tomarlos antes del commit evita recargar cada fila"""
+        return {
+            'id': equipo.id,
+            'estado': equipo.estado,
+            'ip_address': equipo.ip_address,
+            'rtt_ms': equipo.rtt_ms,
+            'checked_at': equipo.checked_at.isoformat() + 'Z' if equipo.checked_at else None
+        }
+
+    def publish_payloads(self, payloads):
+        """Publica los cambios de estado ya confirmados"""
+        for data in payloads:
+            self.publish(data['id'], data)
+
+    def events_after(self, last_id):
+        """Eventos posteriores a last_id que siguen en el buffer"""
+        # deque no admite slicing; el buffer es pequeño y está ordenado por id
+        return [event for event in list(self._events) if event.id > last_id]
+
+    def poll(self, last_id, equipo_ids=None):
+        """
+        Mensajes SSE con los eventos posteriores a last_id; equipo_ids=None
+        significa todos los equipos (admin). No espera eventos nuevos: la
+        respuesta termina y EventSource reconecta tras `retry` con
+        Last-Event-ID. Siempre cierra con el id del último evento leído,
+        aunque se haya filtrado, para que el próximo pedido no lo repita.
+        """
+        mensajes = [f'retry: {self.retry_ms}\n\n']
+        ultimo = self._last_id
+        eventos = self.events_after(last_id or 0)
+
+        if last_id is None or last_id > ultimo:
+            # Primera conexión o reinicio del servidor
+            eventos = []
+        elif eventos and last_id < eventos[0].id - 1:
+            # Se perdieron eventos que ya salieron del buffer: el cliente debe recargar
+            mensajes.append(f'id: {ultimo}\nevent: reset\ndata: {{}}\n\n')
+            return ''.join(mensajes)
+
+        for event in eventos:
+            if event.id > ultimo:
+                break
+            if equipo_ids is None or event.equipo_id in equipo_ids:
+                mensajes.append(f'id: {event.id}\nevent: estado\ndata: {json.dumps(event.data)}\n\n')
+        # Un id sin data no dispara un evento pero actualiza Last-Event-ID
+        mensajes.append(f'id: {ultimo}\n\n')
+        return ''.join(mensajes)
+
+
+event_broker = EventBroker()
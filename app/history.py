@@ -0,0 +1,228 @@
+"""
+Historial de sondeos por equipo.
+
+Las muestras se acumulan en memoria y se escriben en lote dentro de la
+transacción del poller (o del sondeo en vivo). Para acotar el volumen, de
+cada equipo se guarda una muestra cuando cambia el estado o cuando pasaron
+HISTORY_MIN_INTERVAL segundos desde la última. La compactación reduce las
+muestras crudas más antiguas que HISTORY_RAW_RETENTION_HOURS a una fila por
+hora y descarta las horas más antiguas que HISTORY_HOURLY_RETENTION_DAYS.
+"""
+
+import calendar
+import datetime
+import threading
+import time
+
+from flask import request
+
+from app.models import MuestraEquipo, MuestraEquipoHora, db
+from app.pagination import ParametroInvalido
+
+HORA = 3600
+
+
+def epoch(fecha):
+    """datetime UTC naive -> segundos epoch"""
+    return calendar.timegm(fecha.utctimetuple())
+
+
+def iso(ts):
+    return datetime.datetime.utcfromtimestamp(ts).isoformat() + 'Z'
+
+
+def parse_instante_arg(nombre):
+    """?from= / ?to= como epoch en segundos o ISO 8601 (UTC si no trae zona)"""
+    valor = request.args.get(nombre)
+    if valor is None or valor == '':
+        return None
+    try:
+        return int(float(valor))
+    except ValueError:
+        pass
+    try:
+        fecha = datetime.datetime.fromisoformat(valor.replace('Z', '+00:00'))
+    except ValueError:
+        raise ParametroInvalido(f'{nombre} debe ser una fecha ISO 8601 o segundos epoch')
+    if fecha.tzinfo is not None:
+        fecha = fecha.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return epoch(fecha)
+
+
+class ProbeHistory:
+
+    def __init__(self, min_interval=60, raw_retention_hours=48, hourly_retention_days=365,
+                 compact_interval=3600, buffer_max=100000):
+        self.min_interval = min_interval
+        self.raw_retention_hours = raw_retention_hours
+        self.hourly_retention_days = hourly_retention_days
+        self.compact_interval = compact_interval
+        self.buffer_max = buffer_max
+        self.enabled = True
+        self._buffer = []
+        self._ultimas = {}
+        self._compacted_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault('HISTORY_ENABLED', self.enabled)
+        app.config.setdefault('HISTORY_MIN_INTERVAL', self.min_interval)
+        app.config.setdefault('HISTORY_RAW_RETENTION_HOURS', self.raw_retention_hours)
+        app.config.setdefault('HISTORY_HOURLY_RETENTION_DAYS', self.hourly_retention_days)
+        app.config.setdefault('HISTORY_COMPACT_INTERVAL', self.compact_interval)
+        self.enabled = app.config['HISTORY_ENABLED']
+        self.min_interval = app.config['HISTORY_MIN_INTERVAL']
+        self.raw_retention_hours = app.config['HISTORY_RAW_RETENTION_HOURS']
+        self.hourly_retention_days = app.config['HISTORY_HOURLY_RETENTION_DAYS']
+        self.compact_interval = app.config['HISTORY_COMPACT_INTERVAL']
+
+    def record(self, equipo_id, estado, rtt_ms, checked_at):
+        """Agrega una muestra al buffer (no toca la base)"""
+        if not self.enabled:
+            return
+        ts = epoch(checked_at)
+        codigo = MuestraEquipo.ESTADOS.get(estado, MuestraEquipo.DESCONOCIDO)
+        with self._lock:
+            ultima = self._ultimas.get(equipo_id)
+            if ultima and ultima[1] == codigo and ts - ultima[0] < self.min_interval:
+                return
+            self._ultimas[equipo_id] = (ts, codigo)
+            if len(self._buffer) >= self.buffer_max:
+                # Sin flush por mucho tiempo: se pierden las más antiguas
+                del self._buffer[:len(self._buffer) // 10 or 1]
+            self._buffer.append({'equipo_id': equipo_id, 'ts': ts, 'estado': codigo, 'rtt_ms': rtt_ms})
+
+    def flush(self):
+        """Escribe el buffer en la transacción actual (el llamador hace commit)"""
+        with self._lock:
+            filas, self._buffer = self._buffer, []
+        if filas:
+            # Dos muestras del mismo equipo en el mismo segundo: queda la primera
+            db.session.execute(
+                db.insert(MuestraEquipo).prefix_with('OR IGNORE', dialect='sqlite'), filas
+            )
+        return len(filas)
+
+    def compact_due(self):
+        return time.monotonic() - self._compacted_at >= self.compact_interval
+
+    def raw_cutoff(self, ahora=None):
+        """Inicio de la hora desde la cual se conservan las muestras crudas"""
+        ahora = ahora if ahora is not None else int(time.time())
+        return (ahora - self.raw_retention_hours * HORA) // HORA * HORA
+
+    def compact(self, ahora=None):
+        """
+        Reduce a horas las muestras crudas anteriores al corte, las borra y
+        purga las horas vencidas. Retorna (horas_generadas, crudas_borradas, horas_borradas).
+        """
+        ahora = ahora if ahora is not None else int(time.time())
+        corte = self.raw_cutoff(ahora)
+        m = MuestraEquipo
+        hora = (m.ts / HORA).cast(db.Integer) * HORA
+        agregadas = db.select(
+            m.equipo_id, hora, db.func.count(),
+            db.func.sum(db.case((m.estado == MuestraEquipo.ESTADOS['encendido'], 1), else_=0)),
+            db.func.avg(m.rtt_ms), db.func.max(m.rtt_ms)
+        ).filter(m.ts < corte).group_by(m.equipo_id, hora)
+        try:
+            generadas = db.session.execute(
+                db.insert(MuestraEquipoHora).prefix_with('OR REPLACE', dialect='sqlite').from_select(
+                    ['equipo_id', 'hora', 'muestras', 'encendidas', 'rtt_avg_ms', 'rtt_max_ms'],
+                    agregadas
+                )
+            ).rowcount
+            borradas = db.session.execute(db.delete(m).where(m.ts < corte)).rowcount
+            vencidas = db.session.execute(
+                db.delete(MuestraEquipoHora)
+                .where(MuestraEquipoHora.hora < ahora - self.hourly_retention_days * 24 * HORA)
+            ).rowcount
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        self._compacted_at = time.monotonic()
+        return generadas, borradas, vencidas
+
+    def purge(self, equipo_id):
+        """Borra el historial de un equipo eliminado (en la transacción actual)"""
+        with self._lock:
+            self._ultimas.pop(equipo_id, None)
+            self._buffer = [fila for fila in self._buffer if fila['equipo_id'] != equipo_id]
+        db.session.execute(db.delete(MuestraEquipo).where(MuestraEquipo.equipo_id == equipo_id))
+        db.session.execute(db.delete(MuestraEquipoHora).where(MuestraEquipoHora.equipo_id == equipo_id))
+
+    def query(self, equipo_id, desde, hasta):
+        """
+        Muestras crudas si todo el rango sigue dentro de la retención cruda;
+        si no, una fila por hora. Retorna (resolucion, muestras).
+        """
+        if desde >= self.raw_cutoff():
+            return 'raw', self.raw(equipo_id, desde, hasta)
+        return 'hora', self.hourly(equipo_id, desde, hasta)
+
+    @staticmethod
+    def raw_query(equipo_id, desde, hasta):
+        m = MuestraEquipo
+        return (
+            db.select(m.ts, m.estado, m.rtt_ms)
+            .filter(m.equipo_id == equipo_id, m.ts >= desde, m.ts < hasta)
+            .order_by(m.ts)
+        )
+
+    @staticmethod
+    def hourly_query(equipo_id, desde, hasta):
+        """Horas ya compactadas en la tabla por hora"""
+        h = MuestraEquipoHora
+        return (
+            db.select(h.hora, h.muestras, h.encendidas, h.rtt_avg_ms, h.rtt_max_ms)
+            .filter(h.equipo_id == equipo_id, h.hora >= desde, h.hora < hasta)
+            .order_by(h.hora)
+        )
+
+    @staticmethod
+    def recent_hourly_query(equipo_id, desde, hasta):
+        """Horas recientes agregadas al vuelo desde las muestras crudas"""
+        m = MuestraEquipo
+        hora = (m.ts / HORA).cast(db.Integer) * HORA
+        return (
+            db.select(
+                hora, db.func.count(),
+                db.func.sum(db.case((m.estado == MuestraEquipo.ESTADOS['encendido'], 1), else_=0)),
+                db.func.avg(m.rtt_ms), db.func.max(m.rtt_ms)
+            )
+            .filter(m.equipo_id == equipo_id, m.ts >= desde, m.ts < hasta)
+            .group_by(hora).order_by(hora)
+        )
+
+    def raw(self, equipo_id, desde, hasta):
+        filas = db.session.execute(self.raw_query(equipo_id, desde, hasta))
+        estados = {codigo: nombre for nombre, codigo in MuestraEquipo.ESTADOS.items()}
+        return [
+            {'ts': iso(ts), 'estado': estados.get(estado, 'desconocido'), 'rtt_ms': rtt_ms}
+            for ts, estado, rtt_ms in filas
+        ]
+
+    def hourly(self, equipo_id, desde, hasta):
+        """
+        Una fila por hora: las horas ya compactadas salen de la tabla por
+        hora y las recientes se agregan al vuelo desde las muestras crudas.
+        """
+        desde = desde // HORA * HORA
+        corte = self.raw_cutoff()
+        filas = list(db.session.execute(self.hourly_query(equipo_id, desde, min(hasta, corte))))
+        if hasta > corte:
+            filas += db.session.execute(self.recent_hourly_query(equipo_id, max(desde, corte), hasta)).all()
+        return [
+            {
+                'hora': iso(inicio),
+                'muestras': muestras,
+                'encendido_pct': round(100.0 * encendidas / muestras, 1) if muestras else None,
+                'rtt_avg_ms': round(rtt_avg, 2) if rtt_avg is not None else None,
+                'rtt_max_ms': rtt_max
+            }
+            for inicio, muestras, encendidas, rtt_avg, rtt_max in filas
+        ]
+
+
+probe_history = ProbeHistory()
@@ -0,0 +1,190 @@
+"""
+Importación masiva de equipos desde archivos de inventario:
+
+- txt: una línea "MAC nombre" por equipo (formato de puestos.txt)
+- csv: encabezados mac_address (o mac), nombre (o name) y descripcion opcional
+- json: JSON Lines (un objeto por línea) o un arreglo de objetos
+
+Los archivos se leen línea por línea; las MAC se normalizan y se
+deduplican en memoria, y el upsert por MAC se hace en una sola
+transacción con sentencias INSERT/UPDATE masivas.
+"""
+
+import csv
+import json
+import os
+import re
+
+from app.models import Equipo, db
+from app.versions import fleet_version
+
+FORMATOS = ('txt', 'csv', 'json')
+# Máximo de errores detallados que se reportan
+MAX_ERRORES = 20
+# Parámetros por consulta IN (límite de variables de SQLite)
+CHUNK = 500
+
+_HEX = re.compile(r'[^0-9A-F]')
+
+
+class InventarioInvalido(ValueError):
+    """El archivo no se puede interpretar en el formato indicado"""
+
+
+def canonical_mac(mac):
+    """AA:BB:CC:DD:EE:FF o None si no es una MAC válida"""
+    if not mac:
+        return None
+    mac = mac.strip().upper()
+    digitos = _HEX.sub('', mac)
+    # Solo se aceptan separadores habituales entre los dígitos
+    if len(digitos) != 12 or len(mac) - len(digitos) not in (0, 2, 5):
+        return None
+    if any(c not in '0123456789ABCDEF:-.' for c in mac):
+        return None
+    return ':'.join(digitos[i:i + 2] for i in range(0, 12, 2))
+
+
+def detect_format(nombre_archivo, formato=None):
+    formato = formato or os.path.splitext(nombre_archivo or '')[1].lstrip('.').lower()
+    if formato in ('jsonl', 'ndjson'):
+        formato = 'json'
+    if formato not in FORMATOS:
+        # puestos.txt y archivos sin extensión
+        formato = 'txt'
+    return formato
+
+
+def _parse_txt(lineas):
+    for numero, linea in enumerate(lineas, 1):
+        linea = linea.strip()
+        if not linea or linea.startswith('#'):
+            continue
+        partes = linea.split(None, 1)
+        yield numero, partes[0], partes[1] if len(partes) > 1 else '', None
+
+
+def _parse_csv(lineas):
+    lector = csv.DictReader(lineas)
+    campos = {campo.strip().lower(): campo for campo in lector.fieldnames or ()}
+    mac = campos.get('mac_address') or campos.get('mac')
+    nombre = campos.get('nombre') or campos.get('name')
+    if not mac or not nombre:
+        raise InventarioInvalido('El CSV debe tener columnas mac_address y nombre')
+    descripcion = campos.get('descripcion')
+    for fila in lector:
+        yield (lector.line_num, fila.get(mac), fila.get(nombre),
+               fila.get(descripcion) if descripcion else None)
+
+
+def _parse_objeto(numero, objeto):
+    if not isinstance(objeto, dict):
+        return numero, None, None, None
+    return (numero, objeto.get('mac_address') or objeto.get('mac'),
+            objeto.get('nombre') or objeto.get('name'), objeto.get('descripcion'))
+
+
+def _parse_json(lineas):
+    lineas = iter(lineas)
+    for numero, linea in enumerate(lineas, 1):
+        linea = linea.strip()
+        if not linea:
+            continue
+        if linea.startswith('['):
+            # Arreglo JSON: no se puede leer por partes con la librería estándar
+            resto = linea + ''.join(lineas)
+            try:
+                objetos = json.loads(resto)
+            except ValueError as e:
+                raise InventarioInvalido(f'JSON inválido: {e}')
+            for indice, objeto in enumerate(objetos, 1):
+                yield _parse_objeto(indice, objeto)
+            return
+        try:
+            yield _parse_objeto(numero, json.loads(linea))
+        except ValueError:
+            yield numero, None, None, None
+
+
+PARSERS = {'txt': _parse_txt, 'csv': _parse_csv, 'json': _parse_json}
+
+
+def parse_inventory(lineas, formato):
+    """Genera (linea, mac, nombre, descripcion) sin cargar el archivo completo"""
+    return PARSERS[formato](lineas)
+
+
+def import_equipos(registros):
+    """
+    Upsert por MAC en una sola transacción. Retorna un dict con los
+    conteos created/updated/skipped y los primeros errores.
+    """
+    resultado = {'created': 0, 'updated': 0, 'skipped': 0, 'errors': []}
+
+    def omitir(numero, motivo):
+        resultado['skipped'] += 1
+        if len(resultado['errors']) < MAX_ERRORES:
+            resultado['errors'].append(f'Línea {numero}: {motivo}')
+
+    # Deduplicar en memoria: la primera aparición de cada MAC gana
+    nuevos = {}
+    for numero, mac, nombre, descripcion in registros:
+        mac_normalizada = canonical_mac(mac)
+        nombre = (nombre or '').strip()[:100]
+        if not mac_normalizada:
+            omitir(numero, f'MAC inválida: {mac!r}')
+        elif not nombre:
+            omitir(numero, 'Falta el nombre')
+        elif mac_normalizada in nuevos:
+            omitir(numero, f'MAC repetida en el archivo: {mac_normalizada}')
+        else:
+            nuevos[mac_normalizada] = (nombre, descripcion)
+
+    # Equipos existentes en una consulta, indexados por MAC normalizada
+    existentes = {}
+    for equipo_id, mac, nombre, descripcion in db.session.execute(
+        db.select(Equipo.id, Equipo.mac_address, Equipo.nombre, Equipo.descripcion)
+    ):
+        existentes[canonical_mac(mac) or mac] = (equipo_id, nombre, descripcion)
+
+    inserts = []
+    updates = []
+    for mac, (nombre, descripcion) in nuevos.items():
+        actual = existentes.get(mac)
+        if actual is None:
+            inserts.append({'nombre': nombre, 'mac_address': mac,
+                            'descripcion': descripcion, 'estado': 'desconocido'})
+            continue
+        equipo_id, nombre_actual, descripcion_actual = actual
+        cambios = {}
+        if nombre != nombre_actual:
+            cambios['nombre'] = nombre
+        if descripcion is not None and descripcion != descripcion_actual:
+            cambios['descripcion'] = descripcion
+        if cambios:
+            updates.append({'id': equipo_id, **cambios})
+        else:
+            resultado['skipped'] += 1
+
+    try:
+        ids = [fila['id'] for fila in updates]
+        if inserts:
+            db.session.execute(db.insert(Equipo), inserts)
+            macs = [fila['mac_address'] for fila in inserts]
+            for i in range(0, len(macs), CHUNK):
+                ids += db.session.scalars(
+                    db.select(Equipo.id).filter(Equipo.mac_address.in_(macs[i:i + CHUNK]))
+                ).all()
+        if updates:
+            db.session.execute(db.update(Equipo), updates)
+        version_flota = fleet_version.bump(upserts=ids) if ids else None
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    if version_flota:
+        fleet_version.confirm(version_flota)
+
+    resultado['created'] = len(inserts)
+    resultado['updated'] = len(updates)
+    return resultado
@@ -0,0 +1,191 @@
+"""
+Worker en segundo plano para los trabajos de encendido (WakeJob): envía
+el paquete mágico, reintenta según la configuración y vigila el equipo
+hasta que responde o vence el plazo.
+"""
+
+import datetime
+import threading
+
+from app.events import event_broker
+from app.history import probe_history
+from app.models import Equipo, WakeJob, db
+from app.usage import usage_rollups
+from app.probing import ESTADO_PENDIENTE, apply_result, fleet_prober
+from app.versions import bump_probe_versions
+from app.wol import send_magic_packets
+
+
+class WakeJobWorker:
+
+    def __init__(self, tick=2.0, retry_interval=20.0, max_attempts=3, timeout=180.0):
+        self.tick = tick
+        self.retry_interval = retry_interval
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.app = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    def init_app(self, app):
+        app.config.setdefault('WAKE_JOB_TICK', self.tick)
+        app.config.setdefault('WAKE_JOB_RETRY_INTERVAL', self.retry_interval)
+        app.config.setdefault('WAKE_JOB_MAX_ATTEMPTS', self.max_attempts)
+        app.config.setdefault('WAKE_JOB_TIMEOUT', self.timeout)
+        self.tick = app.config['WAKE_JOB_TICK']
+        self.retry_interval = app.config['WAKE_JOB_RETRY_INTERVAL']
+        self.max_attempts = app.config['WAKE_JOB_MAX_ATTEMPTS']
+        self.timeout = app.config['WAKE_JOB_TIMEOUT']
+        self.app = app
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Inicia el worker; retoma los trabajos que quedaron activos (idempotente)"""
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='wake-jobs', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.tick * 2)
+        self._thread = None
+
+    def notify(self):
+        """Despierta al worker para procesar un trabajo recién creado"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self.app.app_context():
+                try:
+                    self.process_once()
+                except Exception as e:
+                    db.session.rollback()
+                    self.app.logger.error(f"Error en worker de encendido: {e}")
+                finally:
+                    db.session.remove()
+            self._wake.wait(self.tick)
+            self._wake.clear()
+
+    def enqueue(self, equipo, user):
+        """
+        Crea el trabajo. Sin worker activo (p. ej. con `flask run`) el paquete
+        se envía en línea y el trabajo termina como 'unverified' (o 'failed'
+        si el envío falló): nadie lo reintentaría ni verificaría después.
+        """
+        ahora = datetime.datetime.utcnow()
+        job = WakeJob(
+            equipo_id=equipo.id,
+            user_id=user.id if user else None,
+            estado='queued',
+            intentos=0,
+            created_at=ahora
+        )
+        db.session.add(job)
+        usage_rollups.record_wake(equipo.id, job.user_id, ahora)
+        if not self.running:
+            self._send([job], {equipo.id: equipo}, ahora)
+            self._finish(job, 'failed' if job.error else 'unverified', ahora)
+        db.session.commit()
+        self.notify()
+        return job
+
+    def _send(self, jobs, equipos, ahora):
+        envios = send_magic_packets([equipos[job.equipo_id].mac_address for job in jobs])
+        for job, (_, error) in zip(jobs, envios):
+            job.intentos += 1
+            job.last_sent_at = ahora
+            if error:
+                job.error = error[:200]
+                if job.intentos >= self.max_attempts:
+                    self._finish(job, 'failed', ahora)
+                continue
+            if job.sent_at is None:
+                job.sent_at = ahora
+            if job.estado == 'queued':
+                job.estado = 'sent'
+
+    def _finish(self, job, estado, ahora):
+        job.estado = estado
+        job.finished_at = ahora
+        if estado == 'up':
+            job.up_at = ahora
+
+    def process_once(self):
+        """Avanza todos los trabajos activos un paso"""
+        jobs = WakeJob.active().all()
+        if not jobs:
+            return
+        ahora = datetime.datetime.utcnow()
+        equipos = {
+            equipo.id: equipo
+            for equipo in Equipo.query.filter(Equipo.id.in_({job.equipo_id for job in jobs})).all()
+        }
+
+        # Trabajos cuyo equipo fue eliminado
+        for job in jobs:
+            if job.equipo_id not in equipos:
+                job.error = 'Equipo eliminado'
+                self._finish(job, 'failed', ahora)
+        jobs = [job for job in jobs if job.estado in WakeJob.ESTADOS_ACTIVOS]
+
+        # Un envío fallido espera retry_interval como cualquier reintento
+        pendientes = [
+            job for job in jobs
+            if job.estado == 'queued' and (
+                job.last_sent_at is None or
+                (ahora - job.last_sent_at).total_seconds() >= self.retry_interval
+            )
+        ]
+        if pendientes:
+            self._send(pendientes, equipos, ahora)
+
+        enviados = [job for job in jobs if job.estado in ('sent', 'booting')]
+        resultados = fleet_prober.probe(
+            [equipos[job.equipo_id] for job in enviados],
+            usar_ip_guardada=True
+        ) if enviados else {}
+
+        cambios = []
+        verificados = 0
+        reintentar = []
+        for job in enviados:
+            equipo = equipos[job.equipo_id]
+            resultado = resultados.get(equipo.id)
+            if resultado and resultado[1] == 'encendido':
+                if equipo.estado != 'encendido':
+                    cambios.append(equipo)
+                apply_result(equipo, resultado, ahora)
+                verificados += 1
+                self._finish(job, 'up', ahora)
+                continue
+            if resultado and resultado[1] != ESTADO_PENDIENTE:
+                job.estado = 'booting'
+            if (ahora - job.created_at).total_seconds() > self.timeout:
+                job.error = job.error or 'El equipo no respondió dentro del plazo'
+                self._finish(job, 'failed', ahora)
+            elif (job.intentos < self.max_attempts and
+                  (ahora - job.last_sent_at).total_seconds() >= self.retry_interval):
+                reintentar.append(job)
+
+        if reintentar:
+            self._send(reintentar, equipos, ahora)
+        eventos = [event_broker.payload(equipo) for equipo in cambios]
+        probe_history.flush()
+        usage_rollups.flush()
+        confirmar = bump_probe_versions([equipo.id for equipo in cambios], verificados)
+        db.session.commit()
+        if confirmar:
+            confirmar()
+        event_broker.publish_payloads(eventos)
+
+
+wake_job_worker = WakeJobWorker()
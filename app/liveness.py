@@ -0,0 +1,133 @@
+"""
+Sondas de vida en proceso (ICMP sin privilegios y TCP connect) como
+alternativa a lanzar el binario `ping` por cada equipo.
+"""
+
+import errno
+import itertools
+import os
+import selectors
+import socket
+import struct
+import time
+from collections import namedtuple
+
+DEFAULT_TCP_PORTS = (3389, 22, 445)
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+
+ProbeResult = namedtuple('ProbeResult', ['alive', 'rtt_ms', 'method'])
+
+# None = aún no se sabe si el kernel permite sockets ICMP de datagrama
+_icmp_disponible = None
+_secuencia = itertools.count(1)
+
+# Un RST también demuestra que el equipo está encendido
+_ERRORES_VIVO = {0, errno.ECONNREFUSED}
+
+
+def _checksum(data):
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack('!%dH' % (len(data) // 2), data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def _abrir_icmp():
+    """Abre un socket ICMP de datagrama (net.ipv4.ping_group_range) o retorna None"""
+    global _icmp_disponible
+    if _icmp_disponible is False:
+        return None
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+    except (OSError, AttributeError):
+        _icmp_disponible = False
+        return None
+    _icmp_disponible = True
+    sock.setblocking(False)
+    return sock
+
+
+def _echo_request(seq):
+    payload = struct.pack('!d', time.time())
+    header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, os.getpid() & 0xFFFF, seq)
+    checksum = _checksum(header + payload)
+    return struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, checksum, os.getpid() & 0xFFFF, seq) + payload
+
+
+def _es_echo_reply(data, seq):
+    # En sockets ICMP de datagrama el kernel entrega el mensaje sin cabecera IP
+    if len(data) < 8:
+        return False
+    tipo, _, _, _, seq_respuesta = struct.unpack('!BBHHH', data[:8])
+    return tipo == ICMP_ECHO_REPLY and seq_respuesta == seq
+
+
+def _abrir_tcp(host, port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setblocking(False)
+    resultado = sock.connect_ex((host, port))
+    if resultado not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK, getattr(errno, 'WSAEWOULDBLOCK', -1)):
+        sock.close()
+        return None, resultado
+    return sock, resultado
+
+
+def probe_host(host, timeout_ms=1000, tcp_ports=DEFAULT_TCP_PORTS, icmp=True):
+    """
+    Verifica si un host responde, sin lanzar procesos. Envía un echo ICMP
+    (si el kernel lo permite) y abre conexiones TCP a los puertos indicados
+    al mismo tiempo; gana la primera respuesta. Retorna un ProbeResult con
+    el RTT en milisegundos.
+    """
+    inicio = time.perf_counter()
+    limite = inicio + timeout_ms / 1000.0
+    selector = selectors.DefaultSelector()
+    sockets = []
+
+    try:
+        icmp_sock = _abrir_icmp() if icmp else None
+        seq = next(_secuencia) & 0xFFFF
+        if icmp_sock is not None:
+            try:
+                icmp_sock.sendto(_echo_request(seq), (host, 0))
+                selector.register(icmp_sock, selectors.EVENT_READ, 'icmp')
+                sockets.append(icmp_sock)
+            except OSError:
+                icmp_sock.close()
+
+        for port in tcp_ports:
+            sock, resultado = _abrir_tcp(host, port)
+            if resultado in _ERRORES_VIVO and sock is None:
+                return ProbeResult(True, (time.perf_counter() - inicio) * 1000, 'tcp')
+            if sock is not None:
+                selector.register(sock, selectors.EVENT_WRITE, 'tcp')
+                sockets.append(sock)
+
+        while selector.get_map():
+            restante = limite - time.perf_counter()
+            if restante <= 0:
+                break
+            for key, _ in selector.select(restante):
+                sock = key.fileobj
+                if key.data == 'icmp':
+                    try:
+                        data = sock.recv(1024)
+                    except OSError:
+                        selector.unregister(sock)
+                        continue
+                    if _es_echo_reply(data, seq):
+                        return ProbeResult(True, (time.perf_counter() - inicio) * 1000, 'icmp')
+                else:
+                    error = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                    if error in _ERRORES_VIVO:
+                        return ProbeResult(True, (time.perf_counter() - inicio) * 1000, 'tcp')
+                    selector.unregister(sock)
+        return ProbeResult(False, None, 'icmp' if icmp_sock is not None else 'tcp')
+    finally:
+        selector.close()
+        for sock in sockets:
+            sock.close()
@@ -0,0 +1,262 @@
+"""
+Registro de métricas expuesto en /metrics en formato de texto de Prometheus.
+
+Los contadores e histogramas se reparten en un shard por hilo: cada hilo
+escribe solo en su propio dict, así que registrar una observación no toma
+ningún lock. Al exportar se suman los shards de todos los hilos. Los gauges
+se calculan con una función al momento de exportar (p. ej. la cola de
+waitress).
+"""
+
+import bisect
+import hmac
+import threading
+import time
+
+from flask import Response, g, request
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _etiquetas(nombres, valores, extra=''):
+    partes = [f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(nombres, valores)]
+    if extra:
+        partes.append(extra)
+    return '{' + ','.join(partes) + '}' if partes else ''
+
+
+def _numero(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return repr(valor)
+
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            # Solo la primera escritura de cada hilo toma el lock
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+
+    def _copias(self):
+        with self._lock:
+            shards = list(self._shards)
+        # dict.copy() es atómico frente al hilo dueño del shard
+        return [shard.copy() for shard in shards]
+
+    def render(self):
+        lineas = [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} {self.tipo}']
+        lineas.extend(self._muestras())
+        return lineas
+
+
+class Counter(_Metrica):
+    tipo = 'counter'
+
+    def inc(self, *valores, valor=1):
+        shard = self._shard()
+        shard[valores] = shard.get(valores, 0) + valor
+
+    def totales(self):
+        totales = {}
+        for shard in self._copias():
+            for clave, valor in shard.items():
+                totales[clave] = totales.get(clave, 0) + valor
+        return totales
+
+    def _muestras(self):
+        return [
+            f'{self.nombre}{_etiquetas(self.etiquetas, clave)} {_numero(valor)}'
+            for clave, valor in sorted(self.totales().items())
+        ]
+
+
+class Histogram(_Metrica):
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, segundos, *valores):
+        shard = self._shard()
+        datos = shard.get(valores)
+        if datos is None:
+            # Un contador por bucket (más +Inf), luego suma y cantidad
+            datos = shard[valores] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        datos[bisect.bisect_left(self.buckets, segundos)] += 1
+        datos[-2] += segundos
+        datos[-1] += 1
+
+    def time(self, *valores):
+        return _Cronometro(self, valores)
+
+    def totales(self):
+        totales = {}
+        for shard in self._copias():
+            for clave, datos in shard.items():
+                datos = list(datos)
+                acumulado = totales.get(clave)
+                totales[clave] = datos if acumulado is None else [a + b for a, b in zip(acumulado, datos)]
+        return totales
+
+    def _muestras(self):
+        lineas = []
+        limites = self.buckets + (float('inf'),)
+        for clave, datos in sorted(self.totales().items()):
+            acumulado = 0
+            for limite, cantidad in zip(limites, datos):
+                acumulado += cantidad
+                le = f'le="{_numero(float(limite))}"'
+                lineas.append(f'{self.nombre}_bucket{_etiquetas(self.etiquetas, clave, le)} {acumulado}')
+            lineas.append(f'{self.nombre}_sum{_etiquetas(self.etiquetas, clave)} {_numero(datos[-2])}')
+            lineas.append(f'{self.nombre}_count{_etiquetas(self.etiquetas, clave)} {datos[-1]}')
+        return lineas
+
+
+class _Cronometro:
+    """with histograma.time(...): observa la duración del bloque"""
+    __slots__ = ('histograma', 'valores', 'inicio')
+
+    def __init__(self, histograma, valores):
+        self.histograma = histograma
+        self.valores = valores
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histograma.observe(time.perf_counter() - self.inicio, *self.valores)
+
+
+class Gauge(_Metrica):
+    """Valor calculado al exportar; la función retorna un número o None"""
+    tipo = 'gauge'
+
+    def __init__(self, nombre, ayuda, funcion=None):
+        super().__init__(nombre, ayuda)
+        self.funcion = funcion
+
+    def _muestras(self):
+        valor = self.funcion() if self.funcion else None
+        return [] if valor is None else [f'{self.nombre} {_numero(valor)}']
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self.enabled = False
+        self.token = None
+        self._metricas = []
+        self._waitress = None
+
+    def _registrar(self, metrica):
+        self._metricas.append(metrica)
+        return metrica
+
+    def counter(self, nombre, ayuda, etiquetas=()):
+        return self._registrar(Counter(nombre, ayuda, etiquetas))
+
+    def histogram(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS):
+        return self._registrar(Histogram(nombre, ayuda, etiquetas, buckets))
+
+    def gauge(self, nombre, ayuda, funcion=None):
+        return self._registrar(Gauge(nombre, ayuda, funcion))
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', self.enabled)
+        app.config.setdefault('METRICS_TOKEN', self.token)
+        self.enabled = app.config['METRICS_ENABLED']
+        self.token = app.config['METRICS_TOKEN']
+        if not self.enabled:
+            return
+
+        @app.before_request
+        def iniciar_cronometro():
+            g.metrics_inicio = time.perf_counter()
+
+        @app.after_request
+        def observar_request(response):
+            inicio = g.pop('metrics_inicio', None)
+            if inicio is not None:
+                http_request_duration.observe(
+                    time.perf_counter() - inicio,
+                    request.endpoint or 'sin_ruta', request.method, str(response.status_code)
+                )
+            return response
+
+        app.add_url_rule('/metrics', 'metrics', self.view)
+        # La duración de las consultas la observa el listener de app.query_stats
+
+    def watch_waitress(self, server):
+        """Exporta la cola y los hilos del servidor creado con waitress.create_server"""
+        self._waitress = server.task_dispatcher
+
+    def _dispatcher(self, atributo):
+        if self._waitress is None:
+            return None
+        valor = getattr(self._waitress, atributo)
+        return valor if isinstance(valor, int) else len(valor)
+
+    def render(self):
+        lineas = []
+        for metrica in self._metricas:
+            lineas.extend(metrica.render())
+        return '\n'.join(lineas) + '\n'
+
+    def view(self):
+        if self.token:
+            recibido = request.headers.get('Authorization', '')
+            if not hmac.compare_digest(recibido, f'Bearer {self.token}'):
+                return Response('No autorizado\n', status=401, mimetype='text/plain')
+        return Response(self.render(), content_type=CONTENT_TYPE)
+
+
+metrics = MetricsRegistry()
+
+http_request_duration = metrics.histogram(
+    'wol_http_request_duration_seconds', 'Duración de los requests HTTP por endpoint',
+    ('endpoint', 'method', 'status')
+)
+arp_refresh_duration = metrics.histogram(
+    'wol_arp_refresh_duration_seconds', 'Lectura de la tabla ARP (/proc/net/arp o arp -a)'
+)
+probe_duration = metrics.histogram(
+    'wol_probe_duration_seconds', 'Duración de cada sondeo de un equipo', ('metodo', 'resultado')
+)
+magic_packets = metrics.counter(
+    'wol_magic_packets_total', 'Paquetes mágicos enviados o fallidos', ('resultado',)
+)
+db_query_duration = metrics.histogram(
+    'wol_db_query_duration_seconds', 'Duración de las consultas a la base (la cantidad es _count)'
+)
+bcrypt_duration = metrics.histogram(
+    'wol_bcrypt_duration_seconds', 'Tiempo de bcrypt en el pool de contraseñas', ('operacion',)
+)
+metrics.gauge('wol_waitress_queue_depth', 'Requests esperando un hilo de waitress',
+              lambda: metrics._dispatcher('queue'))
+metrics.gauge('wol_waitress_active_threads', 'Hilos de waitress atendiendo un request',
+              lambda: metrics._dispatcher('active_count'))
+metrics.gauge('wol_waitress_threads', 'Hilos de waitress', lambda: metrics._dispatcher('threads'))
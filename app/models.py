@@ -1,19 +1,25 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 
+from app.pagination import prefix_filter
+
 db = SQLAlchemy()
 
 # Tabla de asociación simple para asignaciones usuario-equipo
 user_equipos = db.Table('user_equipos',
     db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
-    db.Column('equipo_id', db.Integer, db.ForeignKey('equipo.id'), primary_key=True)
+    db.Column('equipo_id', db.Integer, db.ForeignKey('equipo.id'), primary_key=True),
+    # La PK cubre user_id -> equipos; este índice cubre equipo_id -> usuarios
+    db.Index('ix_user_equipos_equipo_id', 'equipo_id')
 )
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(50), unique=True, nullable=False)
+    # Búsqueda por prefijo sin distinguir mayúsculas (?username= del listado)
+    __table_args__ = (db.Index('ix_user_username', username.collate('NOCASE')),)
     password = db.Column(db.String(60), nullable=False)
-    role = db.Column(db.String(20), default='user', nullable=False)  # 'admin' o 'user'
+    role = db.Column(db.String(20), default='user', nullable=False, index=True)  # 'admin' o 'user'
     
     # Relación muchos a muchos con equipos
     equipos_asignados = db.relationship('Equipo', 
@@ -29,20 +35,59 @@ class User(db.Model):
         """Verifica si el usuario puede acceder a un equipo específico"""
         if self.is_admin():
             return True
-        return self.equipos_asignados.filter_by(id=equipo_id).first() is not None
+        from app.permissions import permission_index
+        return permission_index.can_access(self.id, equipo_id)
+    
+    def count_equipos_permitidos(self):
+        """Cantidad de equipos accesibles sin cargarlos"""
+        if self.is_admin():
+            return Equipo.query.count()
+        from app.permissions import permission_index
+        return len(permission_index.equipo_ids(self.id))
     
     def get_equipos_permitidos(self):
         """Obtiene todos los equipos que el usuario puede acceder"""
         if self.is_admin():
             return Equipo.query.all()
-        return self.equipos_asignados.all()
+        from app.permissions import permission_index
+        return permission_index.equipos_permitidos(self.id)
+
+    @classmethod
+    def by_username(cls, username):
+        return cls.query.filter_by(username=username)
+
+    @classmethod
+    def listing_query(cls, role=None, username=None):
+        """Usuarios del listado de administración con sus filtros (sin paginar)"""
+        query = cls.query
+        if role:
+            query = query.filter(cls.role == role)
+        if username:
+            query = query.filter(prefix_filter(cls.username, username))
+        return query
 
-    def serialize(self, include_password=False):
+    @classmethod
+    def with_equipos_count(cls, query=None):
+        """
+        Query de (user, equipos_count) en una sola consulta. El conteo es
+        una subconsulta correlacionada por la PK de user_equipos: solo se
+        leen las asignaciones de los usuarios de la página, sin agrupar la
+        tabla completa.
+        """
+        conteo = db.select(db.func.count()).where(user_equipos.c.user_id == cls.id) \
+                   .correlate(cls).scalar_subquery()
+        query = query if query is not None else cls.query
+        return query.add_columns(conteo)
+
+    def serialize(self, include_password=False, equipos_count=None):
+        if equipos_count is None:
+            from app.permissions import permission_index
+            equipos_count = len(permission_index.equipo_ids(self.id))
         data = {
             'id': self.id,
             'username': self.username,
             'role': self.role,
-            'equipos_count': self.equipos_asignados.count() if hasattr(self, 'equipos_asignados') else 0
+            'equipos_count': equipos_count
         }
         if include_password:
             data['password'] = self.password
@@ -52,10 +97,37 @@ class Equipo(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nombre = db.Column(db.String(100), nullable=False)
     mac_address = db.Column(db.String(17), unique=True, nullable=False)
+    # Búsqueda por prefijo sin distinguir mayúsculas (pagination.prefix_filter)
+    __table_args__ = (db.Index('ix_equipo_nombre', nombre.collate('NOCASE')),)
     # Campos adicionales para el sistema de roles (opcionales)
     descripcion = db.Column(db.Text)
     ip_address = db.Column(db.String(15))
-    estado = db.Column(db.String(20), default='desconocido')
+    estado = db.Column(db.String(20), default='desconocido', index=True)
+    # Último sondeo persistido (poller en segundo plano o ?refresh=true)
+    checked_at = db.Column(db.DateTime)
+    rtt_ms = db.Column(db.Float)
+    # Inicio del período encendido en curso (lo mantiene app.usage)
+    encendido_desde = db.Column(db.DateTime, index=True)
+
+    @classmethod
+    def by_mac(cls, mac_address):
+        return cls.query.filter_by(mac_address=mac_address)
+
+    @classmethod
+    def listing_query(cls, user, usuario_id=None, estado=None, nombre=None):
+        """Equipos visibles para `user` con los filtros del listado (sin paginar)"""
+        from app.permissions import permission_index
+        query = cls.query
+        if not user.is_admin():
+            # Usuario normal solo ve equipos asignados
+            query = query.filter(cls.id.in_(permission_index.equipo_ids(user.id)))
+        if usuario_id is not None:
+            query = query.filter(cls.id.in_(permission_index.equipo_ids(usuario_id)))
+        if estado:
+            query = query.filter(cls.estado == estado)
+        if nombre:
+            query = query.filter(prefix_filter(cls.nombre, nombre))
+        return query
 
     def get_usuarios_asignados(self):
         """Obtiene todos los usuarios asignados a este equipo"""
@@ -72,16 +144,171 @@ class Equipo(db.Model):
             'descripcion': self.descripcion,
             'mac_address': self.mac_address,
             'ip_address': self.ip_address,
-            'estado': self.estado
+            'estado': self.estado,
+            'rtt_ms': self.rtt_ms,
+            'checked_at': self.checked_at.isoformat() + 'Z' if self.checked_at else None
         }
         
         if include_users:
-            data['usuarios_asignados'] = [u.serialize() for u in self.get_usuarios_asignados()]
-            data['usuarios_count'] = self.usuarios_asignados.count()
+            # Una consulta para los usuarios; sus conteos salen del índice de permisos
+            usuarios = self.get_usuarios_asignados()
+            data['usuarios_asignados'] = [u.serialize() for u in usuarios]
+            data['usuarios_count'] = len(usuarios)
         
         return data
 
+class Contador(db.Model):
+    """Contadores de versión compartidos entre procesos (p. ej. 'permisos')"""
+    __tablename__ = 'contador'
+
+    nombre = db.Column(db.String(50), primary_key=True)
+    valor = db.Column(db.Integer, default=0, nullable=False)
+
+    @classmethod
+    def get(cls, nombre):
+        valor = db.session.query(cls.valor).filter_by(nombre=nombre).scalar()
+        return valor or 0
+
+    @classmethod
+    def bump(cls, nombre):
+        """Incrementa el contador en la transacción actual y retorna el nuevo valor"""
+        # RETURNING: incremento y lectura en una sola sentencia
+        valor = db.session.execute(
+            db.update(cls).where(cls.nombre == nombre).values(valor=cls.valor + 1).returning(cls.valor)
+        ).scalar()
+        if valor is None:
+            db.session.add(cls(nombre=nombre, valor=1))
+            db.session.flush()
+            valor = 1
+        return valor
+
+    @classmethod
+    def set_max(cls, nombre, valor):
+        """Sube el contador a `valor` si está por debajo (en la transacción actual)"""
+        actualizados = cls.query.filter_by(nombre=nombre).update(
+            {cls.valor: db.case((cls.valor < valor, valor), else_=cls.valor)}
+        )
+        if not actualizados:
+            db.session.add(cls(nombre=nombre, valor=valor))
+
+class CambioEquipo(db.Model):
+    """
+    Registro de cambios de la flota para la sincronización incremental.
+    Sin claves foráneas: las bajas deben seguir registradas.
+    """
+    __tablename__ = 'cambio_equipo'
+
+    TIPOS = ('upsert', 'delete', 'unassign')
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, index=True)
+    equipo_id = db.Column(db.Integer, nullable=False)
+    # Usuario afectado en asignaciones, desasignaciones y bajas (None = solo admin)
+    user_id = db.Column(db.Integer, nullable=True)
+    tipo = db.Column(db.String(10), nullable=False)
+
+class MuestraEquipo(db.Model):
+    """
+    Historial crudo de sondeos (solo se agrega). Compacto: timestamp en
+    segundos epoch, estado codificado y clave (equipo_id, ts) sin rowid.
+    """
+    __tablename__ = 'muestra_equipo'
+    __table_args__ = {'sqlite_with_rowid': False}
+
+    # Códigos de estado; cualquier otro valor se guarda como desconocido
+    ESTADOS = {'apagado': 0, 'encendido': 1}
+    DESCONOCIDO = 2
+
+    equipo_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    ts = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    estado = db.Column(db.SmallInteger, nullable=False)
+    rtt_ms = db.Column(db.Float)
+
+class MuestraEquipoHora(db.Model):
+    """Historial reducido a una fila por equipo y hora"""
+    __tablename__ = 'muestra_equipo_hora'
+    __table_args__ = {'sqlite_with_rowid': False}
+
+    equipo_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    hora = db.Column(db.Integer, primary_key=True, autoincrement=False)  # epoch del inicio de la hora
+    muestras = db.Column(db.Integer, nullable=False)
+    encendidas = db.Column(db.Integer, nullable=False)
+    rtt_avg_ms = db.Column(db.Float)
+    rtt_max_ms = db.Column(db.Float)
+
+class UsoEquipoDia(db.Model):
+    """Acumulados diarios (UTC) por equipo, actualizados con cada transición y encendido"""
+    __tablename__ = 'uso_equipo_dia'
+
+    equipo_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    dia = db.Column(db.Date, primary_key=True, index=True)
+    segundos_encendido = db.Column(db.Integer, nullable=False, default=0)
+    encendidos = db.Column(db.Integer, nullable=False, default=0)  # transiciones de apagado a encendido
+    wakes = db.Column(db.Integer, nullable=False, default=0)  # paquetes mágicos pedidos
+
+class UsoUsuarioDia(db.Model):
+    """Encendidos pedidos por cada usuario y día (UTC)"""
+    __tablename__ = 'uso_usuario_dia'
+
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    dia = db.Column(db.Date, primary_key=True, index=True)
+    wakes = db.Column(db.Integer, nullable=False, default=0)
+
+class WakeJob(db.Model):
+    """Trabajo de encendido: envía el paquete, reintenta y verifica que el equipo responda"""
+    __tablename__ = 'wake_job'
+
+    ESTADOS_ACTIVOS = ('queued', 'sent', 'booting')
+
+    id = db.Column(db.Integer, primary_key=True)
+    equipo_id = db.Column(db.Integer, db.ForeignKey('equipo.id', ondelete='CASCADE'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    estado = db.Column(db.String(20), default='queued', nullable=False, index=True)  # queued/sent/booting/up/failed/unverified
+    intentos = db.Column(db.Integer, default=0, nullable=False)
+    error = db.Column(db.String(200))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = db.Column(db.DateTime)
+    last_sent_at = db.Column(db.DateTime)
+    up_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    @classmethod
+    def active(cls):
+        return cls.query.filter(cls.estado.in_(cls.ESTADOS_ACTIVOS))
+
+    def serialize(self):
+        def iso(valor):
+            return valor.isoformat() + 'Z' if valor else None
+
+        def ms(desde, hasta):
+            if desde and hasta:
+                return int((hasta - desde).total_seconds() * 1000)
+            return None
+
+        return {
+            'id': self.id,
+            'equipo_id': self.equipo_id,
+            'user_id': self.user_id,
+            'estado': self.estado,
+            'intentos': self.intentos,
+            'error': self.error,
+            'created_at': iso(self.created_at),
+            'sent_at': iso(self.sent_at),
+            'up_at': iso(self.up_at),
+            'finished_at': iso(self.finished_at),
+            'timings': {
+                'queued_ms': ms(self.created_at, self.sent_at),
+                'boot_ms': ms(self.sent_at, self.up_at),
+                'total_ms': ms(self.created_at, self.finished_at)
+            }
+        }
+
 # Estructura final simplificada para producción:
 # - user: id, username, password, role  
-# - equipo: id, nombre, mac_address, descripcion?, ip_address?, estado?
-# - user_equipos: user_id, equipo_id (tabla de asociación simple)
\ No newline at end of file
+# - equipo: id, nombre, mac_address, descripcion?, ip_address?, estado?, checked_at?, rtt_ms?, encendido_desde?
+# - user_equipos: user_id, equipo_id (tabla de asociación simple)
+# - wake_job: trabajos de encendido persistidos (sobreviven reinicios)
+# - contador: nombre, valor (versiones para invalidar cachés entre procesos)
+# - cambio_equipo: version, equipo_id, user_id?, tipo (log de la sincronización incremental)
+# - muestra_equipo / muestra_equipo_hora: historial de sondeos (crudo y por hora)
+# - uso_equipo_dia / uso_usuario_dia: acumulados diarios para GET /api/admin/reportes/uso
\ No newline at end of file
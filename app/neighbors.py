@@ -0,0 +1,139 @@
+"""
+Tabla de vecinos (ARP) en memoria para resolver MAC -> IP sin lanzar un
+proceso por cada equipo.
+"""
+
+import re
+import subprocess
+import threading
+import time
+from collections import namedtuple
+
+from app.metrics import arp_refresh_duration
+from app.timing import span
+
+PROC_NET_ARP = '/proc/net/arp'
+
+# Flags de /proc/net/arp (include/uapi/linux/if_arp.h)
+ATF_COM = 0x02
+ATF_PERM = 0x04
+
+_IP_RE = re.compile(r'(\d{1,3}(?:\.\d{1,3}){3})')
+_MAC_RE = re.compile(r'([0-9a-fA-F]{1,2}(?:[:-][0-9a-fA-F]{1,2}){5})')
+
+NeighborEntry = namedtuple('NeighborEntry', ['ip', 'state', 'seen_at'])
+
+
+def normalizar_mac(mac):
+    """Normaliza una MAC al formato aa-bb-cc-dd-ee-ff (el mismo de formatearMac)"""
+    partes = re.split(r'[:-]', mac.strip())
+    if len(partes) == 6:
+        return '-'.join(p.zfill(2) for p in partes).lower()
+    return mac.replace(':', '-').lower()
+
+
+def _parse_proc_net_arp(contenido):
+    """Parsea el contenido de /proc/net/arp"""
+    entradas = {}
+    for line in contenido.splitlines()[1:]:
+        parts = line.split()
+        if len(parts) < 4:
+            continue
+        ip_address, flags, mac = parts[0], parts[2], parts[3]
+        try:
+            flags = int(flags, 16)
+        except ValueError:
+            continue
+        if mac == '00:00:00:00:00:00':
+            continue
+        if flags & ATF_PERM:
+            state = 'permanent'
+        elif flags & ATF_COM:
+            state = 'reachable'
+        else:
+            state = 'incomplete'
+        entradas[normalizar_mac(mac)] = (ip_address, state)
+    return entradas
+
+
+def _parse_arp_a(salida):
+    """Parsea la salida de `arp -a` (formato Windows o BSD/Linux)"""
+    entradas = {}
+    for line in salida.splitlines():
+        ip_match = _IP_RE.search(line)
+        mac_match = _MAC_RE.search(line)
+        if not ip_match or not mac_match:
+            continue
+        resto = line[mac_match.end():].split()
+        # Windows: "192.168.1.10   aa-bb-cc-dd-ee-ff   dinámico"
+        state = resto[0].lower() if resto and not resto[0].startswith('[') else 'reachable'
+        entradas[normalizar_mac(mac_match.group(1))] = (ip_match.group(1), state)
+    return entradas
+
+
+class NeighborTable:
+    """
+    Índice MAC -> (IP, estado, visto_en) construido a partir de la tabla
+    ARP del kernel. Se relee como máximo una vez por TTL y la búsqueda es
+    un acceso a diccionario.
+    """
+
+    def __init__(self, ttl=5.0):
+        self.ttl = ttl
+        self._entries = {}
+        self._loaded_at = float('-inf')
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault('ARP_CACHE_TTL', self.ttl)
+        self.ttl = app.config['ARP_CACHE_TTL']
+
+    def _leer_tabla(self):
+        try:
+            with open(PROC_NET_ARP) as f:
+                return _parse_proc_net_arp(f.read())
+        except OSError:
+            pass
+        try:
+            salida = subprocess.check_output(['arp', '-a'], text=True, stderr=subprocess.DEVNULL)
+        except (OSError, subprocess.CalledProcessError):
+            return {}
+        return _parse_arp_a(salida)
+
+    def refresh(self):
+        """Relee la tabla ARP y reemplaza el índice completo"""
+        with arp_refresh_duration.time(), span('arp'):
+            entradas = self._leer_tabla()
+        ahora = time.time()
+        nuevas = {
+            mac: NeighborEntry(ip_address, state, ahora)
+            for mac, (ip_address, state) in entradas.items()
+        }
+        self._entries = nuevas
+        self._loaded_at = time.monotonic()
+        return nuevas
+
+    def _asegurar_vigente(self):
+        if time.monotonic() - self._loaded_at < self.ttl:
+            return
+        with self._lock:
+            # Otro hilo pudo refrescar mientras esperábamos el lock
+            if time.monotonic() - self._loaded_at >= self.ttl:
+                self.refresh()
+
+    def lookup(self, mac_address):
+        """Retorna la NeighborEntry de una MAC o None"""
+        self._asegurar_vigente()
+        return self._entries.get(normalizar_mac(mac_address))
+
+    def get_ip(self, mac_address):
+        entry = self.lookup(mac_address)
+        if entry is None or entry.state == 'incomplete':
+            return None
+        return entry.ip
+
+    def invalidate(self):
+        self._loaded_at = float('-inf')
+
+
+neighbor_table = NeighborTable()
@@ -0,0 +1,93 @@
+"""
+Paginación por cursor (keyset sobre id) y selección de campos para los
+listados de la API.
+"""
+
+from flask import current_app, request
+from sqlalchemy import and_, func
+
+
+class ParametroInvalido(ValueError):
+    """Parámetro de query inválido; los endpoints responden 400"""
+
+
+def parse_int_arg(nombre, minimo=None):
+    valor = request.args.get(nombre)
+    if valor is None or valor == '':
+        return None
+    try:
+        valor = int(valor)
+    except ValueError:
+        raise ParametroInvalido(f'{nombre} debe ser un entero')
+    if minimo is not None and valor < minimo:
+        raise ParametroInvalido(f'{nombre} debe ser mayor o igual a {minimo}')
+    return valor
+
+
+def parse_fields(permitidos):
+    """Campos pedidos con ?fields=a,b (None = todos)"""
+    valor = request.args.get('fields')
+    if not valor:
+        return None
+    campos = {campo.strip() for campo in valor.split(',') if campo.strip()}
+    desconocidos = campos - set(permitidos)
+    if desconocidos:
+        raise ParametroInvalido(f"Campos desconocidos: {', '.join(sorted(desconocidos))}")
+    # El id siempre se incluye: es el cursor
+    return campos | {'id'}
+
+
+def select_fields(data, campos):
+    if campos is None:
+        return data
+    return {clave: valor for clave, valor in data.items() if clave in campos}
+
+
+def paginate_keyset(query, columna, cursor=lambda fila: fila.id, contar=None):
+    """
+    Aplica ?after=<id>&limit=<n> ordenando por `columna`. Sin limit se
+    devuelven todas las filas (compatibilidad con clientes existentes).
+    Retorna (filas, next_cursor, total); `cursor` extrae el id de una fila.
+    total cuenta todas las filas que pasan los filtros, no solo la página:
+    `contar` es la query a contar si `query` agrega columnas (por defecto
+    la misma `query`).
+    """
+    after = parse_int_arg('after')
+    limit = parse_int_arg('limit', minimo=1)
+    if limit is not None:
+        limit = min(limit, current_app.config['API_MAX_PAGE_SIZE'])
+
+    filtrada = contar if contar is not None else query
+    filas = keyset_page(query, columna, after, limit).all()
+    if limit is None or len(filas) <= limit:
+        # Sin cursor la respuesta ya es el total: no hace falta COUNT
+        total = len(filas) if after is None else count_query(filtrada, columna).scalar()
+        return filas, None, total
+    filas = filas[:limit]
+    return filas, cursor(filas[-1]), count_query(filtrada, columna).scalar()
+
+
+def keyset_page(query, columna, after=None, limit=None):
+    """Query de una página; con limit pide una fila extra que indica si hay otra página"""
+    query = query.order_by(columna)
+    if after is not None:
+        query = query.filter(columna > after)
+    if limit is not None:
+        query = query.limit(limit + 1)
+    return query
+
+
+def count_query(query, columna):
+    # count(columna) y no count(*): la columna fija el FROM aunque no haya filtros
+    return query.order_by(None).with_entities(func.count(columna))
+
+
+def prefix_filter(columna, prefijo):
+    """
+    Prefijo sin distinguir mayúsculas (ASCII, como LIKE) expresado como
+    rango COLLATE NOCASE para que SQLite use el índice de la columna.
+    NOCASE es propio de SQLite (ver app/sqlite_pragmas.py).
+    """
+    columna = columna.collate('NOCASE')
+    return and_(columna >= prefijo, columna < prefijo + '\U0010ffff')
+
@@ -0,0 +1,114 @@
+"""
+Hash y verificación de contraseñas fuera de los hilos de waitress.
+
+bcrypt es deliberadamente lento: una ráfaga de logins al inicio del turno
+ocupaba todos los hilos del servidor y bloqueaba el resto de los requests
+(incluidos los encendidos). Aquí el trabajo pasa por un pool acotado con
+una cola limitada; si está lleno se rechaza de inmediato con
+PasswordHasherBusy (los endpoints responden 503) en lugar de encolar hilos.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from flask_bcrypt import Bcrypt
+
+from app.metrics import bcrypt_duration
+from app.models import db
+
+
+class PasswordHasherBusy(Exception):
+    """El pool de contraseñas está saturado; reintentar más tarde"""
+
+
+class PasswordHasher:
+
+    def __init__(self, max_workers=2, queue_size=4, timeout=10.0):
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.rounds = 12
+        self._bcrypt = Bcrypt()
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault('BCRYPT_LOG_ROUNDS', self.rounds)
+        app.config.setdefault('PASSWORD_WORKERS', self.max_workers)
+        app.config.setdefault('PASSWORD_QUEUE_SIZE', self.queue_size)
+        app.config.setdefault('PASSWORD_TIMEOUT', self.timeout)
+        self.max_workers = app.config['PASSWORD_WORKERS']
+        self.queue_size = app.config['PASSWORD_QUEUE_SIZE']
+        self.timeout = app.config['PASSWORD_TIMEOUT']
+        self.rounds = app.config['BCRYPT_LOG_ROUNDS']
+        self._bcrypt.init_app(app)
+
+    @staticmethod
+    def _medir(operacion, fn, *args):
+        inicio = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            bcrypt_duration.observe(time.perf_counter() - inicio, operacion)
+
+    def _submit(self, operacion, fn, *args):
+        if self._executor is None:
+            # Creación diferida: el pool no debe existir antes de un fork
+            with self._lock:
+                if self._executor is None:
+                    self._slots = threading.BoundedSemaphore(self.max_workers + self.queue_size)
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix='passwords'
+                    )
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy()
+        try:
+            future = self._executor.submit(self._medir, operacion, fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise PasswordHasherBusy()
+
+    def hash(self, password):
+        """Hash bcrypt con el costo configurado (BCRYPT_LOG_ROUNDS)"""
+        return self._submit('hash', self._bcrypt.generate_password_hash, password).decode('utf-8')
+
+    def check(self, pw_hash, password):
+        return self._submit('check', self._bcrypt.check_password_hash, pw_hash, password)
+
+    def needs_rehash(self, pw_hash):
+        """True si el hash se generó con otro costo ($2b$<costo>$...)"""
+        try:
+            return int(pw_hash.split('$')[2]) != self.rounds
+        except (AttributeError, IndexError, ValueError):
+            return False
+
+    def check_user(self, user, password):
+        """
+        Verifica la contraseña del usuario. Si es correcta y el costo cambió,
+        guarda un hash nuevo; si el pool está ocupado se deja para el próximo login.
+        """
+        if not self.check(user.password, password):
+            return False
+        if self.needs_rehash(user.password):
+            try:
+                user.password = self.hash(password)
+                db.session.commit()
+            except PasswordHasherBusy:
+                db.session.rollback()
+        return True
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+password_hasher = PasswordHasher()
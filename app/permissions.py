@@ -0,0 +1,105 @@
+"""
+Índice en memoria de permisos: user_id -> frozenset(equipo_ids).
+
+Se construye con una sola consulta sobre user_equipos y se actualiza en
+forma incremental cuando este proceso asigna o desasigna equipos. Cada
+cambio incrementa el contador 'permisos' en la base de datos; los demás
+procesos (workers, comandos CLI) lo comparan cada CHECK_INTERVAL segundos
+y reconstruyen el índice si quedaron atrás.
+"""
+
+import threading
+import time
+
+from app.models import Contador, Equipo, db, user_equipos
+
+CONTADOR = 'permisos'
+
+
+class PermissionIndex:
+
+    def __init__(self, check_interval=5.0):
+        self.check_interval = check_interval
+        self._sets = {}
+        self._version = None
+        self._checked_at = float('-inf')
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault('PERMISSION_INDEX_CHECK_INTERVAL', self.check_interval)
+        self.check_interval = app.config['PERMISSION_INDEX_CHECK_INTERVAL']
+
+    def _rebuild(self, version):
+        sets = {}
+        for user_id, equipo_id in db.session.execute(
+            db.select(user_equipos.c.user_id, user_equipos.c.equipo_id)
+        ):
+            sets.setdefault(user_id, set()).add(equipo_id)
+        self._sets = {user_id: frozenset(ids) for user_id, ids in sets.items()}
+        self._version = version
+
+    def version(self):
+        """Versión vigente; consulta la base como máximo una vez por intervalo"""
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            with self._lock:
+                if time.monotonic() - self._checked_at >= self.check_interval:
+                    version = Contador.get(CONTADOR)
+                    if version != self._version:
+                        self._rebuild(version)
+                    self._checked_at = time.monotonic()
+        return self._version
+
+    def equipo_ids(self, user_id):
+        self.version()
+        return self._sets.get(user_id, frozenset())
+
+    def can_access(self, user_id, equipo_id):
+        try:
+            equipo_id = int(equipo_id)
+        except (TypeError, ValueError):
+            return False
+        return equipo_id in self.equipo_ids(user_id)
+
+    def equipos_permitidos(self, user_id):
+        ids = self.equipo_ids(user_id)
+        if not ids:
+            return []
+        return Equipo.query.filter(Equipo.id.in_(ids)).all()
+
+    def bump(self):
+        """Incrementa la versión dentro de la transacción actual (llamar antes del commit)"""
+        return Contador.bump(CONTADOR)
+
+    def apply(self, version, added=(), removed=(), removed_equipos=()):
+        """
+        Aplica un cambio ya confirmado. added/removed son pares
+        (user_id, equipo_id); removed_equipos son equipos eliminados. Si el
+        índice no estaba en la versión anterior, se fuerza la reconstrucción.
+        """
+        with self._lock:
+            if self._version != version - 1:
+                self._checked_at = float('-inf')
+                return
+            sets = dict(self._sets)
+            cambios = {}
+            for user_id, equipo_id in added:
+                cambios.setdefault(user_id, set(sets.get(user_id, ()))).add(equipo_id)
+            for user_id, equipo_id in removed:
+                cambios.setdefault(user_id, set(sets.get(user_id, ()))).discard(equipo_id)
+            if removed_equipos:
+                removed_equipos = set(removed_equipos)
+                for user_id, ids in sets.items():
+                    if ids & removed_equipos:
+                        cambios.setdefault(user_id, set(ids)).difference_update(removed_equipos)
+            for user_id, ids in cambios.items():
+                sets[user_id] = frozenset(ids)
+            self._sets = sets
+            self._version = version
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+            self._checked_at = float('-inf')
+
+
+permission_index = PermissionIndex()
@@ -0,0 +1,155 @@
+"""
+Poller en segundo plano que mantiene actualizado el estado persistido de
+los equipos para que los endpoints de lectura no sondeen la red.
+"""
+
+import datetime
+import threading
+
+from flask import request
+
+from app.events import event_broker
+from app.history import probe_history
+from app.models import Equipo, db
+from app.probing import ESTADO_PENDIENTE, apply_result, fleet_prober
+from app.timing import span
+from app.usage import usage_rollups
+from app.versions import bump_probe_versions
+
+
+def refresh_requested():
+    """True si el request pide un sondeo en vivo (?refresh=true)"""
+    return request.args.get('refresh', '').lower() in ('1', 'true', 'yes', 'si')
+
+
+class StatusPoller:
+    """
+    Sondea todos los equipos cada `interval` segundos y persiste estado,
+    IP, RTT y checked_at. Mientras no esté corriendo (p. ej. con
+    `flask run`), los endpoints siguen sondeando en vivo.
+    """
+
+    def __init__(self, interval=30.0, stale_after=None):
+        self.interval = interval
+        self.stale_after = stale_after
+        self.app = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def init_app(self, app):
+        app.config.setdefault('STATUS_POLL_INTERVAL', self.interval)
+        app.config.setdefault('STATUS_STALE_AFTER', self.stale_after)
+        self.interval = app.config['STATUS_POLL_INTERVAL']
+        # Por defecto se considera obsoleto tras perder tres ciclos
+        self.stale_after = app.config['STATUS_STALE_AFTER'] or self.interval * 3
+        self.app = app
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Inicia el hilo del poller (idempotente)"""
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='status-poller', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval)
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self.app.app_context():
+                try:
+                    self.poll_once()
+                    if probe_history.compact_due():
+                        probe_history.compact()
+                except Exception as e:
+                    db.session.rollback()
+                    self.app.logger.error(f"Error en poller de estado: {e}")
+                finally:
+                    db.session.remove()
+            self._stop.wait(self.interval)
+
+    def poll_once(self):
+        """Sondea todos los equipos y persiste el resultado. Retorna los eventos publicados."""
+        # Los más atrasados primero: si el plazo corta la cola del pool, los
+        # equipos descartados encabezan el ciclo siguiente en vez de quedar
+        # siempre al final sin sondear
+        equipos = Equipo.query.order_by(Equipo.checked_at.asc().nulls_first(), Equipo.id).all()
+        # El plazo cubre el timeout de cada sonda más la cola del pool
+        deadline = max(fleet_prober.deadline, self.interval / 2)
+        resultados = fleet_prober.probe(equipos, deadline=deadline, usar_ip_guardada=True)
+        ahora = datetime.datetime.utcnow()
+
+        cambios = []
+        persistidos = 0
+        for equipo in equipos:
+            resultado = resultados.get(equipo.id)
+            if resultado is None or resultado[1] == ESTADO_PENDIENTE:
+                continue
+            anterior = (equipo.estado, equipo.ip_address)
+            apply_result(equipo, resultado, ahora)
+            persistidos += 1
+            if anterior != (equipo.estado, equipo.ip_address):
+                cambios.append(event_broker.payload(equipo))
+        probe_history.flush()
+        usage_rollups.flush()
+        confirmar = bump_probe_versions([data['id'] for data in cambios], persistidos)
+        db.session.commit()
+        if confirmar:
+            confirmar()
+        event_broker.publish_payloads(cambios)
+        return cambios
+
+    def is_stale(self, equipo):
+        if equipo.checked_at is None:
+            return True
+        edad = (datetime.datetime.utcnow() - equipo.checked_at).total_seconds()
+        return edad > self.stale_after
+
+    def serialize_equipos(self, equipos, refresh=False, **kwargs):
+        """
+        Serializa los equipos desde el estado persistido. Con refresh (o sin
+        poller activo) los sondea en vivo y persiste el resultado.
+        """
+        equipos = list(equipos)
+        # El sondeo en vivo y las consultas se descuentan como probe / db
+        with span('serialize'):
+            if refresh or not self.running:
+                anteriores = [(equipo.estado, equipo.ip_address, equipo.checked_at) for equipo in equipos]
+                serializados = fleet_prober.serialize_equipos(equipos, **kwargs)
+                eventos = [
+                    event_broker.payload(equipo)
+                    for equipo, anterior in zip(equipos, anteriores)
+                    if anterior[:2] != (equipo.estado, equipo.ip_address)
+                ]
+                # Sin poller no hay ETags: la versión de estado solo importa con él
+                persistidos = self.running and any(
+                    anterior[2] != equipo.checked_at for equipo, anterior in zip(equipos, anteriores)
+                )
+            else:
+                serializados = [equipo.serialize(**kwargs) for equipo in equipos]
+                eventos = None
+
+            for equipo, data in zip(equipos, serializados):
+                data['stale'] = self.is_stale(equipo)
+
+        if eventos is not None:
+            # Después de serializar: el commit expira las instancias
+            probe_history.flush()
+            usage_rollups.flush()
+            confirmar = bump_probe_versions([data['id'] for data in eventos], persistidos)
+            db.session.commit()
+            if confirmar:
+                confirmar()
+            event_broker.publish_payloads(eventos)
+        return serializados
+
+
+status_poller = StatusPoller()
@@ -0,0 +1,155 @@
+"""
+Motor de sondeo concurrente para verificar el estado de varios equipos
+dentro de un mismo request.
+"""
+
+import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from app import utils
+from app.history import probe_history
+from app.usage import usage_rollups
+from app.liveness import DEFAULT_TCP_PORTS, probe_host
+from app.metrics import probe_duration
+from app.timing import span
+
+ESTADO_PENDIENTE = 'pendiente'
+
+
+class FleetProber:
+    """
+    Sondea un conjunto de equipos en paralelo usando un pool acotado y
+    compartido entre requests. Los equipos que no responden antes del
+    plazo se reportan como 'pendiente' en lugar de bloquear la respuesta.
+    """
+
+    def __init__(self, max_workers=32, deadline=2.0, method='socket',
+                 timeout_ms=1000, tcp_ports=DEFAULT_TCP_PORTS):
+        self.max_workers = max_workers
+        self.deadline = deadline
+        self.method = method
+        self.timeout_ms = timeout_ms
+        self.tcp_ports = tcp_ports
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault('PROBE_MAX_WORKERS', self.max_workers)
+        app.config.setdefault('PROBE_DEADLINE', self.deadline)
+        app.config.setdefault('PROBE_METHOD', self.method)
+        app.config.setdefault('PROBE_TIMEOUT_MS', self.timeout_ms)
+        app.config.setdefault('PROBE_TCP_PORTS', self.tcp_ports)
+        self.max_workers = app.config['PROBE_MAX_WORKERS']
+        self.deadline = app.config['PROBE_DEADLINE']
+        self.method = app.config['PROBE_METHOD']
+        self.timeout_ms = app.config['PROBE_TIMEOUT_MS']
+        self.tcp_ports = tuple(app.config['PROBE_TCP_PORTS'])
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix='probe'
+                    )
+        return self._executor
+
+    def _sondear(self, ip_address):
+        """Retorna (encendido, rtt_ms) según el método configurado"""
+        inicio = time.perf_counter()
+        resultado = 'error'
+        try:
+            if self.method == 'ping':
+                encendido, rtt_ms = utils.ping(ip_address), None
+            else:
+                sondeo = probe_host(ip_address, timeout_ms=self.timeout_ms, tcp_ports=self.tcp_ports)
+                encendido, rtt_ms = sondeo.alive, sondeo.rtt_ms
+            resultado = 'encendido' if encendido else 'apagado'
+            return encendido, rtt_ms
+        finally:
+            probe_duration.observe(time.perf_counter() - inicio, self.method, resultado)
+
+    def probe(self, equipos, deadline=None, usar_ip_guardada=False):
+        """
+        Sondea los equipos y retorna {equipo_id: (ip, estado, rtt_ms)}.
+        Los equipos sin IP conocida no se incluyen en el resultado. Con
+        usar_ip_guardada se sondea la última IP persistida cuando la MAC ya
+        no está en la tabla ARP (el tráfico del sondeo la vuelve a poblar).
+        """
+        deadline = self.deadline if deadline is None else deadline
+        limite = time.monotonic() + deadline
+
+        futures = {}
+        for equipo in equipos:
+            direccion_ip = utils.obtenerPorMac(equipo.mac_address)
+            if not direccion_ip and usar_ip_guardada:
+                direccion_ip = equipo.ip_address
+            if direccion_ip:
+                future = self.executor.submit(self._sondear, direccion_ip)
+                futures[future] = (equipo.id, direccion_ip)
+
+        resultados = {}
+        if not futures:
+            return resultados
+
+        with span('probe'):
+            done, not_done = wait(futures, timeout=max(0.0, limite - time.monotonic()))
+        for future in done:
+            equipo_id, direccion_ip = futures[future]
+            try:
+                encendido, rtt_ms = future.result()
+                estado = 'encendido' if encendido else 'apagado'
+            except Exception:
+                estado, rtt_ms = 'desconocido', None
+            resultados[equipo_id] = (direccion_ip, estado, rtt_ms)
+        for future in not_done:
+            # Los que aún no empezaron se descartan para liberar el pool
+            future.cancel()
+            equipo_id, direccion_ip = futures[future]
+            resultados[equipo_id] = (direccion_ip, ESTADO_PENDIENTE, None)
+        return resultados
+
+    def serialize_equipos(self, equipos, deadline=None, **kwargs):
+        """
+        Sondea los equipos y retorna su serialización con el estado
+        actualizado. Los resultados definitivos se aplican al modelo (el
+        llamador decide si hace commit); los pendientes solo se reflejan en
+        la respuesta.
+        """
+        equipos = list(equipos)
+        resultados = self.probe(equipos, deadline=deadline)
+        ahora = datetime.datetime.utcnow()
+
+        serializados = []
+        for equipo in equipos:
+            resultado = resultados.get(equipo.id)
+            if resultado is None:
+                serializados.append(equipo.serialize(**kwargs))
+                continue
+
+            if resultado[1] == ESTADO_PENDIENTE:
+                data = equipo.serialize(**kwargs)
+                data['estado'] = ESTADO_PENDIENTE
+            else:
+                apply_result(equipo, resultado, ahora)
+                data = equipo.serialize(**kwargs)
+            serializados.append(data)
+        return serializados
+
+
+def apply_result(equipo, resultado, checked_at):
+    """Aplica un resultado (ip, estado, rtt_ms) definitivo al modelo"""
+    direccion_ip, estado, rtt_ms = resultado
+    usage_rollups.transition(equipo, equipo.estado, estado, checked_at)
+    equipo.ip_address = direccion_ip
+    equipo.estado = estado
+    equipo.rtt_ms = round(rtt_ms, 2) if rtt_ms is not None else None
+    equipo.checked_at = checked_at
+    probe_history.record(equipo.id, estado, equipo.rtt_ms, checked_at)
+
+
+fleet_prober = FleetProber()
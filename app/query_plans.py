@@ -0,0 +1,113 @@
+"""
+Verificación con EXPLAIN QUERY PLAN de que las consultas de los endpoints
+usan un índice (comando `flask verify-indexes`).
+
+Cada chequeo arma la consulta con la misma función que usa el endpoint y
+falla si SQLite recorre completa alguna de las tablas indicadas.
+"""
+
+import datetime
+import re
+
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.assignments import assigned_ids_query
+from app.history import ProbeHistory
+from app.models import Equipo, User, WakeJob, db
+from app.pagination import count_query, keyset_page
+from app.usage import UsageRollups
+from app.versions import FleetVersion, assignments_query
+
+
+def explain(stmt):
+    """Filas 'detail' del plan de SQLite para una consulta SQLAlchemy"""
+    sql = str(stmt.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+    filas = db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}').all()
+    return [fila[-1] for fila in filas]
+
+
+def full_scans(plan, tablas):
+    """Tablas de `tablas` que el plan recorre sin índice"""
+    recorridas = []
+    for detalle in plan:
+        # SCAN (aun USING INDEX) recorre la tabla o el índice completo
+        m = re.match(r'SCAN (?:TABLE )?(\w+)', detalle)
+        # Las tablas de asociación aparecen con alias (user_equipos_1)
+        tabla = re.sub(r'_\d+$', '', m.group(1)) if m else None
+        if tabla in tablas:
+            recorridas.append(tabla)
+    return recorridas
+
+
+def checks(admin, equipo):
+    """
+    (descripción, consulta, tablas que no deben recorrerse completas). Las
+    consultas salen de las mismas funciones que usan los endpoints.
+    """
+    dia = datetime.date(2025, 1, 1)
+    return [
+        ('GET /api/equipos?estado=',
+         Equipo.listing_query(admin, estado='encendido').statement, {'equipo'}),
+        ('GET /api/equipos?nombre=',
+         Equipo.listing_query(admin, nombre='puesto').statement, {'equipo'}),
+        ('GET /api/equipos?after=&limit=',
+         keyset_page(Equipo.listing_query(admin), Equipo.id, after=100, limit=50).statement, {'equipo'}),
+        ('GET /api/equipos?estado=&limit= (total)',
+         count_query(Equipo.listing_query(admin, estado='encendido'), Equipo.id).statement, {'equipo'}),
+        ('GET /api/equipos/<id> (usuarios asignados)',
+         equipo.usuarios_asignados.statement, {'user_equipos', 'user'}),
+        ('PUT /api/admin/users/<id>/equipos', assigned_ids_query(1), {'user_equipos'}),
+        ('GET /api/admin/users?role=',
+         User.with_equipos_count(User.listing_query(role='admin')).statement, {'user', 'user_equipos'}),
+        ('GET /api/admin/users?username=',
+         User.with_equipos_count(User.listing_query(username='adm')).statement, {'user', 'user_equipos'}),
+        ('GET /api/admin/users?after=&limit=',
+         keyset_page(User.with_equipos_count(), User.id, after=100, limit=50).statement, {'user', 'user_equipos'}),
+        ('GET /api/admin/users?role=&limit= (total)',
+         count_query(User.listing_query(role='admin'), User.id).statement, {'user'}),
+        ('POST /api/auth/login', User.by_username('admin').statement, {'user'}),
+        ('POST /api/equipos (MAC duplicada)', Equipo.by_mac('AA:BB:CC:DD:EE:FF').statement, {'equipo'}),
+        ('Worker de encendido (trabajos activos)', WakeJob.active().statement, {'wake_job'}),
+        ('DELETE /api/equipos/<id> (asignaciones para el log de cambios)', assignments_query([1]), {'user_equipos'}),
+        # Sin consulta propia: la búsqueda que hace SQLite para el ON DELETE CASCADE
+        ('DELETE /api/equipos/<id> (cascada de trabajos)',
+         db.select(WakeJob.id).filter(WakeJob.equipo_id == 1), {'wake_job'}),
+        ('GET /api/equipos/changes?since=', FleetVersion.changes_query(10, 20), {'cambio_equipo'}),
+        ('GET /api/equipos/<id>/historial (crudo)', ProbeHistory.raw_query(1, 0, 3600), {'muestra_equipo'}),
+        ('GET /api/equipos/<id>/historial (por hora)',
+         ProbeHistory.hourly_query(1, 0, 3600), {'muestra_equipo_hora'}),
+        ('GET /api/equipos/<id>/historial (horas recientes)',
+         ProbeHistory.recent_hourly_query(1, 0, 3600), {'muestra_equipo'}),
+        ('GET /api/admin/reportes/uso (equipos)',
+         UsageRollups.equipos_query(dia, dia + datetime.timedelta(days=6)), {'uso_equipo_dia'}),
+        ('GET /api/admin/reportes/uso (usuarios)',
+         UsageRollups.usuarios_query(dia, dia + datetime.timedelta(days=6)), {'uso_usuario_dia'}),
+        ('GET /api/admin/reportes/uso (encendidos en curso)',
+         UsageRollups.abiertos_query(datetime.datetime(2025, 1, 8)), {'equipo'}),
+    ]
+
+
+def _persistente(objeto):
+    """
+    Asocia a la sesión un objeto de ejemplo como si se hubiera cargado,
+    sin consultar ni escribir, para que sus relaciones dinámicas armen la
+    misma query que con un objeto real.
+    """
+    make_transient_to_detached(objeto)
+    db.session.add(objeto)
+    return objeto
+
+
+def verify():
+    """Lista de (descripción, plan, tablas recorridas sin índice)"""
+    # El admin no necesita el índice de permisos; el equipo solo aporta su id
+    admin = User(id=0, username='admin', role='admin')
+    equipo = _persistente(Equipo(id=0))
+    try:
+        resultados = []
+        for descripcion, stmt, tablas in checks(admin, equipo):
+            plan = explain(stmt)
+            resultados.append((descripcion, plan, full_scans(plan, tablas)))
+        return resultados
+    finally:
+        db.session.expunge(equipo)
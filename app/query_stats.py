@@ -0,0 +1,167 @@
+"""
+Conteo de consultas por request y detección de N+1 (opcional, QUERY_STATS_ENABLED).
+
+Las relaciones dinámicas de app.models hacen fácil agregar sin querer una
+consulta por fila. Con la instrumentación activa cada request cuenta y mide
+sus sentencias; si una misma sentencia se repite QUERY_N_PLUS_ONE_THRESHOLD
+veces o más se registra como posible N+1 en el log y en /metrics. Si el
+endpoint declaró un presupuesto con @query_budget(n) y lo supera, también.
+Los tests lo verifican con tests/consultas.py (assert_query_budget).
+
+El listener de sentencias de este módulo es el único del engine: también
+mide la duración para /metrics y la fase db de Server-Timing.
+"""
+
+import contextlib
+import threading
+import time
+from collections import Counter
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+from app.metrics import db_query_duration, metrics
+from app.models import db
+from app.timing import server_timing
+
+CONSULTAS_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+queries_per_request = metrics.histogram(
+    'wol_db_queries_per_request', 'Consultas por request (con QUERY_STATS_ENABLED)',
+    ('endpoint',), buckets=CONSULTAS_BUCKETS
+)
+n_plus_one = metrics.counter(
+    'wol_db_n_plus_one_total', 'Requests con una sentencia repetida (posible N+1)', ('endpoint',)
+)
+query_budget_exceeded = metrics.counter(
+    'wol_db_query_budget_exceeded_total', 'Requests que superaron el presupuesto de consultas', ('endpoint',)
+)
+
+
+def query_budget(maximo):
+    """Declara la cantidad máxima de consultas del endpoint (aplicar bajo @route)"""
+    def decorator(f):
+        f.query_budget = maximo
+        return f
+    return decorator
+
+
+class QueryStats:
+    """Sentencias ejecutadas en un request o bloque"""
+
+    def __init__(self):
+        self.sentencias = Counter()
+        self.tiempo = 0.0
+
+    @property
+    def total(self):
+        return sum(self.sentencias.values())
+
+    def registrar(self, sentencia, segundos):
+        self.sentencias[sentencia] += 1
+        self.tiempo += segundos
+
+    def repetidas(self, umbral, solo_select=False):
+        """[(sentencia, veces)] para las que se ejecutaron al menos `umbral` veces"""
+        return [
+            (sentencia, veces) for sentencia, veces in self.sentencias.most_common()
+            if veces >= umbral and (not solo_select or sentencia.lstrip()[:6].upper() == 'SELECT')
+        ]
+
+    def resumen(self, umbral=2, largo=200):
+        lineas = [f'{self.total} consultas en {self.tiempo * 1000:.1f} ms']
+        for sentencia, veces in self.repetidas(umbral):
+            lineas.append(f'  {veces}x {" ".join(sentencia.split())[:largo]}')
+        return '\n'.join(lineas)
+
+
+class QueryInstrumentation:
+
+    def __init__(self):
+        self.enabled = False
+        self.n_plus_one_threshold = 5
+        self._capturas = ()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault('QUERY_STATS_ENABLED', self.enabled)
+        app.config.setdefault('QUERY_N_PLUS_ONE_THRESHOLD', self.n_plus_one_threshold)
+        self.enabled = app.config['QUERY_STATS_ENABLED']
+        self.n_plus_one_threshold = app.config['QUERY_N_PLUS_ONE_THRESHOLD']
+
+        with app.app_context():
+            engine = db.engine
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def iniciar_consulta(conn, cursor, statement, parameters, context, executemany):
+            # En el contexto de la sentencia: una consulta fallida no deja rastro
+            context._consulta_inicio = time.perf_counter()
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def registrar_consulta(conn, cursor, statement, parameters, context, executemany):
+            self.record(statement, time.perf_counter() - context._consulta_inicio)
+
+        if not self.enabled:
+            return
+
+        @app.before_request
+        def iniciar():
+            g.query_stats = QueryStats()
+
+        @app.after_request
+        def reportar(response):
+            stats = g.pop('query_stats', None)
+            if stats is not None:
+                self._reportar(stats, response)
+            return response
+
+    def record(self, sentencia, segundos):
+        """Cada sentencia se mide una vez: /metrics, Server-Timing, request y capturas"""
+        if metrics.enabled:
+            db_query_duration.observe(segundos)
+        server_timing.record_query(segundos)
+        if has_request_context():
+            stats = g.get('query_stats')
+            if stats is not None:
+                stats.registrar(sentencia, segundos)
+        if self._capturas:
+            with self._lock:
+                for stats in self._capturas:
+                    stats.registrar(sentencia, segundos)
+
+    @contextlib.contextmanager
+    def capture(self):
+        """with query_instrumentation.capture() as stats: sentencias de cualquier hilo (sin QUERY_STATS_ENABLED)"""
+        stats = QueryStats()
+        with self._lock:
+            self._capturas += (stats,)
+        try:
+            yield stats
+        finally:
+            with self._lock:
+                self._capturas = tuple(c for c in self._capturas if c is not stats)
+
+    def _reportar(self, stats, response):
+        endpoint = request.endpoint or 'sin_ruta'
+        queries_per_request.observe(stats.total, endpoint)
+        # N+1 son lecturas; los UPDATE por fila del sondeo en vivo no cuentan
+        repetidas = stats.repetidas(self.n_plus_one_threshold, solo_select=True)
+        vista = current_app.view_functions.get(request.endpoint)
+        maximo = getattr(vista, 'query_budget', None)
+        excedido = maximo is not None and stats.total > maximo
+
+        mensaje = f'consultas {request.method} {request.path} ({endpoint}) {response.status_code}: ' \
+                  f'{stats.total} en {stats.tiempo * 1000:.1f} ms'
+        if repetidas:
+            n_plus_one.inc(endpoint)
+            mensaje += ' - posible N+1'
+        if excedido:
+            query_budget_exceeded.inc(endpoint)
+            mensaje += f' - supera el presupuesto de {maximo}'
+        if repetidas or excedido:
+            current_app.logger.warning(mensaje + '\n' + stats.resumen(umbral=self.n_plus_one_threshold))
+        else:
+            current_app.logger.info(mensaje)
+
+
+query_instrumentation = QueryInstrumentation()
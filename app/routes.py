@@ -1,8 +1,16 @@
-from flask import Blueprint, flash, redirect, render_template, request, jsonify, session, url_for
-from wakeonlan import send_magic_packet
+import datetime
+from flask import Blueprint, current_app, flash, redirect, render_template, request, jsonify, session, url_for
 from app.models import Equipo, User, db
-from app.utils import obtenerPorMac, ping
+from app.poller import refresh_requested, status_poller
 from app.auth_middleware import token_required, admin_required, can_access_equipo
+from app.token_cache import token_cache
+from app.permissions import permission_index
+from app.history import probe_history
+from app.usage import usage_rollups
+from app.wol import send_magic_packets
+from app.jobs import wake_job_worker
+from app.versions import deleted_pairs, fleet_version
+from app.query_stats import query_budget
 
 main = Blueprint('main', __name__)
 
@@ -15,23 +23,22 @@ def home():
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
     equipos = Equipo.query.all()
+    estados = status_poller.serialize_equipos(equipos, refresh=refresh_requested())
     resultados = []
-    for equipo in equipos:
-        direccion_ip = obtenerPorMac(equipo.mac_address)
-        if direccion_ip:
-            estado = "Encendido" if ping(direccion_ip) else "Apagado"
+    for data in estados:
+        if data['ip_address']:
             resultados.append({
-                'id': equipo.id,
-                'nombre': equipo.nombre,
-                'mac_address': equipo.mac_address,
-                'ip_address': direccion_ip,
-                'estado': estado
+                'id': data['id'],
+                'nombre': data['nombre'],
+                'mac_address': data['mac_address'],
+                'ip_address': data['ip_address'],
+                'estado': data['estado'].capitalize()
             })
         else:
             resultados.append({
-                'id': equipo.id,
-                'nombre': equipo.nombre,
-                'mac_address': equipo.mac_address,
+                'id': data['id'],
+                'nombre': data['nombre'],
+                'mac_address': data['mac_address'],
                 'ip_address': "No disponible",
                 'estado': "Desconocido"
             })
@@ -41,8 +48,15 @@ def home():
 def encender_equipo(id):
     equipo = Equipo.query.get(id)
     if equipo:
+        # Mismo envío que el API: cuenta enviados y fallidos en /metrics
+        _, error = send_magic_packets([equipo.mac_address])[0]
+        if error:
+            # Como en el API, un envío fallido no suma al uso
+            flash("No se pudo encender {}: {}".format(equipo.nombre, error), 'danger')
+            return redirect(url_for('main.home'))
         flash("Equipo encendido: {} (MAC: {})".format(equipo.nombre, equipo.mac_address), 'success')
-        send_magic_packet(equipo.mac_address)
+        usage_rollups.record_wake(equipo.id, session.get('user_id'), datetime.datetime.utcnow())
+        db.session.commit()
         return redirect(url_for('main.home'))
     else:
         return "Equipo no encontrado"
@@ -52,6 +66,7 @@ def encender_equipo(id):
 # ============================================================================
 
 @main.route('/equipos', methods=['GET'])
+@query_budget(6)
 @token_required
 def get_equipos(current_user):
     """Obtiene equipos según permisos del usuario"""
@@ -63,18 +78,8 @@ def get_equipos(current_user):
             # Usuario normal solo ve equipos asignados
             equipos = current_user.get_equipos_permitidos()
         
-        # Enriquecer con información de estado
-        resultados = []
-        for equipo in equipos:
-            direccion_ip = obtenerPorMac(equipo.mac_address)
-            estado = "desconocido"
-            
-            if direccion_ip:
-                estado = "encendido" if ping(direccion_ip) else "apagado"
-                equipo.ip_address = direccion_ip
-                equipo.estado = estado
-            
-            resultados.append(equipo.serialize())
+        # Estado persistido por el poller (o sondeo en vivo con ?refresh=true)
+        resultados = status_poller.serialize_equipos(equipos, refresh=refresh_requested())
         
         return jsonify({
             'success': True,
@@ -86,6 +91,7 @@ def get_equipos(current_user):
         return jsonify({'success': False, 'message': str(e)}), 500
 
 @main.route('/equipos/<int:equipo_id>', methods=['GET'])
+@query_budget(6)
 @token_required
 @can_access_equipo
 def get_equipo(current_user, equipo_id):
@@ -94,15 +100,14 @@ def get_equipo(current_user, equipo_id):
         equipo = Equipo.query.get_or_404(equipo_id)
         include_users = current_user.is_admin()
         
-        # Actualizar estado en tiempo real
-        direccion_ip = obtenerPorMac(equipo.mac_address)
-        if direccion_ip:
-            equipo.ip_address = direccion_ip
-            equipo.estado = "encendido" if ping(direccion_ip) else "apagado"
+        # Estado persistido por el poller (o sondeo en vivo con ?refresh=true)
+        data = status_poller.serialize_equipos(
+            [equipo], refresh=refresh_requested(), include_users=include_users
+        )[0]
         
         return jsonify({
             'success': True,
-            'equipo': equipo.serialize(include_users=include_users)
+            'equipo': data
         })
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -132,7 +137,10 @@ def create_equipo(current_user):
         )
         
         db.session.add(nuevo_equipo)
+        db.session.flush()
+        version_flota = fleet_version.bump(upserts=[nuevo_equipo.id])
         db.session.commit()
+        fleet_version.confirm(version_flota)
         
         return jsonify({
             'success': True,
@@ -163,7 +171,9 @@ def update_equipo(current_user, equipo_id):
         if 'ip_address' in data:
             equipo.ip_address = data['ip_address']
         
+        version_flota = fleet_version.bump(upserts=[equipo.id])
         db.session.commit()
+        fleet_version.confirm(version_flota)
         
         return jsonify({
             'success': True,
@@ -183,9 +193,17 @@ def delete_equipo(current_user, equipo_id):
     try:
         equipo = Equipo.query.get_or_404(equipo_id)
         nombre = equipo.nombre
+        # Antes del delete: la baja se registra para quienes tenían el equipo
+        bajas = deleted_pairs([equipo_id])
         
         db.session.delete(equipo)
+        probe_history.purge(equipo_id)
+        usage_rollups.purge_equipo(equipo_id)
+        version = permission_index.bump()
+        version_flota = fleet_version.bump(deletes=bajas)
         db.session.commit()
+        fleet_version.confirm(version_flota)
+        permission_index.apply(version, removed_equipos=[equipo_id])
         
         return jsonify({
             'success': True,
@@ -204,23 +222,27 @@ def wake_equipo(current_user, equipo_id):
     try:
         equipo = Equipo.query.get_or_404(equipo_id)
         
-        # Enviar paquete Wake-on-LAN
-        send_magic_packet(equipo.mac_address)
+        # Mismo camino que POST /api/equipos/<id>/encender: el trabajo
+        # registra el uso y las métricas, reintenta y verifica el arranque
+        job = wake_job_worker.enqueue(equipo, current_user)
         
         # Log de la acción
-        print(f"Usuario {current_user.username} encendió equipo {equipo.nombre}")
+        current_app.logger.info(f"Usuario {current_user.username} encendió equipo {equipo.nombre} (job {job.id})")
         
         return jsonify({
             'success': True,
             'message': f'Comando de encendido enviado a {equipo.nombre}',
             'equipo_id': equipo_id,
-            'user': current_user.username
+            'user': current_user.username,
+            'job': job.serialize()
         })
         
     except Exception as e:
+        db.session.rollback()
         return jsonify({'success': False, 'message': str(e)}), 500
 
 @main.route('/equipos/<int:equipo_id>/estado', methods=['GET'])
+@query_budget(6)
 @token_required
 @can_access_equipo
 def get_equipo_status(current_user, equipo_id):
@@ -229,16 +251,11 @@ def get_equipo_status(current_user, equipo_id):
         equipo = Equipo.query.get_or_404(equipo_id)
         
         # Verificar estado en tiempo real
-        direccion_ip = obtenerPorMac(equipo.mac_address)
-        if direccion_ip:
-            estado = "encendido" if ping(direccion_ip) else "apagado"
-            equipo.ip_address = direccion_ip
-            equipo.estado = estado
-            db.session.commit()
+        data = status_poller.serialize_equipos([equipo], refresh=True)[0]
         
         return jsonify({
             'success': True,
-            'equipo': equipo.serialize()
+            'equipo': data
         })
         
     except Exception as e:
@@ -249,15 +266,16 @@ def get_equipo_status(current_user, equipo_id):
 # ============================================================================
 
 @main.route('/admin/users', methods=['GET'])
+@query_budget(4)
 @token_required
 @admin_required
 def get_all_users(current_user):
     """Obtiene todos los usuarios (solo admin)"""
     try:
-        users = User.query.all()
+        users = User.with_equipos_count().all()
         return jsonify({
             'success': True,
-            'users': [user.serialize() for user in users],
+            'users': [user.serialize(equipos_count=count) for user, count in users],
             'total': len(users)
         })
     except Exception as e:
@@ -324,7 +342,7 @@ def assign_equipo_to_user(current_user):
         equipo = Equipo.query.get_or_404(equipo_id)
         
         # Verificar si ya está asignado
-        if equipo in user.equipos_asignados:
+        if permission_index.can_access(user.id, equipo.id):
             return jsonify({
                 'success': False,
                 'message': f'El equipo {equipo.nombre} ya está asignado a {user.username}'
@@ -334,7 +352,12 @@ def assign_equipo_to_user(current_user):
         user.equipos_asignados.append(equipo)
         
         # Asignación básica (metadatos simplificados)
+        version = permission_index.bump()
+        version_flota = fleet_version.bump(assigned=[(user.id, equipo.id)])
         db.session.commit()
+        fleet_version.confirm(version_flota)
+        permission_index.apply(version, added=[(user.id, equipo.id)])
+        token_cache.invalidate_user(user.id)
         
         return jsonify({
             'success': True,
@@ -360,7 +383,7 @@ def unassign_equipo_from_user(current_user):
         user = User.query.get_or_404(user_id)
         equipo = Equipo.query.get_or_404(equipo_id)
         
-        if equipo not in user.equipos_asignados:
+        if not permission_index.can_access(user.id, equipo.id):
             return jsonify({
                 'success': False,
                 'message': f'El equipo {equipo.nombre} no está asignado a {user.username}'
@@ -370,7 +393,12 @@ def unassign_equipo_from_user(current_user):
         user.equipos_asignados.remove(equipo)
         
         # Desasignación automática con la relación
+        version = permission_index.bump()
+        version_flota = fleet_version.bump(unassigned=[(user.id, equipo.id)])
         db.session.commit()
+        fleet_version.confirm(version_flota)
+        permission_index.apply(version, removed=[(user.id, equipo.id)])
+        token_cache.invalidate_user(user.id)
         
         return jsonify({
             'success': True,
@@ -386,16 +414,17 @@ def unassign_equipo_from_user(current_user):
 # ============================================================================
 
 @main.route('/me', methods=['GET'])
+@query_budget(3)
 @token_required
 def get_current_user_info(current_user):
     """Obtiene información del usuario actual"""
     try:
-        equipos = current_user.get_equipos_permitidos()
+        equipos_count = current_user.count_equipos_permitidos()
         
         return jsonify({
             'success': True,
             'user': current_user.serialize(),
-            'equipos_count': len(equipos),
+            'equipos_count': equipos_count,
             'permissions': {
                 'is_admin': current_user.is_admin(),
                 'can_create_equipos': current_user.is_admin(),
@@ -0,0 +1,75 @@
+"""
+Ajustes de SQLite aplicados a cada conexión nueva del engine.
+
+Con el journal por defecto (DELETE) un commit bloquea a los lectores y,
+con varios hilos de waitress, aparece "database is locked". En modo WAL
+los lectores leen la última versión confirmada mientras otro hilo
+escribe; busy_timeout hace que los escritores esperen en lugar de fallar.
+
+La aplicación solo soporta SQLite: el índice ix_equipo_nombre y
+pagination.prefix_filter usan COLLATE NOCASE, usage.py hace upserts con
+el INSERT ... ON CONFLICT del dialecto sqlite y query_plans.py lee
+EXPLAIN QUERY PLAN. init_app falla al iniciar con otro motor en lugar de
+hacerlo en la primera migración o consulta.
+"""
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from app.models import db
+
+# Opciones de QueuePool; una base en memoria usa StaticPool y las rechaza
+POOL_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout')
+
+
+def _pragmas(config):
+    return [
+        # Primero: cambiar journal_mode puede esperar un lock y debe respetar
+        # el timeout configurado, no el de 5 s del driver
+        ('busy_timeout', int(config['SQLITE_BUSY_TIMEOUT_MS'])),
+        ('journal_mode', config['SQLITE_JOURNAL_MODE']),
+        ('synchronous', config['SQLITE_SYNCHRONOUS']),
+        # Negativo = tamaño en KiB
+        ('cache_size', -int(config['SQLITE_CACHE_SIZE_KB'])),
+        ('mmap_size', int(config['SQLITE_MMAP_SIZE'])),
+        ('foreign_keys', 'ON' if config['SQLITE_FOREIGN_KEYS'] else 'OFF'),
+    ]
+
+
+def configure_pool(app):
+    """Antes de db.init_app: sin opciones de pool para una base en memoria (sqlite://)"""
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    if url.database not in (None, '', ':memory:'):
+        return
+    opciones = app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        clave: valor for clave, valor in opciones.items() if clave not in POOL_OPTIONS
+    }
+
+
+def init_app(app):
+    """Registra el hook de conexión; RuntimeError si la base no es SQLite"""
+    app.config.setdefault('SQLITE_JOURNAL_MODE', 'WAL')
+    app.config.setdefault('SQLITE_SYNCHRONOUS', 'NORMAL')
+    app.config.setdefault('SQLITE_BUSY_TIMEOUT_MS', 5000)
+    app.config.setdefault('SQLITE_CACHE_SIZE_KB', 20000)
+    app.config.setdefault('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)
+    app.config.setdefault('SQLITE_FOREIGN_KEYS', True)
+    pragmas = _pragmas(app.config)
+
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        raise RuntimeError(
+            f'Motor de base de datos no soportado: {engine.dialect.name} '
+            '(SQLALCHEMY_DATABASE_URI/DATABASE_URL debe ser sqlite:///...)'
+        )
+
+    @event.listens_for(engine, 'connect')
+    def aplicar_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for nombre, valor in pragmas:
+                cursor.execute(f'PRAGMA {nombre}={valor}')
+        finally:
+            cursor.close()
@@ -0,0 +1,158 @@
+"""
+Limitación de intentos de login en memoria, antes de que corra bcrypt.
+
+Cada IP y cada nombre de usuario tienen un token bucket (rate por minuto y
+ráfaga máxima). Además, tras LOGIN_BACKOFF_AFTER fallos seguidos de un
+usuario, los siguientes intentos esperan un tiempo que se duplica con cada
+fallo hasta LOGIN_BACKOFF_MAX. Las entradas inactivas se descartan en
+forma periódica y la tabla tiene un tamaño máximo.
+"""
+
+import threading
+import time
+
+
+class _Entrada:
+    __slots__ = ('tokens', 'updated_at', 'failures', 'blocked_until')
+
+    def __init__(self, tokens, ahora):
+        self.tokens = tokens
+        self.updated_at = ahora
+        self.failures = 0
+        self.blocked_until = 0.0
+
+
+class LoginThrottle:
+
+    def __init__(self, ip_rate=30, ip_burst=10, user_rate=10, user_burst=5,
+                 backoff_after=3, backoff_base=1.0, backoff_max=300.0,
+                 max_entries=10000, evict_interval=60.0):
+        self.ip_rate = ip_rate
+        self.ip_burst = ip_burst
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.backoff_after = backoff_after
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_entries = max_entries
+        self.evict_interval = evict_interval
+        self.enabled = True
+        self._entries = {}
+        self._evicted_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault('LOGIN_THROTTLE_ENABLED', self.enabled)
+        app.config.setdefault('LOGIN_RATE_PER_IP', self.ip_rate)
+        app.config.setdefault('LOGIN_BURST_PER_IP', self.ip_burst)
+        app.config.setdefault('LOGIN_RATE_PER_USER', self.user_rate)
+        app.config.setdefault('LOGIN_BURST_PER_USER', self.user_burst)
+        app.config.setdefault('LOGIN_BACKOFF_AFTER', self.backoff_after)
+        app.config.setdefault('LOGIN_BACKOFF_BASE', self.backoff_base)
+        app.config.setdefault('LOGIN_BACKOFF_MAX', self.backoff_max)
+        app.config.setdefault('LOGIN_THROTTLE_MAX_ENTRIES', self.max_entries)
+        self.enabled = app.config['LOGIN_THROTTLE_ENABLED']
+        self.ip_rate = app.config['LOGIN_RATE_PER_IP']
+        self.ip_burst = app.config['LOGIN_BURST_PER_IP']
+        self.user_rate = app.config['LOGIN_RATE_PER_USER']
+        self.user_burst = app.config['LOGIN_BURST_PER_USER']
+        self.backoff_after = app.config['LOGIN_BACKOFF_AFTER']
+        self.backoff_base = app.config['LOGIN_BACKOFF_BASE']
+        self.backoff_max = app.config['LOGIN_BACKOFF_MAX']
+        self.max_entries = app.config['LOGIN_THROTTLE_MAX_ENTRIES']
+
+    def _limites(self, clave):
+        # Rates por minuto -> tokens por segundo
+        if clave[0] == 'ip':
+            return self.ip_rate / 60.0, self.ip_burst
+        return self.user_rate / 60.0, self.user_burst
+
+    def _entrada(self, clave, ahora):
+        """Entrada con los tokens recargados hasta `ahora` (llamar con el lock)"""
+        rate, burst = self._limites(clave)
+        entrada = self._entries.get(clave)
+        if entrada is None:
+            if len(self._entries) >= self.max_entries:
+                self._evict(ahora, forzar=True)
+            entrada = self._entries[clave] = _Entrada(burst, ahora)
+        else:
+            entrada.tokens = min(burst, entrada.tokens + (ahora - entrada.updated_at) * rate)
+            entrada.updated_at = ahora
+        return entrada
+
+    @staticmethod
+    def _claves(ip, username):
+        claves = [('ip', ip or '-')]
+        if username:
+            claves.append(('user', username.strip().lower()))
+        return claves
+
+    def check(self, ip, username):
+        """
+        Consume un intento. Retorna 0 si se permite, o los segundos que el
+        cliente debe esperar (sin consumir tokens).
+        """
+        if not self.enabled:
+            return 0
+        ahora = time.monotonic()
+        with self._lock:
+            if ahora - self._evicted_at >= self.evict_interval:
+                self._evict(ahora)
+            entradas = [(clave, self._entrada(clave, ahora)) for clave in self._claves(ip, username)]
+            espera = 0.0
+            for clave, entrada in entradas:
+                rate, _ = self._limites(clave)
+                if entrada.tokens < 1:
+                    espera = max(espera, (1 - entrada.tokens) / rate if rate else self.backoff_max)
+                espera = max(espera, entrada.blocked_until - ahora)
+            if espera > 0:
+                return espera
+            for _, entrada in entradas:
+                entrada.tokens -= 1
+            return 0
+
+    def failure(self, ip, username):
+        """Registra un login fallido: backoff exponencial por usuario"""
+        if not self.enabled or not username:
+            return
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._entrada(('user', username.strip().lower()), ahora)
+            entrada.failures += 1
+            excedidos = entrada.failures - self.backoff_after
+            if excedidos > 0:
+                espera = min(self.backoff_base * 2 ** (excedidos - 1), self.backoff_max)
+                entrada.blocked_until = ahora + espera
+
+    def success(self, ip, username):
+        if not self.enabled or not username:
+            return
+        with self._lock:
+            entrada = self._entries.get(('user', username.strip().lower()))
+            if entrada is not None:
+                entrada.failures = 0
+                entrada.blocked_until = 0.0
+
+    def _evict(self, ahora, forzar=False):
+        """Descarta entradas que volverían a su estado inicial (llamar con el lock)"""
+        inactivas = []
+        for clave, entrada in self._entries.items():
+            rate, burst = self._limites(clave)
+            recargada = entrada.tokens + (ahora - entrada.updated_at) * rate >= burst
+            if recargada and entrada.blocked_until <= ahora and (
+                    entrada.failures == 0 or ahora - entrada.updated_at >= self.backoff_max):
+                inactivas.append(clave)
+        for clave in inactivas:
+            del self._entries[clave]
+        if forzar and len(self._entries) >= self.max_entries:
+            # Tabla llena de entradas activas: se descartan las más antiguas
+            for clave in list(self._entries)[:len(self._entries) - self.max_entries + 1]:
+                del self._entries[clave]
+        self._evicted_at = ahora
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+login_throttle = LoginThrottle()
@@ -0,0 +1,170 @@
+"""
+Desglose del tiempo de cada request en el header Server-Timing.
+
+Las fases (auth, db, arp, probe, serialize) se miden con `span(nombre)`.
+Los spans anidados descuentan el tiempo de sus hijos, así que cada fase
+reporta solo su propio tiempo: una consulta hecha al serializar cuenta
+como db y no como serialize. Fuera de un request (poller, worker) los
+spans no hacen nada. Con SERVER_TIMING_LOG_THRESHOLD_MS, o un presupuesto
+por endpoint en SERVER_TIMING_BUDGETS_MS, los requests más lentos se
+registran además como una línea JSON en el log.
+"""
+
+import json
+import time
+
+from flask import g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+# Orden de las fases en el header; las demás van después
+FASES = ('auth', 'db', 'arp', 'probe', 'serialize')
+
+
+class _Nodo:
+    __slots__ = ('nombre', 'inicio', 'hijos')
+
+    def __init__(self, nombre, inicio):
+        self.nombre = nombre
+        self.inicio = inicio
+        self.hijos = 0.0
+
+
+class RequestTimings:
+    """Spans del request en curso (vive en g.server_timing)"""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.totales = {}
+        self.cantidades = {}
+        self._pila = []
+
+    def abrir(self, nombre):
+        self._pila.append(_Nodo(nombre, time.perf_counter()))
+
+    def cerrar(self):
+        nodo = self._pila.pop()
+        duracion = time.perf_counter() - nodo.inicio
+        self.sumar(nodo.nombre, duracion - nodo.hijos)
+        if self._pila:
+            self._pila[-1].hijos += duracion
+
+    def sumar(self, nombre, segundos, hijo=False):
+        """Agrega tiempo a una fase; con hijo=True se descuenta del span abierto"""
+        self.totales[nombre] = self.totales.get(nombre, 0.0) + segundos
+        self.cantidades[nombre] = self.cantidades.get(nombre, 0) + 1
+        if hijo and self._pila:
+            self._pila[-1].hijos += segundos
+
+    def total(self):
+        return time.perf_counter() - self.inicio
+
+    def fases_ms(self):
+        orden = [f for f in FASES if f in self.totales] + sorted(set(self.totales) - set(FASES))
+        return {nombre: round(self.totales[nombre] * 1000, 2) for nombre in orden}
+
+    def header(self, total_ms):
+        partes = []
+        for nombre, ms in self.fases_ms().items():
+            parte = f'{nombre};dur={ms}'
+            if nombre == 'db':
+                cantidad = self.cantidades[nombre]
+                parte += f';desc="{cantidad} consulta{"" if cantidad == 1 else "s"}"'
+            partes.append(parte)
+        partes.append(f'total;dur={total_ms}')
+        return ', '.join(partes)
+
+
+def _actual():
+    if not has_request_context():
+        return None
+    return g.get('server_timing')
+
+
+class span:
+    """with span('probe'): ... mide una fase del request actual"""
+    __slots__ = ('nombre', 'timings')
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+
+    def __enter__(self):
+        self.timings = _actual()
+        if self.timings is not None:
+            self.timings.abrir(self.nombre)
+        return self
+
+    def __exit__(self, *exc):
+        if self.timings is not None:
+            self.timings.cerrar()
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Cuenta la serialización a JSON de jsonify como fase 'serialize'"""
+
+    def dumps(self, obj, **kwargs):
+        with span('serialize'):
+            return super().dumps(obj, **kwargs)
+
+
+class ServerTiming:
+
+    def __init__(self):
+        self.enabled = True
+        self.log_threshold_ms = None
+        self.budgets_ms = {}
+
+    def init_app(self, app):
+        app.config.setdefault('SERVER_TIMING_ENABLED', self.enabled)
+        app.config.setdefault('SERVER_TIMING_LOG_THRESHOLD_MS', self.log_threshold_ms)
+        app.config.setdefault('SERVER_TIMING_BUDGETS_MS', self.budgets_ms)
+        self.enabled = app.config['SERVER_TIMING_ENABLED']
+        self.log_threshold_ms = app.config['SERVER_TIMING_LOG_THRESHOLD_MS']
+        self.budgets_ms = app.config['SERVER_TIMING_BUDGETS_MS']
+        if not self.enabled:
+            return
+
+        app.json_provider_class = TimedJSONProvider
+        app.json = TimedJSONProvider(app)
+
+        @app.before_request
+        def iniciar():
+            g.server_timing = RequestTimings()
+
+        @app.after_request
+        def emitir(response):
+            timings = g.pop('server_timing', None)
+            if timings is None:
+                return response
+            total_ms = round(timings.total() * 1000, 2)
+            response.headers['Server-Timing'] = timings.header(total_ms)
+            self._registrar(app, response, timings, total_ms)
+            return response
+
+    @staticmethod
+    def record_query(segundos):
+        """Suma una consulta a la fase db del request actual (listener de app.query_stats)"""
+        timings = _actual()
+        if timings is not None:
+            timings.sumar('db', segundos, hijo=True)
+
+    def _registrar(self, app, response, timings, total_ms):
+        limite = self.budgets_ms.get(request.endpoint, self.log_threshold_ms)
+        if limite is None or total_ms < limite:
+            return
+        linea = json.dumps({
+            'endpoint': request.endpoint,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': total_ms,
+            'budget_ms': limite,
+            'fases_ms': timings.fases_ms(),
+            'consultas': timings.cantidades.get('db', 0)
+        })
+        if request.endpoint in self.budgets_ms:
+            app.logger.warning(f'server-timing {linea}')
+        else:
+            app.logger.info(f'server-timing {linea}')
+
+
+server_timing = ServerTiming()
@@ -0,0 +1,140 @@
+"""
+Caché de tokens JWT ya verificados para no decodificar el token ni
+consultar el usuario en cada request autenticado.
+"""
+
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from app.models import Equipo, User, db
+from app.permissions import permission_index
+
+UserSnapshot = namedtuple('UserSnapshot', ['id', 'username', 'role'])
+
+
+class CachedUser:
+    """
+    Usuario construido desde la caché. Responde id, username, role e
+    is_admin() sin tocar la base de datos; cualquier otro atributo carga
+    el User real en la sesión del request actual.
+    """
+
+    def __init__(self, snapshot):
+        self._snapshot = snapshot
+        self._user = None
+
+    @property
+    def id(self):
+        return self._snapshot.id
+
+    @property
+    def username(self):
+        return self._snapshot.username
+
+    @property
+    def role(self):
+        return self._snapshot.role
+
+    def is_admin(self):
+        return self._snapshot.role == 'admin'
+
+    def can_access_equipo(self, equipo_id):
+        if self.is_admin():
+            return True
+        return permission_index.can_access(self._snapshot.id, equipo_id)
+
+    def count_equipos_permitidos(self):
+        if self.is_admin():
+            return Equipo.query.count()
+        return len(permission_index.equipo_ids(self._snapshot.id))
+
+    def serialize(self, include_password=False, equipos_count=None):
+        if include_password:
+            return self._load().serialize(include_password=True, equipos_count=equipos_count)
+        if equipos_count is None:
+            equipos_count = len(permission_index.equipo_ids(self._snapshot.id))
+        return {
+            'id': self._snapshot.id,
+            'username': self._snapshot.username,
+            'role': self._snapshot.role,
+            'equipos_count': equipos_count
+        }
+
+    def get_equipos_permitidos(self):
+        if self.is_admin():
+            return Equipo.query.all()
+        return permission_index.equipos_permitidos(self._snapshot.id)
+
+    def _load(self):
+        if self._user is None:
+            self._user = db.session.get(User, self._snapshot.id)
+        return self._user
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+
+class TokenCache:
+    """
+    LRU acotado de token -> (UserSnapshot, vence_en). Se vacía cuando
+    cambia la versión del índice de permisos.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault('TOKEN_CACHE_SIZE', self.maxsize)
+        app.config.setdefault('TOKEN_CACHE_TTL', self.ttl)
+        self.maxsize = app.config['TOKEN_CACHE_SIZE']
+        self.ttl = app.config['TOKEN_CACHE_TTL']
+
+    def get(self, token):
+        """Retorna un CachedUser o None si el token no está (o venció)"""
+        # Un cambio de roles o asignaciones en otro proceso invalida toda la caché
+        version = permission_index.version()
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            snapshot, vence_en = entry
+            if time.time() >= vence_en:
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+        return CachedUser(snapshot)
+
+    def put(self, token, claims, user):
+        if not self.maxsize:
+            return
+        vence_en = time.time() + self.ttl
+        # Nunca mantener el token más allá de su propia expiración
+        if 'exp' in claims:
+            vence_en = min(vence_en, float(claims['exp']))
+        snapshot = UserSnapshot(user.id, user.username, user.role)
+        with self._lock:
+            self._entries[token] = (snapshot, vence_en)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id):
+        """Descarta los tokens de un usuario (cambio de rol o de asignaciones)"""
+        with self._lock:
+            for token in [t for t, (s, _) in self._entries.items() if s.id == user_id]:
+                del self._entries[token]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache()
@@ -0,0 +1,205 @@
+"""
+Acumulados de uso por día para los reportes de administración.
+
+En lugar de recorrer el historial, cada evento actualiza una fila diaria:
+las transiciones a encendido abren un período (Equipo.encendido_desde) y al
+apagarse se suman sus segundos a los días que abarca; cada pedido de
+encendido suma uno al equipo y al usuario. Los reportes solo leen estas
+tablas, más los períodos que siguen abiertos.
+"""
+
+import datetime
+
+from flask import request
+from sqlalchemy.dialects.sqlite import insert
+
+from app.models import Equipo, User, UsoEquipoDia, UsoUsuarioDia, db
+from app.pagination import ParametroInvalido
+
+ENCENDIDO = 'encendido'
+APAGADO = 'apagado'
+AGRUPACIONES = ('total', 'dia', 'semana')
+
+
+def segmentos(inicio, fin):
+    """Reparte el intervalo [inicio, fin) en (día UTC, segundos)"""
+    while inicio < fin:
+        siguiente = datetime.datetime.combine(inicio.date() + datetime.timedelta(days=1), datetime.time())
+        corte = min(fin, siguiente)
+        yield inicio.date(), int((corte - inicio).total_seconds())
+        inicio = corte
+
+
+def periodo(dia, agrupar):
+    if agrupar == 'dia':
+        return dia.isoformat()
+    if agrupar == 'semana':
+        anio, semana, _ = dia.isocalendar()
+        return f'{anio}-W{semana:02d}'
+    return None
+
+
+def parse_dia_arg(nombre):
+    valor = request.args.get(nombre)
+    if not valor:
+        return None
+    try:
+        return datetime.date.fromisoformat(valor[:10])
+    except ValueError:
+        raise ParametroInvalido(f'{nombre} debe ser una fecha YYYY-MM-DD')
+
+
+def _sumar(modelo, filas):
+    """INSERT ... ON CONFLICT DO UPDATE sumando los incrementos (un executemany por lote)"""
+    claves = [columna.name for columna in modelo.__table__.primary_key]
+    stmt = insert(modelo)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=claves,
+        set_={
+            campo: getattr(modelo, campo) + stmt.excluded[campo]
+            for campo in filas[0] if campo not in claves
+        }
+    )
+    db.session.execute(stmt, filas)
+
+
+class UsageRollups:
+
+    def __init__(self):
+        self.enabled = True
+
+    def init_app(self, app):
+        app.config.setdefault('USAGE_ROLLUPS_ENABLED', self.enabled)
+        app.config.setdefault('USAGE_REPORT_MAX_DAYS', 366)
+        self.enabled = app.config['USAGE_ROLLUPS_ENABLED']
+
+    @staticmethod
+    def _acumular(equipo_id, dia, segundos=0, encendidos=0):
+        # Pendientes de la sesión actual (se descartan con ella si no hay flush)
+        pendientes = db.session.info.setdefault('uso_pendiente', {})
+        fila = pendientes.setdefault((equipo_id, dia), [0, 0])
+        fila[0] += segundos
+        fila[1] += encendidos
+
+    def transition(self, equipo, anterior, estado, cuando):
+        """
+        Aplica un sondeo definitivo. Solo acumula cuando el equipo entra o
+        sale de encendido; lo acumulado se escribe en lote con flush().
+        Un encendido cuenta solo desde apagado: desde desconocido (primer
+        sondeo, equipo nuevo) el equipo ya podía estar encendido.
+        """
+        if not self.enabled:
+            return
+        if estado == ENCENDIDO:
+            if equipo.encendido_desde is None:
+                equipo.encendido_desde = cuando
+                if anterior == APAGADO:
+                    self._acumular(equipo.id, cuando.date(), encendidos=1)
+            return
+        if equipo.encendido_desde is not None:
+            for dia, segundos in segmentos(equipo.encendido_desde, cuando):
+                self._acumular(equipo.id, dia, segundos=segundos)
+            equipo.encendido_desde = None
+
+    def flush(self):
+        """Escribe las transiciones acumuladas en la transacción actual (el llamador hace commit)"""
+        pendientes = db.session.info.pop('uso_pendiente', None)
+        if pendientes:
+            _sumar(UsoEquipoDia, [
+                {'equipo_id': equipo_id, 'dia': dia, 'segundos_encendido': segundos,
+                 'encendidos': encendidos, 'wakes': 0}
+                for (equipo_id, dia), (segundos, encendidos) in pendientes.items()
+            ])
+        return len(pendientes or ())
+
+    def record_wake(self, equipo_id, user_id, cuando):
+        """Suma un pedido de encendido al equipo y al usuario (sin commit)"""
+        if not self.enabled:
+            return
+        _sumar(UsoEquipoDia, [{'equipo_id': equipo_id, 'dia': cuando.date(),
+                               'segundos_encendido': 0, 'encendidos': 0, 'wakes': 1}])
+        if user_id is not None:
+            _sumar(UsoUsuarioDia, [{'user_id': user_id, 'dia': cuando.date(), 'wakes': 1}])
+
+    def purge_equipo(self, equipo_id):
+        db.session.execute(db.delete(UsoEquipoDia).where(UsoEquipoDia.equipo_id == equipo_id))
+
+    def report(self, desde, hasta, agrupar='total', ahora=None):
+        """
+        Uso por equipo y por usuario entre los días `desde` y `hasta`
+        (inclusive), agrupado por total, día o semana ISO.
+        """
+        ahora = ahora or datetime.datetime.utcnow()
+        equipos = {}
+
+        def fila_equipo(equipo_id, nombre, clave):
+            fila = equipos.setdefault(equipo_id, {'equipo_id': equipo_id, 'nombre': nombre, 'periodos': {}})
+            return fila['periodos'].setdefault(clave, {'segundos_encendido': 0, 'encendidos': 0, 'wakes': 0})
+
+        filas = db.session.execute(self.equipos_query(desde, hasta))
+        for equipo_id, nombre, dia, segundos, encendidos, wakes in filas:
+            acumulado = fila_equipo(equipo_id, nombre, periodo(dia, agrupar))
+            acumulado['segundos_encendido'] += segundos
+            acumulado['encendidos'] += encendidos
+            acumulado['wakes'] += wakes
+
+        # Períodos encendidos en curso: todavía no están en los acumulados
+        inicio_rango = datetime.datetime.combine(desde, datetime.time())
+        fin_rango = min(ahora, datetime.datetime.combine(hasta + datetime.timedelta(days=1), datetime.time()))
+        abiertos = db.session.execute(self.abiertos_query(fin_rango))
+        for equipo_id, nombre, encendido_desde in abiertos:
+            for dia, segundos in segmentos(max(encendido_desde, inicio_rango), fin_rango):
+                fila_equipo(equipo_id, nombre, periodo(dia, agrupar))['segundos_encendido'] += segundos
+
+        usuarios = {}
+        filas = db.session.execute(self.usuarios_query(desde, hasta))
+        for user_id, username, dia, wakes in filas:
+            fila = usuarios.setdefault(user_id, {'user_id': user_id, 'username': username, 'periodos': {}})
+            acumulado = fila['periodos'].setdefault(periodo(dia, agrupar), {'wakes': 0})
+            acumulado['wakes'] += wakes
+
+        for fila in equipos.values():
+            for acumulado in fila['periodos'].values():
+                acumulado['horas_encendido'] = round(acumulado.pop('segundos_encendido') / 3600, 2)
+        return (
+            [self._aplanar(fila, agrupar) for _, fila in sorted(equipos.items())],
+            [self._aplanar(fila, agrupar) for _, fila in sorted(usuarios.items())]
+        )
+
+    @staticmethod
+    def equipos_query(desde, hasta):
+        u = UsoEquipoDia
+        return (
+            db.select(u.equipo_id, Equipo.nombre, u.dia,
+                      u.segundos_encendido, u.encendidos, u.wakes)
+            .join(Equipo, Equipo.id == u.equipo_id)
+            .filter(u.dia >= desde, u.dia <= hasta)
+        )
+
+    @staticmethod
+    def abiertos_query(fin_rango):
+        """Equipos con un período encendido en curso que empezó antes de `fin_rango`"""
+        return (
+            db.select(Equipo.id, Equipo.nombre, Equipo.encendido_desde)
+            .filter(Equipo.encendido_desde.isnot(None), Equipo.encendido_desde < fin_rango)
+        )
+
+    @staticmethod
+    def usuarios_query(desde, hasta):
+        return (
+            db.select(UsoUsuarioDia.user_id, User.username, UsoUsuarioDia.dia, UsoUsuarioDia.wakes)
+            .join(User, User.id == UsoUsuarioDia.user_id)
+            .filter(UsoUsuarioDia.dia >= desde, UsoUsuarioDia.dia <= hasta)
+        )
+
+    @staticmethod
+    def _aplanar(fila, agrupar):
+        periodos = fila.pop('periodos')
+        if agrupar == 'total':
+            fila.update(periodos[None])
+        else:
+            fila['periodos'] = [{'periodo': clave, **valores} for clave, valores in sorted(periodos.items())]
+        return fila
+
+
+usage_rollups = UsageRollups()
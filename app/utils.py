@@ -1,17 +1,9 @@
 import platform
 import subprocess
+from app.neighbors import neighbor_table
 
 def obtenerPorMac(mac_address):
-    mac_address = formatearMac(mac_address)
-    try:
-        result = subprocess.check_output(['arp', '-a'], shell=True, text=True)
-        for line in result.split('\n'):
-            if mac_address in line:
-                parts = line.split()
-                ip_address = parts[0]
-                return ip_address
-    except subprocess.CalledProcessError:
-        return None
+    return neighbor_table.get_ip(formatearMac(mac_address))
     
 def formatearMac(mac):
     mac_formateada = mac.replace(':', '-')
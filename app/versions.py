@@ -0,0 +1,186 @@
+"""
+Versión de la flota: contador monótono que cambia con cualquier
+modificación visible en los listados (CRUD, asignaciones, cambios de
+estado). Permite responder 304 Not Modified sin serializar ni sondear y,
+junto con el log de cambios (cambio_equipo), devolver solo lo que cambió
+desde una versión dada.
+"""
+
+import threading
+import time
+import zlib
+
+from flask import request
+
+from app.models import CambioEquipo, Contador, db, user_equipos
+from app.permissions import permission_index
+
+
+class SharedVersion:
+    """
+    Contador persistido en la tabla contador. El valor local se actualiza
+    al confirmar cambios propios y se compara con la base como máximo una
+    vez por check_interval para ver cambios de otros procesos.
+    """
+
+    def __init__(self, nombre, check_interval=5.0):
+        self.nombre = nombre
+        self.check_interval = check_interval
+        self._value = None
+        self._checked_at = float('-inf')
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault('FLEET_VERSION_CHECK_INTERVAL', self.check_interval)
+        self.check_interval = app.config['FLEET_VERSION_CHECK_INTERVAL']
+
+    def current(self):
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            with self._lock:
+                if time.monotonic() - self._checked_at >= self.check_interval:
+                    self._value = Contador.get(self.nombre)
+                    self._checked_at = time.monotonic()
+        return self._value
+
+    def bump(self):
+        """Incrementa el contador en la transacción actual (llamar antes del commit)"""
+        return Contador.bump(self.nombre)
+
+    def confirm(self, value):
+        """Registra una versión ya confirmada por este proceso"""
+        with self._lock:
+            if self._value is None or value > self._value:
+                self._value = value
+
+
+class FleetVersion(SharedVersion):
+    """
+    Versión de la flota con log de cambios. El contador '<nombre>_compactada'
+    guarda la versión más alta cuyos cambios pueden faltar en el log: quien
+    pida cambios desde antes de ella recibe el listado completo.
+    """
+
+    def __init__(self, nombre, check_interval=5.0, retention=1000, compact_every=100):
+        super().__init__(nombre, check_interval)
+        self.retention = retention
+        self.compact_every = compact_every
+
+    def init_app(self, app):
+        super().init_app(app)
+        app.config.setdefault('CHANGE_LOG_RETENTION', self.retention)
+        self.retention = app.config['CHANGE_LOG_RETENTION']
+
+    @property
+    def nombre_compactada(self):
+        return f'{self.nombre}_compactada'
+
+    def bump(self, upserts=(), deletes=(), assigned=(), unassigned=(), snapshot=False):
+        """
+        Incrementa la versión y registra los cambios en la transacción actual.
+        upserts son ids de equipo; deletes, assigned y unassigned son pares
+        (user_id, equipo_id). En deletes, user_id=None deja la baja solo para
+        los admin; cada usuario que tenía el equipo asignado lleva su propio
+        par (ver deleted_pairs). snapshot=True marca un cambio masivo no
+        registrado: los clientes anteriores a esta versión recargan todo.
+        """
+        version = super().bump()
+        filas = [{'equipo_id': equipo_id, 'tipo': 'upsert'} for equipo_id in upserts]
+        filas += [{'equipo_id': equipo_id, 'user_id': user_id, 'tipo': 'delete'}
+                  for user_id, equipo_id in deletes]
+        filas += [{'equipo_id': equipo_id, 'user_id': user_id, 'tipo': 'upsert'}
+                  for user_id, equipo_id in assigned]
+        filas += [{'equipo_id': equipo_id, 'user_id': user_id, 'tipo': 'unassign'}
+                  for user_id, equipo_id in unassigned]
+        if filas:
+            db.session.execute(
+                db.insert(CambioEquipo),
+                [{'user_id': None, **fila, 'version': version} for fila in filas]
+            )
+        if snapshot:
+            Contador.set_max(self.nombre_compactada, version)
+        elif version % self.compact_every == 0 and version > self.retention:
+            self.compact(version - self.retention)
+        return version
+
+    def compact(self, hasta):
+        """Descarta el log hasta la versión `hasta` (inclusive)"""
+        CambioEquipo.query.filter(CambioEquipo.version <= hasta).delete(synchronize_session=False)
+        Contador.set_max(self.nombre_compactada, hasta)
+
+    def changes_since(self, since):
+        """
+        Retorna (version, cambios) con los cambios posteriores a `since`, o
+        (version, None) si el log ya no los cubre y hace falta el listado
+        completo. cambios es una lista de (equipo_id, user_id, tipo).
+        """
+        version = Contador.get(self.nombre)
+        if since is None or since > version or since < Contador.get(self.nombre_compactada):
+            return version, None
+        cambios = db.session.execute(self.changes_query(since, version)).all()
+        return version, cambios
+
+    @staticmethod
+    def changes_query(since, version):
+        return (
+            db.select(CambioEquipo.equipo_id, CambioEquipo.user_id, CambioEquipo.tipo)
+            .filter(CambioEquipo.version > since, CambioEquipo.version <= version)
+        )
+
+
+fleet_version = FleetVersion('flota')
+# checked_at, rtt_ms y stale: cambian en cada sondeo y no van al log de cambios
+state_version = SharedVersion('estado')
+
+
+def bump_probe_versions(upserts, persistidos=True):
+    """
+    Tras persistir sondeos, antes del commit. Un cambio de estado o IP
+    (upserts) sube la versión de la flota; si solo cambiaron checked_at o
+    rtt_ms (persistidos) sube la de estado. Retorna la función que confirma
+    la versión después del commit, o None si no hubo nada que versionar.
+    """
+    if upserts:
+        contador, version = fleet_version, fleet_version.bump(upserts=upserts)
+    elif persistidos:
+        contador, version = state_version, state_version.bump()
+    else:
+        return None
+    return lambda: contador.confirm(version)
+
+
+def assignments_query(equipo_ids):
+    return (
+        db.select(user_equipos.c.user_id, user_equipos.c.equipo_id)
+        .filter(user_equipos.c.equipo_id.in_(equipo_ids))
+    )
+
+
+def deleted_pairs(equipo_ids):
+    """
+    Pares para FleetVersion.bump(deletes=...): uno sin usuario por equipo y
+    uno por cada asignación vigente. Leer antes de borrar los equipos.
+    """
+    asignaciones = db.session.execute(assignments_query(equipo_ids)).all()
+    return [(None, equipo_id) for equipo_id in equipo_ids] + [tuple(fila) for fila in asignaciones]
+
+
+def fleet_etag(user, *partes, estado=True):
+    """
+    ETag débil derivado de la versión de la flota (y, si la respuesta trae
+    campos de estado, de la versión de estado), el conjunto de equipos
+    visibles para el usuario y los parámetros del request.
+    """
+    if user.is_admin():
+        permisos = 'a'
+    else:
+        permisos = format(hash(permission_index.equipo_ids(user.id)) & 0xFFFFFFFF, 'x')
+    variante = zlib.crc32(request.query_string + repr(partes).encode())
+    version = fleet_version.current()
+    if estado:
+        version = f'{version}.{state_version.current()}'
+    return f'{version}-{permisos}-{variante:x}'
+
+
+def not_modified(etag):
+    """True si el cliente ya tiene la representación de este ETag"""
+    return request.if_none_match.contains_weak(etag)
@@ -0,0 +1,38 @@
+"""
+Envío de paquetes mágicos Wake-on-LAN en lote usando un único socket UDP.
+"""
+
+import socket
+import time
+
+from wakeonlan import create_magic_packet
+
+from app.metrics import magic_packets
+
+BROADCAST_IP = '255.255.255.255'
+DEFAULT_PORT = 9
+
+
+def send_magic_packets(macs, stagger_ms=0, host=BROADCAST_IP, port=DEFAULT_PORT):
+    """
+    Envía un paquete mágico por MAC reutilizando el mismo socket. Con
+    stagger_ms se espera entre envíos para no encender todas las fuentes
+    al mismo tiempo. Retorna [(mac, error)] con error=None si se envió.
+    """
+    resultados = []
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        for index, mac in enumerate(macs):
+            if index and stagger_ms:
+                time.sleep(stagger_ms / 1000.0)
+            try:
+                sock.sendto(create_magic_packet(mac), (host, port))
+                resultados.append((mac, None))
+                magic_packets.inc('sent')
+            except (OSError, ValueError) as e:
+                resultados.append((mac, str(e)))
+                magic_packets.inc('failed')
+    finally:
+        sock.close()
+    return resultados
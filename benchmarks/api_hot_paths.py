@@ -0,0 +1,429 @@
+"""
+Benchmark de los endpoints más usados sobre una flota sintética.
+
+Crea una base SQLite temporal con --equipos equipos, --usuarios usuarios
+con --asignados equipos cada uno y --dias-uso días de acumulados de uso.
+La red se reemplaza por dobles deterministas con latencia configurable:
+utils.obtenerPorMac (tabla ARP), utils.ping (sondeo con PROBE_METHOD=ping)
+y el envío de paquetes mágicos. Mide p50/p99 y requests/s de login,
+listados, detalle, estado, encender y los listados de administración, con
+el cliente de pruebas de Flask (secuencial) y con waitress real
+(--concurrencia hilos con conexiones persistentes).
+
+El resultado completo se guarda en JSON con --salida para comparar corridas;
+--comparar muestra la variación respecto de una corrida anterior:
+
+    python benchmarks/api_hot_paths.py --equipos 10 --salida bench-10.json
+    python benchmarks/api_hot_paths.py --equipos 1000 --salida bench-1k.json
+    python benchmarks/api_hot_paths.py --equipos 10000 --iteraciones 50 --salida bench-10k.json
+    python benchmarks/api_hot_paths.py --equipos 1000 --comparar bench-1k.json
+    python benchmarks/api_hot_paths.py --modo waitress --latencia-ping 20 --endpoints listado estado
+"""
+
+import argparse
+import contextlib
+import datetime
+import http.client
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+PASSWORD = 'bench123'
+ENDPOINTS = ('login', 'listado', 'listado_pagina', 'listado_usuario', 'detalle', 'estado',
+             'encender', 'admin_usuarios', 'admin_reporte_uso')
+
+
+def percentil(valores, p):
+    if not valores:
+        return None
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p / 100))]
+
+
+def mac(i):
+    return f'02:00:00:{i >> 16 & 255:02X}:{i >> 8 & 255:02X}:{i & 255:02X}'
+
+
+class RedFalsa:
+    """
+    Reemplazos deterministas de la tabla ARP, ping y Wake-on-LAN. Todas las
+    MAC tienen IP (10.x.y.z según sus últimos bytes) y el mismo host
+    siempre responde igual; la fracción encendida se fija con `encendidos`.
+    """
+
+    def __init__(self, latencia_arp_ms=0.0, latencia_ping_ms=5.0, latencia_wol_ms=1.0, encendidos=0.5):
+        self.latencia_arp = latencia_arp_ms / 1000
+        self.latencia_ping = latencia_ping_ms / 1000
+        self.latencia_wol = latencia_wol_ms / 1000
+        self.encendidos = encendidos
+        self.paquetes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _esperar(segundos):
+        if segundos > 0:
+            time.sleep(segundos)
+
+    def obtener_por_mac(self, mac_address):
+        self._esperar(self.latencia_arp)
+        partes = mac_address.replace('-', ':').split(':')[-3:]
+        return '10.' + '.'.join(str(int(parte, 16)) for parte in partes)
+
+    def ping(self, host):
+        self._esperar(self.latencia_ping)
+        return zlib.crc32(host.encode()) % 1000 < self.encendidos * 1000
+
+    def send_magic_packets(self, macs, stagger_ms=0, **kwargs):
+        self._esperar(self.latencia_wol * len(macs))
+        with self._lock:
+            self.paquetes += len(macs)
+        return [(mac_address, None) for mac_address in macs]
+
+    def instalar(self):
+        from app import api, jobs, routes, utils
+        utils.obtenerPorMac = self.obtener_por_mac
+        utils.ping = self.ping
+        api.send_magic_packets = self.send_magic_packets
+        jobs.send_magic_packets = self.send_magic_packets
+        routes.send_magic_packets = self.send_magic_packets
+
+
+def sembrar(app, equipos, usuarios, asignados, dias_uso):
+    """Inserta la flota en lote; retorna (segundos, nombre de un usuario común)"""
+    from app.models import Equipo, User, UsoEquipoDia, UsoUsuarioDia, db, user_equipos
+    from app.passwords import password_hasher
+
+    inicio = time.perf_counter()
+    with app.app_context():
+        db.create_all()
+        # Un solo hash: bcrypt por usuario dominaría la preparación
+        password = password_hasher.hash(PASSWORD)
+        db.session.execute(db.insert(User), [{'username': 'bench', 'password': password, 'role': 'admin'}] + [
+            {'username': f'usuario{i}', 'password': password, 'role': 'user'} for i in range(usuarios)
+        ])
+        db.session.execute(db.insert(Equipo), [
+            {'nombre': f'puesto {i}', 'mac_address': mac(i), 'estado': 'desconocido'} for i in range(equipos)
+        ])
+        # Usuario i: bloque contiguo de equipos que se solapa con el siguiente
+        asignados = min(asignados, equipos)
+        paso = max(1, asignados // 2)
+        if usuarios and asignados:
+            db.session.execute(user_equipos.insert(), [
+                {'user_id': 2 + i, 'equipo_id': 1 + (i * paso + j) % equipos}
+                for i in range(usuarios) for j in range(asignados)
+            ])
+        hoy = datetime.date.today()
+        dias = [hoy - datetime.timedelta(days=d) for d in range(dias_uso)]
+        if dias:
+            db.session.execute(db.insert(UsoEquipoDia), [
+                {'equipo_id': 1 + i, 'dia': dia, 'segundos_encendido': (i * 37 + n * 911) % 86400,
+                 'encendidos': (i + n) % 3, 'wakes': (i * n) % 2}
+                for i in range(equipos) for n, dia in enumerate(dias)
+            ])
+            if usuarios:
+                db.session.execute(db.insert(UsoUsuarioDia), [
+                    {'user_id': 2 + i, 'dia': dia, 'wakes': 1 + (i + n) % 4}
+                    for i in range(usuarios) for n, dia in enumerate(dias)
+                ])
+        db.session.commit()
+    return time.perf_counter() - inicio, 'usuario0' if usuarios else 'bench'
+
+
+def esperar_primer_sondeo(app, timeout=600):
+    """Espera a que el poller haya sondeado toda la flota una vez"""
+    from app.models import Equipo, db
+
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        with app.app_context():
+            faltan = db.session.scalar(
+                db.select(db.func.count()).select_from(Equipo).filter(Equipo.checked_at.is_(None))
+            )
+            db.session.remove()
+        if not faltan:
+            return
+        time.sleep(0.2)
+    raise RuntimeError('El poller no completó el primer sondeo')
+
+
+class Escenario:
+    """Qué pide cada endpoint; el request n rota por los equipos de forma determinista"""
+
+    def __init__(self, equipos, tokens):
+        self.equipos = equipos
+        self.tokens = tokens
+
+    def _equipo(self, n):
+        return 1 + (n * 7919) % self.equipos
+
+    def request(self, endpoint, n):
+        """(método, url, token, body)"""
+        if endpoint == 'login':
+            return 'POST', '/api/auth/login', None, {'username': 'bench', 'password': PASSWORD}
+        if endpoint == 'listado':
+            return 'GET', '/api/equipos', 'admin', None
+        if endpoint == 'listado_pagina':
+            return 'GET', '/api/equipos?limit=100', 'admin', None
+        if endpoint == 'listado_usuario':
+            return 'GET', '/api/equipos', 'usuario', None
+        if endpoint == 'detalle':
+            return 'GET', f'/api/equipos/{self._equipo(n)}', 'admin', None
+        if endpoint == 'estado':
+            return 'GET', f'/api/equipos/{self._equipo(n)}/estado', 'admin', None
+        if endpoint == 'encender':
+            return 'POST', f'/api/equipos/{self._equipo(n)}/encender', 'admin', None
+        if endpoint == 'admin_usuarios':
+            return 'GET', '/api/admin/users', 'admin', None
+        if endpoint == 'admin_reporte_uso':
+            return 'GET', '/api/admin/reportes/uso', 'admin', None
+        raise ValueError(endpoint)
+
+    def headers(self, token):
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {self.tokens[token]}'
+        return headers
+
+
+def resumir(latencias, estados, segundos):
+    return {
+        'requests': len(latencias),
+        'estados': {str(codigo): cantidad for codigo, cantidad in sorted(estados.items())},
+        'errores': sum(cantidad for codigo, cantidad in estados.items() if codigo >= 500 or codigo == 0),
+        'p50_ms': round(percentil(latencias, 50), 2) if latencias else None,
+        'p99_ms': round(percentil(latencias, 99), 2) if latencias else None,
+        'media_ms': round(statistics.mean(latencias), 2) if latencias else None,
+        'requests_por_segundo': round(len(latencias) / segundos, 2) if segundos else None,
+    }
+
+
+def medir_cliente(app, escenario, endpoint, iteraciones, calentamiento):
+    client = app.test_client()
+
+    def hacer(n):
+        metodo, url, token, body = escenario.request(endpoint, n)
+        return client.open(url, method=metodo, json=body, headers=escenario.headers(token)).status_code
+
+    for n in range(calentamiento):
+        hacer(n)
+    latencias, estados = [], {}
+    inicio_total = time.perf_counter()
+    for n in range(iteraciones):
+        inicio = time.perf_counter()
+        codigo = hacer(calentamiento + n)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        estados[codigo] = estados.get(codigo, 0) + 1
+    return resumir(latencias, estados, time.perf_counter() - inicio_total)
+
+
+def medir_waitress(puerto, escenario, endpoint, iteraciones, calentamiento, concurrencia):
+    latencias, estados = [], {}
+    lock = threading.Lock()
+    siguiente = [0]
+
+    def trabajar(total):
+        conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=60)
+        try:
+            while True:
+                with lock:
+                    n = siguiente[0]
+                    if n >= total:
+                        return
+                    siguiente[0] += 1
+                metodo, url, token, body = escenario.request(endpoint, n)
+                payload = json.dumps(body).encode() if body is not None else None
+                inicio = time.perf_counter()
+                try:
+                    conexion.request(metodo, url, body=payload, headers=escenario.headers(token))
+                    respuesta = conexion.getresponse()
+                    respuesta.read()
+                    codigo = respuesta.status
+                except (OSError, http.client.HTTPException):
+                    conexion.close()
+                    conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=60)
+                    codigo = 0
+                duracion = (time.perf_counter() - inicio) * 1000
+                if n >= calentamiento:
+                    with lock:
+                        latencias.append(duracion)
+                        estados[codigo] = estados.get(codigo, 0) + 1
+        finally:
+            conexion.close()
+
+    trabajar(calentamiento)
+    hilos = [threading.Thread(target=trabajar, args=(calentamiento + iteraciones,)) for _ in range(concurrencia)]
+    inicio_total = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return resumir(latencias, estados, time.perf_counter() - inicio_total)
+
+
+def medir(app, escenario, args):
+    """{modo: {endpoint: resumen}} para los modos y endpoints pedidos"""
+    from waitress import create_server
+
+    def iteraciones(endpoint):
+        return args.iteraciones_login if endpoint == 'login' else args.iteraciones
+
+    resultados = {}
+    if args.modo in ('cliente', 'ambos'):
+        resultados['cliente'] = {
+            endpoint: medir_cliente(app, escenario, endpoint, iteraciones(endpoint), args.calentamiento)
+            for endpoint in args.endpoints
+        }
+    if args.modo in ('waitress', 'ambos'):
+        # Sin server.close(): cerrar el socket mientras el loop hace select
+        # falla; el hilo es daemon y termina con el proceso
+        server = create_server(app, host='127.0.0.1', port=0, threads=args.threads)
+        threading.Thread(target=server.run, daemon=True).start()
+        resultados['waitress'] = {
+            endpoint: medir_waitress(server.effective_port, escenario, endpoint, iteraciones(endpoint),
+                                     args.calentamiento, args.concurrencia)
+            for endpoint in args.endpoints
+        }
+    return resultados
+
+
+def commit_actual():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ,
+                                       text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(anterior, actual):
+    """Líneas con la variación de p50/p99 y requests/s por modo y endpoint"""
+    lineas = [f"vs {anterior.get('fecha')} ({anterior.get('commit')})"]
+    for modo, endpoints in actual['resultados'].items():
+        for endpoint, datos in endpoints.items():
+            previo = anterior.get('resultados', {}).get(modo, {}).get(endpoint)
+            if not previo:
+                continue
+            partes = []
+            for clave in ('p50_ms', 'p99_ms', 'requests_por_segundo'):
+                if previo.get(clave) and datos.get(clave) is not None:
+                    partes.append(f'{clave} {(datos[clave] / previo[clave] - 1) * 100:+.1f}%')
+            lineas.append(f'  {modo:<11} {endpoint:<18} ' + '  '.join(partes))
+    return lineas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--equipos', type=int, default=1000, help='tamaño de la flota (p. ej. 10, 1000, 10000)')
+    parser.add_argument('--usuarios', type=int, default=200)
+    parser.add_argument('--asignados', type=int, default=20, help='equipos asignados a cada usuario')
+    parser.add_argument('--dias-uso', type=int, default=30, help='días de acumulados de uso por equipo')
+    parser.add_argument('--latencia-arp', type=float, default=0.0, help='ms por consulta a la tabla ARP')
+    parser.add_argument('--latencia-ping', type=float, default=5.0, help='ms por ping')
+    parser.add_argument('--latencia-wol', type=float, default=1.0, help='ms por paquete mágico')
+    parser.add_argument('--encendidos', type=float, default=0.5, help='fracción de equipos que responden')
+    parser.add_argument('--modo', choices=('cliente', 'waitress', 'ambos'), default='ambos')
+    parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument('--iteraciones', type=int, default=200, help='requests medidos por endpoint')
+    parser.add_argument('--iteraciones-login', type=int, default=20, help='ídem para login (bcrypt)')
+    parser.add_argument('--calentamiento', type=int, default=5, help='requests previos sin medir')
+    parser.add_argument('--concurrencia', type=int, default=8, help='clientes concurrentes contra waitress')
+    parser.add_argument('--threads', type=int, default=16, help='hilos de waitress')
+    parser.add_argument('--bcrypt-rounds', type=int, help='costo de bcrypt (por defecto el de config)')
+    parser.add_argument('--sin-poller', action='store_true',
+                        help='sin poller los listados sondean en vivo en cada request')
+    parser.add_argument('--salida', help='archivo JSON con el resultado')
+    parser.add_argument('--comparar', help='JSON de una corrida anterior')
+    parser.add_argument('--json', action='store_true', help='resultado en JSON por stdout')
+    args = parser.parse_args()
+
+    # Config que se lee del entorno al importar la aplicación
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+    os.environ['PROBE_METHOD'] = 'ping'
+    # El poller sondea una vez al iniciar y no vuelve a competir con las mediciones
+    os.environ['STATUS_POLL_INTERVAL'] = '86400'
+    if args.bcrypt_rounds:
+        os.environ['BCRYPT_LOG_ROUNDS'] = str(args.bcrypt_rounds)
+
+    from app import create_app
+    from app.api import generate_token
+    from app.models import User, db
+    from app.poller import status_poller
+    from app.throttle import login_throttle
+
+    logging.getLogger('waitress.queue').setLevel(logging.ERROR)
+    red = RedFalsa(args.latencia_arp, args.latencia_ping, args.latencia_wol, args.encendidos)
+    red.instalar()
+
+    app = create_app()
+    # Se mide el costo del login, no el límite de intentos
+    login_throttle.enabled = False
+    segundos_siembra, usuario = sembrar(app, args.equipos, args.usuarios, args.asignados, args.dias_uso)
+    if not args.sin_poller:
+        status_poller.start()
+        esperar_primer_sondeo(app)
+
+    with app.app_context():
+        tokens = {
+            'admin': generate_token(User.query.filter_by(username='bench').one().id),
+            'usuario': generate_token(User.query.filter_by(username=usuario).one().id),
+        }
+    escenario = Escenario(args.equipos, tokens)
+
+    # Los print() de los endpoints (p. ej. al encender) no ensucian la salida
+    with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo):
+        resultados = medir(app, escenario, args)
+
+    status_poller.stop()
+    with app.app_context():
+        db.engine.dispose()
+    for sufijo in ('', '-wal', '-shm'):
+        if os.path.exists(path + sufijo):
+            os.unlink(path + sufijo)
+
+    config = {k: v for k, v in vars(args).items() if k not in ('salida', 'comparar', 'json')}
+    config.update({
+        'bcrypt_rounds': app.config['BCRYPT_LOG_ROUNDS'],
+        'password_workers': app.config['PASSWORD_WORKERS'],
+        'sqlite_journal_mode': app.config['SQLITE_JOURNAL_MODE'],
+    })
+    resultado = {
+        'fecha': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit_actual(),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'config': config,
+        'siembra_s': round(segundos_siembra, 2),
+        'paquetes_magicos': red.paquetes,
+        'resultados': resultados,
+    }
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            json.dump(resultado, archivo, indent=2)
+    if args.json:
+        print(json.dumps(resultado, indent=2))
+    else:
+        print(f"{args.equipos} equipos, {args.usuarios} usuarios (siembra {resultado['siembra_s']} s)")
+        for modo, endpoints in resultados.items():
+            for endpoint, datos in endpoints.items():
+                print(f"  {modo:<11} {endpoint:<18} p50 {datos['p50_ms']:>8} ms  p99 {datos['p99_ms']:>8} ms  "
+                      f"{datos['requests_por_segundo']:>8} req/s  estados {datos['estados']}")
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as archivo:
+            anterior = json.load(archivo)
+        print('\n'.join(comparar(anterior, resultado)), file=sys.stderr if args.json else sys.stdout)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Benchmark: throughput de logins contra latencia de listados concurrentes.
+
+Levanta la aplicación con waitress en un puerto local sobre una base SQLite
+temporal y, durante --duracion segundos, lanza logins y listados de equipos
+en paralelo. Reporta logins/s, respuestas 503 y p50/p99 de los listados.
+
+    python benchmarks/login_vs_listing.py --logins 16 --listados 4
+    PASSWORD_WORKERS=1 python benchmarks/login_vs_listing.py
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentil(valores, p):
+    if not valores:
+        return None
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p / 100))]
+
+
+def request(url, data=None, token=None):
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    body = json.dumps(data).encode() if data is not None else None
+    req = urllib.request.Request(url, data=body, headers=headers)
+    try:
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            return resp.status, json.loads(resp.read() or b'null')
+    except urllib.error.HTTPError as e:
+        return e.code, None
+
+
+def preparar(equipos):
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+
+    from app import create_app
+    from app.models import Equipo, User, db
+    from app.passwords import password_hasher
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        password = password_hasher.hash('bench123')
+        db.session.add(User(username='bench', password=password, role='admin'))
+        db.session.add_all(
+            Equipo(nombre=f'puesto {i}', mac_address=f'02:00:00:{i >> 16 & 255:02X}:{i >> 8 & 255:02X}:{i & 255:02X}')
+            for i in range(equipos)
+        )
+        db.session.commit()
+    return app, path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logins', type=int, default=16, help='hilos haciendo login')
+    parser.add_argument('--listados', type=int, default=4, help='hilos listando equipos')
+    parser.add_argument('--equipos', type=int, default=200)
+    parser.add_argument('--duracion', type=float, default=10.0, help='segundos')
+    parser.add_argument('--threads', type=int, default=16, help='hilos de waitress')
+    parser.add_argument('--json', action='store_true', help='salida en JSON')
+    args = parser.parse_args()
+
+    from waitress import create_server
+    # La cola de waitress se llena a propósito; no interesa su advertencia
+    logging.getLogger('waitress.queue').setLevel(logging.ERROR)
+
+    app, path = preparar(args.equipos)
+    server = create_server(app, host='127.0.0.1', port=0, threads=args.threads)
+    threading.Thread(target=server.run, daemon=True).start()
+    base = f'http://127.0.0.1:{server.effective_port}/api'
+
+    _, data = request(f'{base}/auth/login', {'username': 'bench', 'password': 'bench123'})
+    token = data['token']
+
+    fin = time.monotonic() + args.duracion
+    logins = {'ok': 0, 'saturado': 0, 'otros': 0}
+    latencias = []
+    lock = threading.Lock()
+
+    def login():
+        while time.monotonic() < fin:
+            status, _ = request(f'{base}/auth/login', {'username': 'bench', 'password': 'bench123'})
+            clave = 'ok' if status == 200 else 'saturado' if status == 503 else 'otros'
+            with lock:
+                logins[clave] += 1
+            if status == 503:
+                time.sleep(0.05)
+
+    def listar():
+        # Sin campos de estado: mide el servidor, no la red
+        url = f'{base}/equipos?fields=id,nombre'
+        while time.monotonic() < fin:
+            inicio = time.perf_counter()
+            request(url, token=token)
+            with lock:
+                latencias.append((time.perf_counter() - inicio) * 1000)
+
+    hilos = ([threading.Thread(target=login) for _ in range(args.logins)] +
+             [threading.Thread(target=listar) for _ in range(args.listados)])
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    server.close()
+    os.unlink(path)
+
+    resultado = {
+        'config': {**vars(args), 'bcrypt_rounds': app.config['BCRYPT_LOG_ROUNDS'],
+                   'password_workers': app.config['PASSWORD_WORKERS'],
+                   'password_queue_size': app.config['PASSWORD_QUEUE_SIZE']},
+        'logins_por_segundo': round(logins['ok'] / args.duracion, 2),
+        'logins': logins,
+        'listados': len(latencias),
+        'listado_p50_ms': round(percentil(latencias, 50), 2) if latencias else None,
+        'listado_p99_ms': round(percentil(latencias, 99), 2) if latencias else None,
+        'listado_media_ms': round(statistics.mean(latencias), 2) if latencias else None,
+    }
+    if args.json:
+        print(json.dumps(resultado, indent=2))
+        return
+    print(f"logins/s: {resultado['logins_por_segundo']}  (503: {logins['saturado']}, otros: {logins['otros']})")
+    print(f"listados: {resultado['listados']}  p50 {resultado['listado_p50_ms']} ms  "
+          f"p99 {resultado['listado_p99_ms']} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Lectores contra escritores en SQLite con los PRAGMAs de app/sqlite_pragmas.py.
+
+Un hilo escritor actualiza todos los equipos en transacciones que se
+mantienen abiertas --hold ms (como un commit del poller mientras un admin
+edita), y varios hilos lectores listan equipos. Reporta p50/p99 de las
+lecturas, escrituras completadas y errores "database is locked".
+
+Con un caché chico (--cache-kb) el escritor debe volcar páginas a disco
+antes del commit; con el journal DELETE eso exige un lock exclusivo y los
+lectores quedan bloqueados toda la transacción, mientras que en WAL siguen
+leyendo:
+
+    python benchmarks/sqlite_concurrency.py --equipos 5000 --hold 300 --cache-kb 64
+    SQLITE_JOURNAL_MODE=DELETE python benchmarks/sqlite_concurrency.py --equipos 5000 --hold 300 --cache-kb 64
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentil(valores, p):
+    if not valores:
+        return None
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lectores', type=int, default=8)
+    parser.add_argument('--equipos', type=int, default=500)
+    parser.add_argument('--duracion', type=float, default=5.0, help='segundos')
+    parser.add_argument('--hold', type=float, default=50.0, help='ms que el escritor mantiene la transacción')
+    parser.add_argument('--cache-kb', type=int, help='cache_size de SQLite (por defecto el de config)')
+    parser.add_argument('--json', action='store_true', help='salida en JSON')
+    args = parser.parse_args()
+
+    if args.cache_kb:
+        os.environ['SQLITE_CACHE_SIZE_KB'] = str(args.cache_kb)
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+
+    from sqlalchemy.exc import OperationalError
+    from app import create_app
+    from app.models import Equipo, db
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        db.session.add_all(
+            Equipo(nombre=f'puesto {i}', mac_address=f'02:00:00:00:{i >> 8 & 255:02X}:{i & 255:02X}')
+            for i in range(args.equipos)
+        )
+        db.session.commit()
+        journal_mode = db.session.execute(db.text('PRAGMA journal_mode')).scalar()
+
+    fin = time.monotonic() + args.duracion
+    latencias = []
+    errores = {'lectura': 0, 'escritura': 0}
+    escrituras = [0]
+    lock = threading.Lock()
+
+    def escritor():
+        estados = ('encendido', 'apagado')
+        n = 0
+        while time.monotonic() < fin:
+            with app.app_context():
+                try:
+                    db.session.execute(db.update(Equipo).values(estado=estados[n % 2]))
+                    time.sleep(args.hold / 1000)
+                    db.session.commit()
+                    escrituras[0] += 1
+                except OperationalError:
+                    db.session.rollback()
+                    with lock:
+                        errores['escritura'] += 1
+            n += 1
+
+    def lector():
+        while time.monotonic() < fin:
+            with app.app_context():
+                inicio = time.perf_counter()
+                try:
+                    db.session.execute(db.select(Equipo.id, Equipo.estado)).all()
+                    db.session.commit()
+                except OperationalError:
+                    db.session.rollback()
+                    with lock:
+                        errores['lectura'] += 1
+                    continue
+                with lock:
+                    latencias.append((time.perf_counter() - inicio) * 1000)
+
+    hilos = [threading.Thread(target=escritor)] + [threading.Thread(target=lector) for _ in range(args.lectores)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    with app.app_context():
+        db.engine.dispose()
+    for sufijo in ('', '-wal', '-shm'):
+        if os.path.exists(path + sufijo):
+            os.unlink(path + sufijo)
+
+    resultado = {
+        'journal_mode': journal_mode,
+        'lecturas': len(latencias),
+        'lectura_p50_ms': round(percentil(latencias, 50), 2) if latencias else None,
+        'lectura_p99_ms': round(percentil(latencias, 99), 2) if latencias else None,
+        'escrituras': escrituras[0],
+        'errores': errores,
+    }
+    if args.json:
+        print(json.dumps(resultado, indent=2))
+        return
+    print(f"journal_mode={journal_mode}  lecturas: {resultado['lecturas']}  "
+          f"p50 {resultado['lectura_p50_ms']} ms  p99 {resultado['lectura_p99_ms']} ms")
+    print(f"escrituras: {escrituras[0]}  errores: {errores}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,18 +2,135 @@ import os
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or '7689myc'
+    # Solo SQLite: índices COLLATE NOCASE, upserts ON CONFLICT y PRAGMAs
+    # (app/sqlite_pragmas.py rechaza otros motores al iniciar)
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///equipos.db'
     SQLALCHEMY_ECHO = False
+    # Pool de conexiones (QueuePool para SQLite en archivo): al menos tantas
+    # conexiones como hilos de waitress más los hilos en segundo plano. Con
+    # sqlite:// (memoria) se omiten: ese engine usa StaticPool
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 20)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+    }
+    # PRAGMAs aplicados a cada conexión SQLite (app/sqlite_pragmas.py)
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = 'NORMAL'
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 20000))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    SQLITE_FOREIGN_KEYS = True
+    # Caché de tokens verificados (segundos)
+    TOKEN_CACHE_SIZE = 1024
+    TOKEN_CACHE_TTL = 60
+    # Cada cuántos segundos se compara la versión del índice de permisos con la base
+    PERMISSION_INDEX_CHECK_INTERVAL = 5
+    # Ídem para la versión de la flota que respalda los ETag de /api/equipos
+    FLEET_VERSION_CHECK_INTERVAL = 5
+    # Versiones que se conservan en el log de cambios de /api/equipos/changes
+    CHANGE_LOG_RETENTION = 1000
+    # Costo de bcrypt; los hashes con otro costo se regeneran al iniciar sesión
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    # Pool acotado para hash/verificación de contraseñas (503 si está lleno)
+    PASSWORD_WORKERS = int(os.environ.get('PASSWORD_WORKERS', 2))
+    PASSWORD_QUEUE_SIZE = int(os.environ.get('PASSWORD_QUEUE_SIZE', 4))
+    PASSWORD_TIMEOUT = 10
+    # Límite de intentos de login (por minuto y ráfaga) por IP y por usuario,
+    # y espera exponencial tras LOGIN_BACKOFF_AFTER fallos seguidos (segundos)
+    LOGIN_THROTTLE_ENABLED = True
+    LOGIN_RATE_PER_IP = 30
+    LOGIN_BURST_PER_IP = 10
+    LOGIN_RATE_PER_USER = 10
+    LOGIN_BURST_PER_USER = 5
+    LOGIN_BACKOFF_AFTER = 3
+    LOGIN_BACKOFF_BASE = 1
+    LOGIN_BACKOFF_MAX = 300
+    LOGIN_THROTTLE_MAX_ENTRIES = 10000
+    # Historial de sondeos: una muestra por equipo al cambiar de estado o cada
+    # HISTORY_MIN_INTERVAL segundos; lo crudo se reduce a horas tras
+    # HISTORY_RAW_RETENTION_HOURS y las horas se borran tras HISTORY_HOURLY_RETENTION_DAYS
+    HISTORY_ENABLED = True
+    HISTORY_MIN_INTERVAL = int(os.environ.get('HISTORY_MIN_INTERVAL', 60))
+    HISTORY_RAW_RETENTION_HOURS = int(os.environ.get('HISTORY_RAW_RETENTION_HOURS', 48))
+    HISTORY_HOURLY_RETENTION_DAYS = int(os.environ.get('HISTORY_HOURLY_RETENTION_DAYS', 365))
+    HISTORY_COMPACT_INTERVAL = 3600
+    # Acumulados diarios de uso (GET /api/admin/reportes/uso) y rango máximo del reporte
+    USAGE_ROLLUPS_ENABLED = True
+    USAGE_REPORT_MAX_DAYS = 366
+    # /metrics en formato Prometheus, desactivado por defecto. Al activarlo conviene
+    # definir METRICS_TOKEN: exige 'Authorization: Bearer <token>'
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    # Header Server-Timing (auth, db, arp, probe, serialize) en cada respuesta. Los requests
+    # que superan el umbral (o el presupuesto de su endpoint) se registran en el log como JSON
+    SERVER_TIMING_ENABLED = True
+    SERVER_TIMING_LOG_THRESHOLD_MS = float(os.environ['SERVER_TIMING_LOG_THRESHOLD_MS']) \
+        if os.environ.get('SERVER_TIMING_LOG_THRESHOLD_MS') else None
+    SERVER_TIMING_BUDGETS_MS = {
+        'api.api_get_equipos': 500,
+        'api.api_login': 1000,
+    }
+    # Conteo de consultas por request y aviso de N+1 (log y /metrics); los endpoints
+    # declaran su máximo con @query_budget. Desactivado por defecto
+    QUERY_STATS_ENABLED = os.environ.get('QUERY_STATS_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    QUERY_N_PLUS_ONE_THRESHOLD = 5
+    # Segundos que se reutiliza la tabla ARP antes de volver a leerla
+    ARP_CACHE_TTL = float(os.environ.get('ARP_CACHE_TTL', 5))
+    # Sondeo concurrente: tamaño del pool y plazo máximo por request (segundos)
+    PROBE_MAX_WORKERS = int(os.environ.get('PROBE_MAX_WORKERS', 32))
+    PROBE_DEADLINE = float(os.environ.get('PROBE_DEADLINE', 2))
+    # 'socket' = ICMP sin privilegios + TCP connect en proceso; 'ping' = binario del sistema
+    PROBE_METHOD = os.environ.get('PROBE_METHOD', 'socket')
+    PROBE_TIMEOUT_MS = int(os.environ.get('PROBE_TIMEOUT_MS', 1000))
+    PROBE_TCP_PORTS = tuple(int(p) for p in os.environ.get('PROBE_TCP_PORTS', '3389,22,445').split(','))
+    # Poller en segundo plano (iniciado por server.py / service.py / run.py)
+    STATUS_POLL_INTERVAL = float(os.environ.get('STATUS_POLL_INTERVAL', 30))
+    STATUS_STALE_AFTER = None  # None = 3 intervalos
+    # Hilos de waitress (server.py y service.py)
+    WAITRESS_THREADS = int(os.environ.get('WAITRESS_THREADS', 16))
+    # Stream SSE de cambios de estado (/api/equipos/stream). Cada pedido responde
+    # enseguida con los eventos pendientes; el cliente reconecta tras SSE_RETRY_MS
+    SSE_RETRY_MS = int(os.environ.get('SSE_RETRY_MS', 3000))
+    # Encendido en lote: pausa entre paquetes para no arrancar todas las fuentes a la vez
+    WOL_BATCH_STAGGER_MS = int(os.environ.get('WOL_BATCH_STAGGER_MS', 0))
+    WOL_MAX_STAGGER_MS = 2000
+    # Las pausas se hacen en el hilo del request: tope de stagger_ms * (equipos - 1)
+    WOL_MAX_STAGGER_TOTAL_MS = 5000
+    WOL_BATCH_MAX_SIZE = 200
+    # Trabajos de encendido: reintentos y plazo para que el equipo responda (segundos)
+    WAKE_JOB_TICK = 2
+    WAKE_JOB_RETRY_INTERVAL = 20
+    WAKE_JOB_MAX_ATTEMPTS = 3
+    WAKE_JOB_TIMEOUT = 180
     DEBUG = False
+    # Tamaño máximo de página para ?limit= en los listados
+    API_MAX_PAGE_SIZE = 500
 
 class DevelopmentConfig(Config):
     DEBUG = True
+    # Más holgado para pruebas manuales y scripts locales
+    LOGIN_RATE_PER_IP = 120
+    LOGIN_BURST_PER_IP = 30
 
 class ProductionConfig(Config):
     DEBUG = False
 
+class TestingConfig(Config):
+    TESTING = True
+    # tests/conftest.py asigna una base temporal por test
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    # Costo mínimo de bcrypt: los tests verifican comportamiento, no costo
+    BCRYPT_LOG_ROUNDS = 4
+    # Independientes de las variables de entorno de quien corre los tests
+    METRICS_ENABLED = True
+    METRICS_TOKEN = None
+    QUERY_STATS_ENABLED = False
+    PROBE_METHOD = 'ping'
+
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
+    'testing': TestingConfig,
     'default': DevelopmentConfig
 }
\ No newline at end of file
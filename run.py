@@ -1,6 +1,10 @@
 from app import create_app
+from app.poller import status_poller
+from app.jobs import wake_job_worker
 
 app = create_app()
 
 if __name__ == '__main__':
+    status_poller.start()
+    wake_job_worker.start()
     app.run(debug=False)
\ No newline at end of file
@@ -1,7 +1,16 @@
-from waitress import serve
+from waitress import create_server
 from app import create_app
+from app.metrics import metrics
+from app.poller import status_poller
+from app.jobs import wake_job_worker
 
 app = create_app()
 
 if __name__ == '__main__':
-    serve(app, host='0.0.0.0', port=90)
\ No newline at end of file
+    status_poller.start()
+    wake_job_worker.start()
+    server = create_server(app, host='0.0.0.0', port=90, threads=app.config['WAITRESS_THREADS'])
+    # Cola y hilos de waitress en /metrics
+    metrics.watch_waitress(server)
+    server.print_listen('Serving on http://{}:{}')
+    server.run()
\ No newline at end of file
@@ -6,8 +6,11 @@ import logging
 import os
 import sys
 import threading
-from waitress import serve
+from waitress import create_server
 from app import create_app
+from app.metrics import metrics
+from app.poller import status_poller
+from app.jobs import wake_job_worker
 
 class WakeOnLanService(win32serviceutil.ServiceFramework):
     _svc_name_ = "WakeOnLanAPI"
@@ -44,6 +47,8 @@ class WakeOnLanService(win32serviceutil.ServiceFramework):
         self.logger.info("Deteniendo servicio Wake-on-LAN...")
         self.ReportServiceStatus(win32service.SERVICE_STOP_PENDING)
         self.running = False
+        status_poller.stop()
+        wake_job_worker.stop()
         win32event.SetEvent(self.hWaitStop)
 
     def SvcDoRun(self):
@@ -59,11 +64,18 @@ class WakeOnLanService(win32serviceutil.ServiceFramework):
             # Crear la aplicación Flask
             app = create_app()
             
+            # Poller de estado y worker de encendido en segundo plano
+            status_poller.start()
+            wake_job_worker.start()
+            
             # Ejecutar servidor en un thread separado
             def run_server():
                 try:
                     self.logger.info("Servidor iniciando en puerto 90...")
-                    serve(app, host='0.0.0.0', port=90)
+                    server = create_server(app, host='0.0.0.0', port=90,
+                                           threads=app.config['WAITRESS_THREADS'])
+                    metrics.watch_waitress(server)
+                    server.run()
                 except Exception as e:
                     self.logger.error(f"Error en servidor: {e}")
                     
@@ -0,0 +1,177 @@
+"""
+Fixtures comunes: una aplicación con base SQLite temporal por test y la red
+reemplazada por un doble (tabla ARP, ping y paquetes mágicos), así ningún
+test depende de la LAN ni de privilegios.
+"""
+
+import itertools
+import socket
+import types
+
+import pytest
+
+from app import create_app
+from app import utils, wol
+from app.api import generate_token
+from app.history import probe_history
+from app.models import Equipo, User, db
+from app.passwords import password_hasher
+from app.permissions import permission_index
+from app.poller import StatusPoller
+from app.throttle import login_throttle
+from app.token_cache import token_cache
+from app.versions import fleet_version, state_version
+from config import TestingConfig
+
+
+class RedFalsa:
+    """IP por MAC, equipos que responden al ping y paquetes enviados"""
+
+    def __init__(self):
+        self.ips = {}
+        self.encendidos = set()
+        self.enviados = []
+        self.errores = {}
+
+    def obtener_por_mac(self, mac_address):
+        return self.ips.get(utils.formatearMac(mac_address))
+
+    def ping(self, host):
+        return host in self.encendidos
+
+    def socket(self, *args):
+        return _SocketFalso(self)
+
+    def conectar(self, equipo, ip, encendido=True):
+        self.ips[utils.formatearMac(equipo.mac_address)] = ip
+        if encendido:
+            self.encendidos.add(ip)
+        else:
+            self.encendidos.discard(ip)
+
+
+class _SocketFalso:
+    """Socket UDP de app/wol.py: anota la MAC de cada paquete mágico"""
+
+    def __init__(self, red):
+        self.red = red
+
+    def setsockopt(self, *args):
+        pass
+
+    def sendto(self, paquete, destino):
+        # 6 bytes 0xFF seguidos de la MAC repetida 16 veces
+        mac = ':'.join(f'{byte:02X}' for byte in paquete[6:12])
+        if mac in self.red.errores:
+            raise OSError(self.red.errores[mac])
+        self.red.enviados.append(mac)
+
+    def close(self):
+        pass
+
+
+def _reiniciar_singletons():
+    # Los singletons de app/ viven entre tests; cada test tiene una base nueva
+    token_cache._entries.clear()
+    token_cache._version = None
+    permission_index._sets = {}
+    permission_index._version = None
+    permission_index._checked_at = float('-inf')
+    fleet_version._value = None
+    fleet_version._checked_at = float('-inf')
+    state_version._value = None
+    state_version._checked_at = float('-inf')
+    login_throttle._entries.clear()
+    probe_history._buffer.clear()
+    probe_history._ultimas.clear()
+
+
+@pytest.fixture
+def red(monkeypatch):
+    red = RedFalsa()
+    monkeypatch.setattr(utils, 'obtenerPorMac', red.obtener_por_mac)
+    monkeypatch.setattr(utils, 'ping', red.ping)
+    # Solo el módulo socket que ve app/wol.py, no el global
+    monkeypatch.setattr(wol, 'socket', types.SimpleNamespace(
+        socket=red.socket, AF_INET=socket.AF_INET, SOCK_DGRAM=socket.SOCK_DGRAM,
+        SOL_SOCKET=socket.SOL_SOCKET, SO_BROADCAST=socket.SO_BROADCAST
+    ))
+    return red
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch, red):
+    monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', f'sqlite:///{tmp_path / "test.db"}')
+    _reiniciar_singletons()
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def poller_activo(monkeypatch):
+    """Los endpoints leen el estado persistido en lugar de sondear en vivo"""
+    monkeypatch.setattr(StatusPoller, 'running', property(lambda self: True))
+
+
+class Datos:
+    """Usuarios y equipos de prueba; `headers(user)` arma el Bearer"""
+
+    def __init__(self, app):
+        self.app = app
+        self._macs = itertools.count(1)
+
+    def usuario(self, username, password='pass123', role='user'):
+        with self.app.app_context():
+            user = User(username=username, password=password_hasher.hash(password), role=role)
+            db.session.add(user)
+            db.session.commit()
+            return user.id
+
+    def equipo(self, nombre=None, asignar_a=()):
+        n = next(self._macs)
+        with self.app.app_context():
+            equipo = Equipo(nombre=nombre or f'puesto {n}', mac_address=f'AA:BB:CC:00:{n >> 8:02X}:{n & 255:02X}')
+            db.session.add(equipo)
+            db.session.flush()
+            for user_id in asignar_a:
+                db.session.get(User, user_id).equipos_asignados.append(equipo)
+            if asignar_a:
+                permission_index.bump()
+            db.session.commit()
+            permission_index.invalidate()
+            return equipo.id
+
+    def get_equipo(self, equipo_id):
+        with self.app.app_context():
+            equipo = db.session.get(Equipo, equipo_id)
+            db.session.expunge(equipo)
+            return equipo
+
+    def headers(self, user_id):
+        with self.app.app_context():
+            return {'Authorization': f'Bearer {generate_token(user_id)}'}
+
+
+@pytest.fixture
+def datos(app):
+    return Datos(app)
+
+
+@pytest.fixture
+def admin(datos):
+    return datos.usuario('admin', 'admin123', role='admin')
+
+
+@pytest.fixture
+def usuario(datos):
+    return datos.usuario('u1')
@@ -0,0 +1,43 @@
+"""
+Conteo de las sentencias SQL que ejecuta un bloque o un request, para los
+presupuestos de consultas de los tests (@query_budget de app.query_stats).
+"""
+
+import contextlib
+
+from app.query_stats import query_instrumentation
+
+
+def capture_queries(app):
+    """with capture_queries(app) as stats: ... (no depende de QUERY_STATS_ENABLED)"""
+    return query_instrumentation.capture()
+
+
+@contextlib.contextmanager
+def assert_max_queries(app, maximo):
+    """Falla (AssertionError) si el bloque ejecuta más de `maximo` consultas"""
+    with capture_queries(app) as stats:
+        yield stats
+    if stats.total > maximo:
+        raise AssertionError(f'Se esperaban como máximo {maximo} consultas\n{stats.resumen(umbral=1)}')
+
+
+def assert_query_budget(client, method, url, **kwargs):
+    """
+    Hace el request con el cliente de pruebas de Flask y falla si el endpoint
+    no declaró @query_budget o si lo superó. Retorna la respuesta.
+    """
+    app = client.application
+    ruta = url.split('?', 1)[0]
+    endpoint, _ = app.url_map.bind('localhost').match(ruta, method=method)
+    maximo = getattr(app.view_functions[endpoint], 'query_budget', None)
+    if maximo is None:
+        raise AssertionError(f'{endpoint} no declara @query_budget')
+    with capture_queries(app) as stats:
+        response = client.open(url, method=method, **kwargs)
+    if stats.total > maximo:
+        raise AssertionError(
+            f'{method} {url} ({endpoint}) ejecutó {stats.total} consultas; presupuesto {maximo}\n'
+            f'{stats.resumen(umbral=1)}'
+        )
+    return response
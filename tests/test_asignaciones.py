@@ -0,0 +1,83 @@
+"""
+Asignación por conjuntos (PUT /api/admin/users/<id>/equipos) en los modos
+replace, add y remove, y su efecto en los equipos visibles del usuario.
+"""
+
+import pytest
+
+
+def asignar(client, headers, user_id, equipo_ids, modo=None):
+    body = {'equipo_ids': equipo_ids}
+    if modo:
+        body['mode'] = modo
+    return client.put(f'/api/admin/users/{user_id}/equipos', headers=headers, json=body)
+
+
+def visibles(client, headers):
+    response = client.get('/api/equipos?fields=id', headers=headers)
+    return sorted(e['id'] for e in response.get_json()['equipos'])
+
+
+def test_replace_deja_exactamente_el_conjunto(client, datos, admin, usuario):
+    a, b = datos.equipo(asignar_a=[usuario]), datos.equipo(asignar_a=[usuario])
+    c, d = datos.equipo(), datos.equipo()
+
+    response = asignar(client, datos.headers(admin), usuario, [b, c, d])
+    assert response.status_code == 200
+    data = response.get_json()
+    assert (data['added'], data['removed'], data['equipo_ids']) == ([c, d], [a], [b, c, d])
+    assert visibles(client, datos.headers(usuario)) == [b, c, d]
+
+
+def test_add_suma_sin_quitar(client, datos, admin, usuario):
+    a = datos.equipo(asignar_a=[usuario])
+    b, c = datos.equipo(), datos.equipo()
+
+    data = asignar(client, datos.headers(admin), usuario, [a, b, c], 'add').get_json()
+    assert (data['added'], data['removed'], data['equipo_ids']) == ([b, c], [], [a, b, c])
+    assert visibles(client, datos.headers(usuario)) == [a, b, c]
+
+
+def test_remove_quita_solo_los_asignados(client, datos, admin, usuario):
+    a, b = datos.equipo(asignar_a=[usuario]), datos.equipo(asignar_a=[usuario])
+    ajeno = datos.equipo()
+
+    data = asignar(client, datos.headers(admin), usuario, [a, ajeno, 999], 'remove').get_json()
+    assert (data['added'], data['removed'], data['equipo_ids']) == ([], [a], [b])
+    assert visibles(client, datos.headers(usuario)) == [b]
+
+
+def test_sin_cambios_no_incrementa_la_version(client, datos, admin, usuario, poller_activo):
+    a = datos.equipo(asignar_a=[usuario])
+    headers = datos.headers(admin)
+    version = client.get('/api/equipos/changes?since=0', headers=headers).get_json()['version']
+
+    data = asignar(client, headers, usuario, [a]).get_json()
+    assert (data['added'], data['removed']) == ([], [])
+    assert client.get('/api/equipos/changes?since=0', headers=headers).get_json()['version'] == version
+
+
+def test_equipos_inexistentes_no_modifican_nada(client, datos, admin, usuario):
+    a = datos.equipo(asignar_a=[usuario])
+    b = datos.equipo()
+
+    response = asignar(client, datos.headers(admin), usuario, [b, 998, 999])
+    assert response.status_code == 404
+    assert response.get_json()['equipo_ids'] == [998, 999]
+    assert visibles(client, datos.headers(usuario)) == [a]
+
+
+@pytest.mark.parametrize('body', [
+    {},
+    {'equipo_ids': 'todos'},
+    {'equipo_ids': [1, 'dos']},
+    {'equipo_ids': [True]},
+    {'equipo_ids': [1], 'mode': 'merge'},
+])
+def test_cuerpo_invalido(client, datos, admin, usuario, body):
+    response = client.put(f'/api/admin/users/{usuario}/equipos', headers=datos.headers(admin), json=body)
+    assert response.status_code == 400
+
+
+def test_usuario_inexistente(client, datos, admin):
+    assert asignar(client, datos.headers(admin), 999, []).status_code == 404
@@ -0,0 +1,137 @@
+"""
+Sincronización incremental (/api/equipos/changes): altas y modificaciones,
+bajas, desasignaciones y el listado completo cuando el log fue compactado.
+"""
+
+import pytest
+
+from app.models import db
+from app.versions import fleet_version
+
+
+def cambios(client, headers, since):
+    response = client.get(f'/api/equipos/changes?since={since}', headers=headers)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_upsert_devuelve_solo_el_equipo_modificado(client, datos, admin, poller_activo):
+    headers = datos.headers(admin)
+    datos.equipo()
+    modificado_id = datos.equipo()
+    version = cambios(client, headers, 0)['version']
+
+    response = client.put(f'/api/equipos/{modificado_id}', headers=headers, json={'nombre': 'renombrado'})
+    assert response.status_code == 200
+
+    data = cambios(client, headers, version)
+    assert data['snapshot'] is False
+    assert data['version'] == version + 1
+    assert [(e['id'], e['nombre']) for e in data['equipos']] == [(modificado_id, 'renombrado')]
+    assert data['deleted'] == []
+
+
+def test_sin_cambios_la_respuesta_queda_vacia(client, datos, admin, poller_activo):
+    headers = datos.headers(admin)
+    datos.equipo()
+    client.put(f'/api/equipos/{datos.equipo()}', headers=headers, json={'nombre': 'x'})
+    version = cambios(client, headers, 0)['version']
+
+    data = cambios(client, headers, version)
+    assert data == {'success': True, 'version': version, 'snapshot': False, 'equipos': [], 'deleted': []}
+
+
+def test_baja_figura_en_deleted(client, datos, admin, usuario, poller_activo):
+    equipo_id = datos.equipo(asignar_a=[usuario])
+    client.put(f'/api/equipos/{equipo_id}', headers=datos.headers(admin), json={'nombre': 'x'})
+    version = cambios(client, datos.headers(usuario), 0)['version']
+
+    response = client.delete(f'/api/equipos/{equipo_id}', headers=datos.headers(admin))
+    assert response.status_code == 200
+
+    for user_id in (admin, usuario):
+        data = cambios(client, datos.headers(user_id), version)
+        assert data['equipos'] == []
+        assert data['deleted'] == [equipo_id]
+
+
+def test_desasignacion_solo_la_ve_el_usuario_afectado(client, datos, admin, usuario, poller_activo):
+    otro = datos.usuario('u2')
+    equipo_id = datos.equipo(asignar_a=[usuario, otro])
+    client.put(f'/api/equipos/{equipo_id}', headers=datos.headers(admin), json={'nombre': 'x'})
+    version = cambios(client, datos.headers(admin), 0)['version']
+
+    response = client.post('/api/admin/unassign-equipo', headers=datos.headers(admin),
+                           json={'user_id': usuario, 'equipo_id': equipo_id})
+    assert response.status_code == 200
+
+    data = cambios(client, datos.headers(usuario), version)
+    assert data['equipos'] == []
+    assert data['deleted'] == [equipo_id]
+
+    # Para quien conserva la asignación el equipo sigue vigente
+    data = cambios(client, datos.headers(otro), version)
+    assert [e['id'] for e in data['equipos']] == [equipo_id]
+    assert data['deleted'] == []
+
+
+def test_cambios_de_equipos_ajenos_no_se_revelan(client, datos, admin, usuario, poller_activo):
+    propio_id = datos.equipo(asignar_a=[usuario])
+    ajeno_id = datos.equipo()
+    client.put(f'/api/equipos/{propio_id}', headers=datos.headers(admin), json={'nombre': 'x'})
+    version = cambios(client, datos.headers(usuario), 0)['version']
+
+    client.put(f'/api/equipos/{ajeno_id}', headers=datos.headers(admin), json={'nombre': 'y'})
+
+    data = cambios(client, datos.headers(usuario), version)
+    assert data['equipos'] == []
+    assert data['deleted'] == []
+
+
+@pytest.mark.parametrize('url', ['/api/equipos/{id}', '/equipos/{id}'])
+def test_baja_de_equipo_ajeno_no_se_revela(client, datos, admin, usuario, poller_activo, url):
+    propio_id = datos.equipo(asignar_a=[usuario])
+    ajeno_id = datos.equipo(asignar_a=[datos.usuario('u2')])
+    client.put(f'/api/equipos/{propio_id}', headers=datos.headers(admin), json={'nombre': 'x'})
+    version = cambios(client, datos.headers(usuario), 0)['version']
+
+    response = client.delete(url.format(id=ajeno_id), headers=datos.headers(admin))
+    assert response.status_code == 200
+
+    data = cambios(client, datos.headers(usuario), version)
+    assert data['equipos'] == []
+    assert data['deleted'] == []
+    assert cambios(client, datos.headers(admin), version)['deleted'] == [ajeno_id]
+
+
+def test_version_compactada_devuelve_listado_completo(app, client, datos, admin, poller_activo):
+    headers = datos.headers(admin)
+    ids = [datos.equipo() for _ in range(3)]
+    for equipo_id in ids:
+        client.put(f'/api/equipos/{equipo_id}', headers=headers, json={'nombre': f'n{equipo_id}'})
+    version = cambios(client, headers, 0)['version']
+
+    with app.app_context():
+        fleet_version.compact(version - 1)
+        db.session.commit()
+
+    data = cambios(client, headers, version - 2)
+    assert data['snapshot'] is True
+    assert [e['id'] for e in data['equipos']] == ids
+
+    # Desde la versión compactada en adelante el log sigue alcanzando
+    data = cambios(client, headers, version - 1)
+    assert data['snapshot'] is False
+    assert [e['id'] for e in data['equipos']] == [ids[-1]]
+
+
+def test_since_ausente_o_futuro_devuelve_listado_completo(client, datos, admin, poller_activo):
+    headers = datos.headers(admin)
+    ids = [datos.equipo() for _ in range(2)]
+
+    data = client.get('/api/equipos/changes', headers=headers).get_json()
+    assert data['snapshot'] is True
+    assert [e['id'] for e in data['equipos']] == ids
+
+    data = cambios(client, headers, data['version'] + 10)
+    assert data['snapshot'] is True
@@ -0,0 +1,47 @@
+"""
+Encendido en lote: las pausas entre paquetes se hacen en el hilo del
+request, así que su total queda acotado por WOL_MAX_STAGGER_TOTAL_MS.
+"""
+
+import types
+
+import pytest
+
+from app import wol
+
+
+@pytest.fixture
+def pausas(monkeypatch):
+    pausas = []
+    monkeypatch.setattr(wol, 'time', types.SimpleNamespace(sleep=pausas.append))
+    return pausas
+
+
+def encender(client, datos, user_id, ids, **extra):
+    return client.post('/api/equipos/encender-lote', headers=datos.headers(user_id), json={'ids': ids, **extra})
+
+
+def test_pausas_dentro_del_tope(client, datos, admin, red, pausas):
+    ids = [datos.equipo() for _ in range(3)]
+    response = encender(client, datos, admin, ids, stagger_ms=250)
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()['enviados'] == 3
+    assert pausas == [0.25, 0.25]
+
+
+def test_pausa_total_excesiva_responde_400(client, datos, admin, red, pausas):
+    ids = [datos.equipo() for _ in range(4)]
+    # 3 pausas de 2000 ms superan el tope de 5000 ms
+    response = encender(client, datos, admin, ids, stagger_ms=2000)
+    assert response.status_code == 400
+    assert red.enviados == []
+    assert pausas == []
+
+
+def test_pausa_por_defecto_se_reduce_al_tope(app, client, datos, admin, red, pausas):
+    app.config['WOL_BATCH_STAGGER_MS'] = 2000
+    ids = [datos.equipo() for _ in range(11)]
+    response = encender(client, datos, admin, ids)
+    assert response.status_code == 200, response.get_json()
+    assert len(red.enviados) == 11
+    assert pausas == [0.5] * 10
@@ -0,0 +1,123 @@
+"""
+ETag débil de los listados: 304 mientras la versión de la flota no cambie,
+y representación nueva después de una asignación o de un sondeo persistido.
+"""
+
+from app.poller import status_poller
+
+
+def test_listado_responde_304_con_el_mismo_etag(client, datos, usuario, poller_activo):
+    headers = datos.headers(usuario)
+    datos.equipo(asignar_a=[usuario])
+
+    response = client.get('/api/equipos', headers=headers)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert etag.startswith('W/')
+
+    response = client.get('/api/equipos', headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert response.data == b''
+
+
+def test_detalle_responde_304_con_el_mismo_etag(client, datos, usuario, poller_activo):
+    headers = datos.headers(usuario)
+    equipo_id = datos.equipo(asignar_a=[usuario])
+
+    etag = client.get(f'/api/equipos/{equipo_id}', headers=headers).headers['ETag']
+    response = client.get(f'/api/equipos/{equipo_id}', headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 304
+
+
+def test_asignacion_cambia_la_version_y_el_etag(client, datos, admin, usuario, poller_activo):
+    headers = datos.headers(usuario)
+    datos.equipo(asignar_a=[usuario])
+    nuevo_id = datos.equipo()
+
+    response = client.get('/api/equipos', headers=headers)
+    etag = response.headers['ETag']
+    assert len(response.get_json()['equipos']) == 1
+
+    response = client.post('/api/admin/assign-equipo', headers=datos.headers(admin),
+                           json={'user_id': usuario, 'equipo_id': nuevo_id})
+    assert response.status_code == 200
+
+    response = client.get('/api/equipos', headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert nuevo_id in [e['id'] for e in response.get_json()['equipos']]
+
+
+def test_el_etag_depende_de_los_parametros(client, datos, usuario, poller_activo):
+    headers = datos.headers(usuario)
+    datos.equipo(asignar_a=[usuario])
+
+    etag = client.get('/api/equipos', headers=headers).headers['ETag']
+    response = client.get('/api/equipos?fields=id,nombre', headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_sin_poller_no_hay_etag(client, datos, usuario):
+    headers = datos.headers(usuario)
+    datos.equipo(asignar_a=[usuario])
+
+    response = client.get('/api/equipos', headers=headers)
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
+
+    response = client.get('/api/equipos?refresh=true', headers={**headers, 'If-None-Match': '*'})
+    assert response.status_code == 200
+
+
+def sondear(app):
+    with app.app_context():
+        status_poller.poll_once()
+
+
+def test_cambio_de_estado_del_poller_invalida_el_etag(app, client, datos, usuario, red, poller_activo):
+    headers = datos.headers(usuario)
+    equipo_id = datos.equipo(asignar_a=[usuario])
+    red.conectar(datos.get_equipo(equipo_id), '10.0.0.1', encendido=False)
+    sondear(app)
+    etag = client.get('/api/equipos', headers=headers).headers['ETag']
+
+    red.conectar(datos.get_equipo(equipo_id), '10.0.0.1')
+    sondear(app)
+
+    response = client.get('/api/equipos', headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['equipos'][0]['estado'] == 'encendido'
+
+
+def test_sondeo_sin_cambio_de_estado_invalida_solo_los_campos_de_estado(app, client, datos, usuario, red,
+                                                                        poller_activo):
+    headers = datos.headers(usuario)
+    equipo_id = datos.equipo(asignar_a=[usuario])
+    red.conectar(datos.get_equipo(equipo_id), '10.0.0.1')
+    sondear(app)
+    completo = client.get('/api/equipos', headers=headers)
+    nombres = client.get('/api/equipos?fields=id,nombre', headers=headers).headers['ETag']
+
+    # Mismo estado e IP: cambian checked_at y rtt_ms
+    sondear(app)
+
+    response = client.get('/api/equipos', headers={**headers, 'If-None-Match': completo.headers['ETag']})
+    assert response.status_code == 200
+    assert response.get_json()['equipos'][0]['checked_at'] != completo.get_json()['equipos'][0]['checked_at']
+    response = client.get('/api/equipos?fields=id,nombre', headers={**headers, 'If-None-Match': nombres})
+    assert response.status_code == 304
+
+
+def test_refresh_invalida_el_etag_del_estado_persistido(client, datos, usuario, red, poller_activo):
+    headers = datos.headers(usuario)
+    equipo_id = datos.equipo(asignar_a=[usuario])
+    red.conectar(datos.get_equipo(equipo_id), '10.0.0.1')
+    etag = client.get(f'/api/equipos/{equipo_id}', headers=headers).headers['ETag']
+
+    assert client.get(f'/api/equipos/{equipo_id}?refresh=true', headers=headers).status_code == 200
+
+    response = client.get(f'/api/equipos/{equipo_id}', headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['equipo']['estado'] == 'encendido'
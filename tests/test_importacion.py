@@ -0,0 +1,108 @@
+"""
+Importación de inventario (/api/equipos/import) en txt, CSV y JSON: altas,
+actualizaciones por MAC y reimportación contada como omitida.
+"""
+
+import io
+import json
+
+import pytest
+
+from app.models import Equipo
+
+TXT = (
+    'b0-6e-bf-0b-1b-0e puesto 1\n'
+    '# comentario\n'
+    '\n'
+    '34:97:F6:85:38:EA puesto 2\n'
+)
+CSV = (
+    'mac_address,nombre,descripcion\n'
+    'B0:6E:BF:0B:1B:0E,puesto 1,\n'
+    '3497.F685.38EA,puesto 2,aula\n'
+)
+JSONL = (
+    '{"mac": "B0:6E:BF:0B:1B:0E", "nombre": "puesto 1"}\n'
+    '{"mac_address": "34:97:F6:85:38:EA", "name": "puesto 2"}\n'
+)
+JSON_ARREGLO = json.dumps([
+    {'mac': 'B0:6E:BF:0B:1B:0E', 'nombre': 'puesto 1'},
+    {'mac': '34:97:F6:85:38:EA', 'nombre': 'puesto 2'},
+], indent=2)
+
+
+def importar(client, headers, contenido, nombre_archivo):
+    response = client.post(
+        '/api/equipos/import', headers=headers,
+        data={'file': (io.BytesIO(contenido.encode()), nombre_archivo)},
+        content_type='multipart/form-data'
+    )
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def macs(app):
+    with app.app_context():
+        return sorted(e.mac_address for e in Equipo.query.all())
+
+
+@pytest.mark.parametrize('contenido, nombre_archivo', [
+    (TXT, 'puestos.txt'),
+    (CSV, 'inventario.csv'),
+    (JSONL, 'inventario.jsonl'),
+    (JSON_ARREGLO, 'inventario.json'),
+])
+def test_importa_y_reimportar_se_omite(app, client, datos, admin, contenido, nombre_archivo):
+    headers = datos.headers(admin)
+
+    data = importar(client, headers, contenido, nombre_archivo)
+    assert (data['created'], data['updated'], data['skipped']) == (2, 0, 0)
+    assert macs(app) == ['34:97:F6:85:38:EA', 'B0:6E:BF:0B:1B:0E']
+
+    data = importar(client, headers, contenido, nombre_archivo)
+    assert (data['created'], data['updated'], data['skipped']) == (0, 0, 2)
+    assert data['errors'] == []
+
+
+def test_actualiza_por_mac_normalizada(app, client, datos, admin):
+    headers = datos.headers(admin)
+    importar(client, headers, TXT, 'puestos.txt')
+
+    data = importar(client, headers, 'B06EBF0B1B0E aula 3\n34:97:F6:85:38:EA puesto 2\n', 'puestos.txt')
+    assert (data['created'], data['updated'], data['skipped']) == (0, 1, 1)
+    with app.app_context():
+        assert Equipo.query.filter_by(mac_address='B0:6E:BF:0B:1B:0E').one().nombre == 'aula 3'
+
+
+def test_lineas_invalidas_y_repetidas_se_reportan(client, datos, admin):
+    contenido = (
+        'B0:6E:BF:0B:1B:0E puesto 1\n'
+        'no-es-una-mac puesto 2\n'
+        'b0:6e:bf:0b:1b:0e repetido\n'
+        '34:97:F6:85:38:EA\n'
+    )
+    data = importar(client, datos.headers(admin), contenido, 'puestos.txt')
+    assert (data['created'], data['updated'], data['skipped']) == (1, 0, 3)
+    assert [error.split(':')[0] for error in data['errors']] == ['Línea 2', 'Línea 3', 'Línea 4']
+
+
+def test_cuerpo_crudo_usa_el_tipo_de_contenido(app, client, datos, admin):
+    response = client.post('/api/equipos/import', headers=datos.headers(admin),
+                           data=CSV, content_type='text/csv')
+    assert response.status_code == 200
+    assert response.get_json()['created'] == 2
+
+
+def test_csv_sin_columnas_requeridas(client, datos, admin):
+    response = client.post(
+        '/api/equipos/import', headers=datos.headers(admin),
+        data={'file': (io.BytesIO(b'foo,bar\n1,2\n'), 'inventario.csv')},
+        content_type='multipart/form-data'
+    )
+    assert response.status_code == 400
+
+
+def test_solo_admin(client, datos, usuario):
+    response = client.post('/api/equipos/import', headers=datos.headers(usuario),
+                           data=TXT, content_type='text/plain')
+    assert response.status_code == 403
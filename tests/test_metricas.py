@@ -0,0 +1,36 @@
+"""
+/metrics: desactivado por defecto y, con METRICS_TOKEN, solo con el
+Bearer correspondiente.
+"""
+
+import pytest
+
+from app import create_app
+from app.metrics import MetricsRegistry
+from config import TestingConfig
+
+
+@pytest.fixture
+def crear_cliente(monkeypatch, red):
+    def crear(**config):
+        for clave, valor in config.items():
+            monkeypatch.setattr(TestingConfig, clave, valor)
+        return create_app('testing').test_client()
+    return crear
+
+
+def test_desactivado_no_registra_la_ruta(crear_cliente):
+    assert MetricsRegistry().enabled is False
+    client = crear_cliente(METRICS_ENABLED=False)
+    assert client.get('/metrics').status_code == 404
+
+
+def test_con_token_exige_bearer(crear_cliente):
+    client = crear_cliente(METRICS_ENABLED=True, METRICS_TOKEN='secreto')
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer otro'}).status_code == 401
+
+    response = client.get('/metrics', headers={'Authorization': 'Bearer secreto'})
+    assert response.status_code == 200
+    assert 'wol_magic_packets_total' in response.get_data(as_text=True)
+
@@ -0,0 +1,43 @@
+"""
+Listados paginados: `total` es la cantidad filtrada, no el largo de la
+página, y next_cursor recorre todas las filas.
+"""
+
+
+def recorrer(client, url, headers, clave):
+    ids, totales, after = [], set(), None
+    while True:
+        pagina = client.get(url + (f'&after={after}' if after else ''), headers=headers).get_json()
+        ids.extend(fila['id'] for fila in pagina[clave])
+        totales.add(pagina['total'])
+        after = pagina['next_cursor']
+        if after is None:
+            return ids, totales
+
+
+def test_total_de_equipos_es_el_filtrado(client, datos, admin, red):
+    headers = datos.headers(admin)
+    ids = [datos.equipo(nombre=f'aula {i}') for i in range(5)]
+    datos.equipo(nombre='oficina')
+
+    vistos, totales = recorrer(client, '/api/equipos?fields=id&limit=2&nombre=aula', headers, 'equipos')
+    assert vistos == ids
+    assert totales == {5}
+
+    sin_paginar = client.get('/api/equipos?fields=id', headers=headers).get_json()
+    assert sin_paginar['total'] == 6 and sin_paginar['next_cursor'] is None
+
+
+def test_total_de_usuarios_es_el_filtrado(client, datos, admin):
+    headers = datos.headers(admin)
+    ids = [datos.usuario(f'alumno{i}') for i in range(3)]
+    datos.usuario('docente')
+    datos.equipo(asignar_a=ids[:1])
+
+    for fields in ('', '&fields=id,username'):
+        vistos, totales = recorrer(client, f'/api/admin/users?username=alumno&limit=2{fields}', headers, 'users')
+        assert vistos == ids
+        assert totales == {3}
+
+    respuesta = client.get('/api/admin/users?role=admin&limit=5', headers=headers).get_json()
+    assert respuesta['total'] == 1 and len(respuesta['users']) == 1
@@ -0,0 +1,114 @@
+"""
+Pool de bcrypt: rechazo inmediato al saturarse (503 en el login), rehash
+al cambiar el costo y verificación normal de contraseñas.
+"""
+
+import threading
+
+import pytest
+
+from app.models import User, db
+from app.passwords import PasswordHasher, PasswordHasherBusy, password_hasher
+
+
+@pytest.fixture
+def bloqueado():
+    """Evento que mantiene ocupadas las tareas del pool hasta liberarlo"""
+    evento = threading.Event()
+    yield evento
+    evento.set()
+
+
+def ocupar(hasher, evento, cantidad):
+    def esperar(*args):
+        evento.wait(5)
+        return True
+
+    hilos = [threading.Thread(target=hasher._submit, args=('check', esperar)) for _ in range(cantidad)]
+    for hilo in hilos:
+        hilo.start()
+    return hilos
+
+
+def esperar_ocupado(hasher, libres=0):
+    # Los hilos toman sus lugares de forma asíncrona
+    for _ in range(500):
+        if hasher._slots is not None and hasher._slots._value == libres:
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError('el pool no llegó a ocuparse')
+
+
+def test_pool_lleno_rechaza_de_inmediato(app, bloqueado):
+    hasher = PasswordHasher()
+    hasher.init_app(app)
+    hasher.max_workers, hasher.queue_size = 1, 1
+    hilos = ocupar(hasher, bloqueado, 2)
+    try:
+        esperar_ocupado(hasher)
+        with pytest.raises(PasswordHasherBusy):
+            hasher.hash('pass123')
+    finally:
+        bloqueado.set()
+        for hilo in hilos:
+            hilo.join()
+        hasher.shutdown()
+
+    # Liberado el pool vuelve a aceptar trabajo
+    assert hasher.check(hasher.hash('pass123'), 'pass123')
+    hasher.shutdown()
+
+
+def test_timeout_responde_ocupado(app, bloqueado):
+    hasher = PasswordHasher()
+    hasher.init_app(app)
+    hasher.max_workers, hasher.queue_size, hasher.timeout = 1, 0, 0.05
+    try:
+        with pytest.raises(PasswordHasherBusy):
+            hasher._submit('check', lambda: bloqueado.wait(5))
+    finally:
+        bloqueado.set()
+        hasher.shutdown()
+
+
+def test_login_saturado_responde_503(app, client, datos, usuario, monkeypatch, bloqueado):
+    monkeypatch.setattr(password_hasher, 'max_workers', 1)
+    monkeypatch.setattr(password_hasher, 'queue_size', 0)
+    monkeypatch.setattr(password_hasher, '_executor', None)
+    monkeypatch.setattr(password_hasher, '_slots', None)
+    hilos = ocupar(password_hasher, bloqueado, 1)
+    try:
+        esperar_ocupado(password_hasher)
+        response = client.post('/api/auth/login', json={'username': 'u1', 'password': 'pass123'})
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+    finally:
+        bloqueado.set()
+        for hilo in hilos:
+            hilo.join()
+        password_hasher.shutdown()
+
+
+def test_login_rehashea_si_cambia_el_costo(app, client, datos, usuario):
+    with app.app_context():
+        hash_anterior = db.session.get(User, usuario).password
+    assert hash_anterior.startswith('$2b$04$')
+
+    app.config['BCRYPT_LOG_ROUNDS'] = 5
+    password_hasher.init_app(app)
+    try:
+        response = client.post('/api/auth/login', json={'username': 'u1', 'password': 'pass123'})
+    finally:
+        app.config['BCRYPT_LOG_ROUNDS'] = 4
+        password_hasher.init_app(app)
+    assert response.status_code == 200
+
+    with app.app_context():
+        hash_nuevo = db.session.get(User, usuario).password
+    assert hash_nuevo.startswith('$2b$05$')
+    assert password_hasher.check(hash_nuevo, 'pass123')
+
+
+def test_contrasena_incorrecta(client, datos, usuario):
+    response = client.post('/api/auth/login', json={'username': 'u1', 'password': 'otra'})
+    assert response.status_code == 401
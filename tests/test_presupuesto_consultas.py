@@ -0,0 +1,116 @@
+"""
+Presupuestos de @query_budget: cada endpoint que lo declara se mide con el
+estado que mantiene el poller y con sondeo en vivo (?refresh=true o sin
+poller), que además escribe estados, historial, uso y log de cambios.
+"""
+
+import pytest
+
+from app.metrics import db_query_duration
+from app.models import db
+from tests.consultas import assert_query_budget, capture_queries
+
+EQUIPOS = 12
+
+
+@pytest.fixture
+def flota(datos, admin, usuario, red):
+    """Equipos asignados al usuario; la mitad responde al ping"""
+    ids = [datos.equipo(asignar_a=[usuario]) for _ in range(EQUIPOS)]
+    for i, equipo_id in enumerate(ids):
+        red.conectar(datos.get_equipo(equipo_id), f'10.0.0.{i + 1}', encendido=i % 2 == 0)
+    return ids
+
+
+# (método, url, quién, acepta ?refresh=true)
+ENDPOINTS = [
+    ('GET', '/api/equipos', 'usuario', True),
+    ('GET', '/api/equipos?fields=id,nombre', 'usuario', False),
+    ('GET', '/api/equipos', 'admin', True),
+    ('GET', '/api/equipos?limit=5', 'usuario', True),
+    ('GET', '/api/equipos/changes?since=0', 'usuario', False),
+    ('GET', '/api/equipos/stream', 'usuario', False),
+    ('GET', '/api/equipos/{id}', 'usuario', True),
+    ('GET', '/api/equipos/{id}/estado', 'usuario', True),
+    ('GET', '/api/equipos/{id}/historial', 'usuario', False),
+    ('GET', '/api/admin/users', 'admin', False),
+    ('GET', '/api/admin/users?limit=1', 'admin', False),
+    ('GET', '/api/admin/reportes/uso', 'admin', False),
+    ('GET', '/api/me', 'usuario', False),
+    ('GET', '/equipos', 'usuario', True),
+    ('GET', '/equipos', 'admin', True),
+    ('GET', '/equipos/{id}', 'usuario', True),
+    ('GET', '/equipos/{id}/estado', 'usuario', True),
+    ('GET', '/admin/users', 'admin', False),
+    ('GET', '/me', 'usuario', False),
+]
+
+
+def ids_de(endpoints):
+    return [f'{metodo} {url} ({quien})' for metodo, url, quien, _ in endpoints]
+
+
+def medir(client, datos, flota, usuarios, metodo, url, quien):
+    headers = datos.headers(usuarios[quien])
+    url = url.format(id=flota[0])
+    # Primera pasada: caché de tokens e índice de permisos ya cargados
+    client.open(url, method=metodo, headers=headers)
+    response = assert_query_budget(client, metodo, url, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return response
+
+
+@pytest.fixture
+def usuarios(admin, usuario):
+    return {'admin': admin, 'usuario': usuario}
+
+
+@pytest.mark.parametrize('metodo, url, quien, _', ENDPOINTS, ids=ids_de(ENDPOINTS))
+def test_con_poller(client, datos, flota, usuarios, poller_activo, metodo, url, quien, _):
+    medir(client, datos, flota, usuarios, metodo, url, quien)
+
+
+@pytest.mark.parametrize('metodo, url, quien, _', ENDPOINTS, ids=ids_de(ENDPOINTS))
+def test_sin_poller(client, datos, flota, usuarios, metodo, url, quien, _):
+    medir(client, datos, flota, usuarios, metodo, url, quien)
+
+
+REFRESH = [e for e in ENDPOINTS if e[3]]
+
+
+@pytest.mark.parametrize('metodo, url, quien, _', REFRESH, ids=ids_de(REFRESH))
+def test_refresh_con_cambios_de_estado(client, datos, flota, usuarios, red, poller_activo, metodo, url, quien, _):
+    headers = datos.headers(usuarios[quien])
+    url = url.format(id=flota[0]) + ('&' if '?' in url else '?') + 'refresh=true'
+    client.open(url, method=metodo, headers=headers)
+
+    # Todos cambian de estado: el sondeo escribe equipos, historial, uso y cambios
+    for i, equipo_id in enumerate(flota):
+        red.conectar(datos.get_equipo(equipo_id), f'10.0.0.{i + 1}', encendido=i % 2 == 1)
+    antes = datos.get_equipo(flota[0]).estado
+    response = assert_query_budget(client, metodo, url, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    assert datos.get_equipo(flota[0]).estado != antes
+
+
+def test_todos_los_presupuestos_tienen_test(app):
+    declarados = {
+        regla.rule for regla in app.url_map.iter_rules()
+        if getattr(app.view_functions[regla.endpoint], 'query_budget', None) is not None
+    }
+    cubiertos = {url.split('?')[0].replace('{id}', '<int:equipo_id>') for _, url, _, _ in ENDPOINTS}
+    assert declarados == cubiertos
+
+
+def test_un_listener_alimenta_capturas_metricas_y_server_timing(app, client, datos, admin, poller_activo):
+    headers = datos.headers(admin)
+    with app.app_context():
+        assert len(list(db.engine.dispatch.after_cursor_execute)) == 1
+    client.get('/api/admin/users', headers=headers)
+    observadas = db_query_duration.totales().get((), [0])[-1]
+
+    with capture_queries(app) as stats:
+        response = client.get('/api/admin/users', headers=headers)
+    assert stats.total > 0
+    assert f'desc="{stats.total} consulta' in response.headers['Server-Timing']
+    assert db_query_duration.totales()[()][-1] == observadas + stats.total
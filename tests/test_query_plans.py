@@ -0,0 +1,49 @@
+"""
+EXPLAIN QUERY PLAN de las consultas de los endpoints sobre una base creada
+con las migraciones (no con create_all): ningún recorrido completo.
+"""
+
+import os
+
+import pytest
+from flask_migrate import upgrade
+
+from app import create_app
+from app.models import db
+from app.query_plans import full_scans, verify
+from config import TestingConfig
+
+MIGRACIONES = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'migrations')
+
+
+@pytest.fixture
+def app_migrada(tmp_path, monkeypatch, red):
+    monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', f'sqlite:///{tmp_path / "migrada.db"}')
+    app = create_app('testing')
+    with app.app_context():
+        upgrade(directory=MIGRACIONES)
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_ninguna_consulta_recorre_tablas_completas(app_migrada):
+    resultados = verify()
+    assert resultados
+    fallidas = {descripcion: plan for descripcion, plan, recorridas in resultados if recorridas}
+    assert fallidas == {}
+
+
+def test_full_scans_detecta_recorridos():
+    plan = ['SCAN equipo', 'SEARCH user USING INDEX ix_user_role (role=?)', 'SCAN user_equipos_1']
+    assert full_scans(plan, {'equipo', 'user', 'user_equipos'}) == ['equipo', 'user_equipos']
+    assert full_scans(['SCAN equipo USING COVERING INDEX ix_equipo_nombre'], {'equipo'}) == ['equipo']
+
+
+def test_conteo_de_equipos_por_usuario_sin_agrupar_la_tabla(app_migrada):
+    planes = {descripcion: plan for descripcion, plan, _ in verify()}
+    plan = planes['GET /api/admin/users?after=&limit=']
+    assert not any(detalle.startswith('MATERIALIZE') for detalle in plan)
+    assert any('user_equipos' in detalle and '(user_id=?)' in detalle for detalle in plan)
+    # Los objetos de ejemplo no quedan en la sesión
+    assert list(db.session) == []
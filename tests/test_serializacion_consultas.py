@@ -0,0 +1,78 @@
+"""
+Presupuesto de consultas de los listados y detalles: la cantidad no debe
+crecer con la cantidad de usuarios, equipos ni asignaciones (sin N+1).
+"""
+
+import pytest
+
+from tests.consultas import capture_queries
+
+
+def contar(app, client, url, headers):
+    with capture_queries(app) as stats:
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return stats.total
+
+
+def poblar(datos, prefijo, usuarios, equipos_por_usuario):
+    ids = [datos.usuario(f'{prefijo}{i}') for i in range(usuarios)]
+    for user_id in ids:
+        for _ in range(equipos_por_usuario):
+            datos.equipo(asignar_a=[user_id, ids[0]])
+    return ids
+
+
+@pytest.mark.parametrize('url, maximo', [
+    ('/api/admin/users', 3),
+    ('/admin/users', 3),
+    ('/api/me', 3),
+    ('/me', 3),
+])
+def test_listados_de_usuarios_no_crecen_con_la_flota(app, client, datos, admin, poller_activo, url, maximo):
+    headers = datos.headers(admin)
+    poblar(datos, 'a', 2, 1)
+    # La primera pasada carga el índice de permisos y la caché de tokens
+    client.get(url, headers=headers)
+    pocos = contar(app, client, url, headers)
+
+    poblar(datos, 'b', 20, 3)
+    client.get(url, headers=headers)
+    muchos = contar(app, client, url, headers)
+
+    assert muchos == pocos
+    assert muchos <= maximo
+
+
+@pytest.mark.parametrize('url', ['/api/equipos/{id}', '/equipos/{id}'])
+def test_detalle_con_usuarios_asignados_en_una_consulta(app, client, datos, admin, poller_activo, url):
+    headers = datos.headers(admin)
+    usuarios = [datos.usuario(f'user{i}') for i in range(15)]
+    pocos_id = datos.equipo(asignar_a=usuarios[:1])
+    muchos_id = datos.equipo(asignar_a=usuarios)
+
+    client.get(url.format(id=pocos_id), headers=headers)
+    pocos = contar(app, client, url.format(id=pocos_id), headers)
+    muchos = contar(app, client, url.format(id=muchos_id), headers)
+    response = client.get(url.format(id=muchos_id), headers=headers)
+
+    assert muchos == pocos
+    equipo = response.get_json()['equipo']
+    assert len(equipo['usuarios_asignados']) == 15
+    conteos = {u['username']: u['equipos_count'] for u in equipo['usuarios_asignados']}
+    assert conteos['user0'] == 2 and conteos['user14'] == 1
+
+
+def test_listado_de_equipos_del_usuario(app, client, datos, usuario, poller_activo):
+    headers = datos.headers(usuario)
+    for _ in range(3):
+        datos.equipo(asignar_a=[usuario])
+    client.get('/api/equipos', headers=headers)
+    pocos = contar(app, client, '/api/equipos', headers)
+
+    for _ in range(30):
+        datos.equipo(asignar_a=[usuario])
+    client.get('/api/equipos', headers=headers)
+    muchos = contar(app, client, '/api/equipos', headers)
+
+    assert muchos == pocos
@@ -0,0 +1,149 @@
+"""
+PRAGMAs de SQLite: en modo WAL una transacción de escritura abierta no
+bloquea a los lectores, y busy_timeout hace esperar a otro escritor en
+lugar de fallar con "database is locked".
+"""
+
+import threading
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool, StaticPool
+
+from app import create_app
+from app.api import generate_token
+from app.models import Equipo, User, db
+from config import TestingConfig
+
+
+@pytest.fixture
+def crear_app(tmp_path, monkeypatch, red):
+    """Aplicación con PRAGMAs a medida sobre una base en disco"""
+    apps = []
+
+    def crear(**config):
+        monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', f'sqlite:///{tmp_path / "wal.db"}')
+        for clave, valor in config.items():
+            monkeypatch.setattr(TestingConfig, clave, valor)
+        app = create_app('testing')
+        with app.app_context():
+            db.create_all()
+            db.session.add(Equipo(nombre='puesto 1', mac_address='AA:BB:CC:00:00:01'))
+            db.session.commit()
+        apps.append(app)
+        return app
+
+    yield crear
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+
+def escritura_abierta(app):
+    """Conexión con una transacción exclusiva sin confirmar"""
+    with app.app_context():
+        conexion = db.engine.raw_connection()
+    conexion.driver_connection.execute('BEGIN EXCLUSIVE')
+    conexion.driver_connection.execute("UPDATE equipo SET nombre = 'sin confirmar'")
+    return conexion
+
+
+def leer_nombres(app):
+    with app.app_context():
+        return [e.nombre for e in Equipo.query.all()]
+
+
+def test_pragmas_aplicados_a_cada_conexion(crear_app):
+    app = crear_app()
+    with app.app_context():
+        with db.engine.connect() as conexion:
+            assert conexion.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+            assert conexion.execute(text('PRAGMA busy_timeout')).scalar() == 5000
+            assert conexion.execute(text('PRAGMA foreign_keys')).scalar() == 1
+
+
+def test_lector_no_espera_a_un_escritor_abierto(crear_app):
+    app = crear_app()
+    conexion = escritura_abierta(app)
+    try:
+        inicio = time.monotonic()
+        assert leer_nombres(app) == ['puesto 1']
+        # Sin esperar el busy_timeout de 5 s
+        assert time.monotonic() - inicio < 1
+    finally:
+        conexion.driver_connection.rollback()
+        conexion.close()
+
+
+def test_lector_del_api_no_espera_a_un_escritor_abierto(crear_app):
+    app = crear_app()
+    client = app.test_client()
+    with app.app_context():
+        user = User(username='admin', password='x', role='admin')
+        db.session.add(user)
+        db.session.commit()
+        headers = {'Authorization': f'Bearer {generate_token(user.id)}'}
+
+    conexion = escritura_abierta(app)
+    try:
+        inicio = time.monotonic()
+        response = client.get('/api/equipos?fields=id,nombre', headers=headers)
+        assert response.status_code == 200, response.get_json()
+        assert [e['nombre'] for e in response.get_json()['equipos']] == ['puesto 1']
+        assert time.monotonic() - inicio < 1
+    finally:
+        conexion.driver_connection.rollback()
+        conexion.close()
+
+
+def test_sin_wal_el_lector_queda_bloqueado(crear_app):
+    # Control: con el journal por defecto la misma situación bloquea la lectura
+    app = crear_app(SQLITE_JOURNAL_MODE='DELETE', SQLITE_BUSY_TIMEOUT_MS=100)
+    conexion = escritura_abierta(app)
+    try:
+        inicio = time.monotonic()
+        with pytest.raises(Exception, match='locked'):
+            leer_nombres(app)
+        # El error llega tras el busy_timeout configurado, también en una conexión nueva
+        assert time.monotonic() - inicio < 1
+    finally:
+        conexion.driver_connection.rollback()
+        conexion.close()
+
+
+def test_busy_timeout_hace_esperar_al_segundo_escritor(crear_app):
+    app = crear_app(SQLITE_BUSY_TIMEOUT_MS=2000)
+    conexion = escritura_abierta(app)
+    liberar = threading.Timer(0.3, lambda: (conexion.driver_connection.commit(), conexion.close()))
+    liberar.start()
+    try:
+        inicio = time.monotonic()
+        with app.app_context():
+            db.session.execute(db.update(Equipo).values(nombre='segundo escritor'))
+            db.session.commit()
+        assert time.monotonic() - inicio >= 0.2
+    finally:
+        liberar.join()
+    assert leer_nombres(app) == ['segundo escritor']
+
+
+def test_base_en_memoria_sin_opciones_de_pool(red):
+    # TestingConfig sin la base temporal de conftest: sqlite:// usa StaticPool
+    app = create_app('testing')
+    with app.app_context():
+        assert isinstance(db.engine.pool, StaticPool)
+        db.create_all()
+        db.session.add(Equipo(nombre='puesto 1', mac_address='AA:BB:CC:00:00:01'))
+        db.session.commit()
+        assert [e.nombre for e in Equipo.query.all()] == ['puesto 1']
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_base_en_archivo_usa_las_opciones_de_pool(crear_app):
+    app = crear_app()
+    with app.app_context():
+        assert isinstance(db.engine.pool, QueuePool)
+        assert db.engine.pool.size() == TestingConfig.SQLALCHEMY_ENGINE_OPTIONS['pool_size']
@@ -0,0 +1,67 @@
+"""
+Stream SSE por pedidos cortos: cada pedido responde enseguida con los
+eventos posteriores a Last-Event-ID que el usuario puede ver, sin retener
+un hilo ni limitar las suscripciones.
+"""
+
+from app.events import event_broker
+
+
+def eventos(response):
+    """(id, event, data) de cada mensaje de la respuesta, sin el retry inicial"""
+    mensajes = []
+    for bloque in response.get_data(as_text=True).split('\n\n'):
+        campos = dict(linea.split(': ', 1) for linea in bloque.splitlines() if not linea.startswith('retry'))
+        if campos:
+            mensajes.append((campos.get('id'), campos.get('event'), campos.get('data')))
+    return mensajes
+
+
+def test_primera_conexion_responde_el_ultimo_id_sin_esperar(client, datos, usuario):
+    equipo_id = datos.equipo(asignar_a=[usuario])
+    event_broker.publish(equipo_id, {'id': equipo_id, 'estado': 'encendido'})
+
+    response = client.get('/api/equipos/stream', headers=datos.headers(usuario))
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    # Cuerpo completo con Content-Length: la respuesta no queda abierta
+    assert int(response.headers['Content-Length']) == len(response.get_data())
+    assert response.get_data(as_text=True).startswith(f'retry: {event_broker.retry_ms}\n\n')
+    assert eventos(response) == [(str(event_broker.last_id), None, None)]
+
+
+def test_reconexion_envia_solo_eventos_visibles(client, datos, usuario):
+    propio = datos.equipo(asignar_a=[usuario])
+    ajeno = datos.equipo()
+    desde = event_broker.last_id
+    event_broker.publish(propio, {'id': propio, 'estado': 'encendido'})
+    ultimo = event_broker.publish(ajeno, {'id': ajeno, 'estado': 'apagado'})
+
+    headers = {**datos.headers(usuario), 'Last-Event-ID': str(desde)}
+    response = client.get('/api/equipos/stream', headers=headers)
+    assert eventos(response) == [
+        (str(desde + 1), 'estado', f'{{"id": {propio}, "estado": "encendido"}}'),
+        # El evento ajeno no se envía, pero el cursor avanza igual
+        (str(ultimo.id), None, None),
+    ]
+
+    # Sin eventos nuevos la respuesta es vacía y también termina enseguida
+    response = client.get(f'/api/equipos/stream?last_event_id={ultimo.id}', headers=datos.headers(usuario))
+    assert eventos(response) == [(str(ultimo.id), None, None)]
+
+
+def test_eventos_fuera_del_buffer_piden_recargar(client, datos, admin):
+    equipo_id = datos.equipo()
+    desde = event_broker.last_id
+    for _ in range(event_broker._events.maxlen + 1):
+        event_broker.publish(equipo_id, {'id': equipo_id})
+
+    headers = {**datos.headers(admin), 'Last-Event-ID': str(desde)}
+    response = client.get('/api/equipos/stream', headers=headers)
+    assert eventos(response) == [(str(event_broker.last_id), 'reset', '{}')]
+
+
+def test_sin_tope_de_suscripciones(app, client, datos, usuario):
+    headers = datos.headers(usuario)
+    respuestas = [client.get('/api/equipos/stream', headers=headers) for _ in range(app.config['WAITRESS_THREADS'])]
+    assert {response.status_code for response in respuestas} == {200}
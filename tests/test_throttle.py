@@ -0,0 +1,97 @@
+"""
+Limitación de logins: ráfaga por usuario e IP, backoff exponencial tras
+fallos seguidos y 429 con Retry-After en el endpoint.
+"""
+
+import pytest
+
+from app import throttle
+from app.throttle import LoginThrottle
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def __call__(self):
+        return self.ahora
+
+    def avanzar(self, segundos):
+        self.ahora += segundos
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = Reloj()
+    monkeypatch.setattr(throttle.time, 'monotonic', reloj)
+    return reloj
+
+
+def test_backoff_se_duplica_con_cada_fallo(reloj):
+    limite = LoginThrottle(user_burst=100, ip_burst=100, backoff_after=3, backoff_base=1.0, backoff_max=5.0)
+
+    for _ in range(3):
+        assert limite.check('10.0.0.1', 'ana') == 0
+        limite.failure('10.0.0.1', 'ana')
+    assert limite.check('10.0.0.1', 'ana') == 0
+
+    esperas = []
+    for _ in range(4):
+        limite.failure('10.0.0.1', 'ana')
+        esperas.append(limite.check('10.0.0.1', 'ana'))
+        reloj.avanzar(esperas[-1])
+    assert esperas == [1.0, 2.0, 4.0, 5.0]
+
+
+def test_exito_reinicia_el_backoff(reloj):
+    limite = LoginThrottle(user_burst=100, ip_burst=100, backoff_after=1)
+    limite.failure('10.0.0.1', 'ana')
+    limite.failure('10.0.0.1', 'ana')
+    assert limite.check('10.0.0.1', 'ana') > 0
+
+    limite.success('10.0.0.1', 'ana')
+    assert limite.check('10.0.0.1', 'ANA ') == 0
+
+
+def test_rafaga_por_usuario_y_recarga(reloj):
+    limite = LoginThrottle(user_rate=6, user_burst=2, ip_burst=100)
+    assert limite.check('10.0.0.1', 'ana') == 0
+    assert limite.check('10.0.0.2', 'ana') == 0
+    # 6 por minuto: un token cada 10 s
+    assert limite.check('10.0.0.3', 'ana') == pytest.approx(10.0)
+    assert limite.check('10.0.0.3', 'beto') == 0
+
+    reloj.avanzar(10)
+    assert limite.check('10.0.0.3', 'ana') == 0
+
+
+def test_rafaga_por_ip(reloj):
+    limite = LoginThrottle(ip_rate=60, ip_burst=2, user_burst=100)
+    assert limite.check('10.0.0.1', 'ana') == 0
+    assert limite.check('10.0.0.1', 'beto') == 0
+    assert limite.check('10.0.0.1', 'carla') == pytest.approx(1.0)
+    assert limite.check('10.0.0.2', 'carla') == 0
+
+
+def test_tabla_acotada(reloj):
+    limite = LoginThrottle(max_entries=10)
+    for i in range(50):
+        limite.check(f'10.0.0.{i}', None)
+    assert len(limite._entries) <= 10
+
+
+def test_login_responde_429_tras_fallos(app, client, datos, usuario, reloj):
+    app.config['LOGIN_BACKOFF_AFTER'] = 2
+    throttle.login_throttle.init_app(app)
+
+    for _ in range(3):
+        response = client.post('/api/auth/login', json={'username': 'u1', 'password': 'otra'})
+        assert response.status_code == 401
+
+    response = client.post('/api/auth/login', json={'username': 'u1', 'password': 'pass123'})
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '1'
+
+    reloj.avanzar(1)
+    response = client.post('/api/auth/login', json={'username': 'u1', 'password': 'pass123'})
+    assert response.status_code == 200
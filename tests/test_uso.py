@@ -0,0 +1,150 @@
+"""
+Acumulados de uso y métricas: todos los caminos de encendido suman el
+pedido al equipo y al usuario y cuentan el paquete en /metrics; las
+transiciones de estado se escriben con el flush del sondeo.
+"""
+
+import datetime
+
+import pytest
+
+from app.metrics import magic_packets
+from app.models import Equipo, UsoEquipoDia, UsoUsuarioDia, db
+from app.usage import usage_rollups
+
+
+def wakes(app, equipo_id, user_id):
+    with app.app_context():
+        equipo = db.session.scalar(db.select(db.func.sum(UsoEquipoDia.wakes))
+                                   .filter(UsoEquipoDia.equipo_id == equipo_id))
+        usuario = db.session.scalar(db.select(db.func.sum(UsoUsuarioDia.wakes))
+                                    .filter(UsoUsuarioDia.user_id == user_id))
+    return equipo or 0, usuario or 0
+
+
+def enviados():
+    return magic_packets.totales().get(('sent',), 0)
+
+
+def encender_web(client, datos, user_id, equipo_id):
+    with client.session_transaction() as sesion:
+        sesion['user_id'] = user_id
+    return client.get(f'/encender/{equipo_id}')
+
+
+CAMINOS = {
+    'POST /equipos/<id>/encender': lambda client, datos, user_id, equipo_id: client.post(
+        f'/equipos/{equipo_id}/encender', headers=datos.headers(user_id)),
+    'POST /api/equipos/<id>/encender': lambda client, datos, user_id, equipo_id: client.post(
+        f'/api/equipos/{equipo_id}/encender', headers=datos.headers(user_id)),
+    'POST /api/equipos/encender-lote': lambda client, datos, user_id, equipo_id: client.post(
+        '/api/equipos/encender-lote', headers=datos.headers(user_id), json={'ids': [equipo_id], 'stagger_ms': 0}),
+    'GET /encender/<id>': encender_web,
+}
+
+
+@pytest.mark.parametrize('camino', CAMINOS)
+def test_todo_encendido_registra_uso_y_metricas(app, client, datos, usuario, red, camino):
+    equipo_id = datos.equipo(asignar_a=[usuario])
+    antes = enviados()
+
+    response = CAMINOS[camino](client, datos, usuario, equipo_id)
+    assert response.status_code < 400, response.get_data(as_text=True)
+
+    assert red.enviados == [datos.get_equipo(equipo_id).mac_address]
+    assert enviados() == antes + 1
+    assert wakes(app, equipo_id, usuario) == (1, 1)
+
+
+def test_envio_fallido_cuenta_en_metricas(app, client, datos, usuario, red):
+    equipo_id = datos.equipo(asignar_a=[usuario])
+    red.errores[datos.get_equipo(equipo_id).mac_address] = 'Network is unreachable'
+    antes = magic_packets.totales().get(('failed',), 0)
+
+    response = client.post(f'/equipos/{equipo_id}/encender', headers=datos.headers(usuario))
+    assert response.status_code == 200
+    assert response.get_json()['job']['estado'] == 'failed'
+    assert magic_packets.totales().get(('failed',), 0) == antes + 1
+
+
+def test_envio_fallido_desde_la_web_no_registra_uso(app, client, datos, usuario, red):
+    equipo_id = datos.equipo(asignar_a=[usuario])
+    red.errores[datos.get_equipo(equipo_id).mac_address] = 'Network is unreachable'
+    antes = magic_packets.totales().get(('failed',), 0)
+
+    response = encender_web(client, datos, usuario, equipo_id)
+    assert response.status_code == 302
+    with client.session_transaction() as sesion:
+        assert sesion['_flashes'][0][0] == 'danger'
+    assert magic_packets.totales().get(('failed',), 0) == antes + 1
+    assert wakes(app, equipo_id, usuario) == (0, 0)
+
+
+def test_sin_acceso_no_registra(app, client, datos, usuario, red):
+    equipo_id = datos.equipo()
+
+    response = client.post(f'/equipos/{equipo_id}/encender', headers=datos.headers(usuario))
+    assert response.status_code == 403
+    assert red.enviados == []
+    assert wakes(app, equipo_id, usuario) == (0, 0)
+
+
+def test_transiciones_se_escriben_con_el_sondeo(app, client, datos, usuario, red):
+    equipo_id = datos.equipo(asignar_a=[usuario])
+    equipo = datos.get_equipo(equipo_id)
+    headers = datos.headers(usuario)
+
+    # Sin poller el estado se sondea en vivo y se persiste en el mismo request
+    red.conectar(equipo, '10.0.0.5', encendido=False)
+    assert client.get(f'/api/equipos/{equipo_id}/estado', headers=headers).status_code == 200
+    red.conectar(equipo, '10.0.0.5')
+    assert client.get(f'/api/equipos/{equipo_id}/estado', headers=headers).status_code == 200
+    with app.app_context():
+        assert db.session.get(Equipo, equipo_id).encendido_desde is not None
+        fila = db.session.scalars(db.select(UsoEquipoDia).filter_by(equipo_id=equipo_id)).one()
+        assert fila.encendidos == 1
+
+    red.conectar(equipo, '10.0.0.5', encendido=False)
+    assert client.get(f'/api/equipos/{equipo_id}/estado', headers=headers).status_code == 200
+    with app.app_context():
+        assert db.session.get(Equipo, equipo_id).encendido_desde is None
+
+
+def test_flush_agrupa_por_equipo_y_dia(app, datos):
+    equipo_id = datos.equipo()
+    inicio = datetime.datetime(2025, 3, 1, 23, 0)
+    with app.app_context():
+        equipo = db.session.get(Equipo, equipo_id)
+        usage_rollups.transition(equipo, 'apagado', 'encendido', inicio)
+        usage_rollups.transition(equipo, 'encendido', 'apagado', inicio + datetime.timedelta(hours=2))
+        usage_rollups.transition(equipo, 'apagado', 'encendido', inicio + datetime.timedelta(hours=3))
+        assert usage_rollups.flush() == 2
+        db.session.commit()
+
+        filas = {fila.dia.isoformat(): (fila.segundos_encendido, fila.encendidos)
+                 for fila in db.session.scalars(db.select(UsoEquipoDia).filter_by(equipo_id=equipo_id))}
+    assert filas == {'2025-03-01': (3600, 1), '2025-03-02': (3600, 1)}
+
+
+def test_desde_desconocido_no_cuenta_como_encendido(app, datos):
+    equipo_id = datos.equipo()
+    inicio = datetime.datetime(2025, 3, 1, 10, 0)
+    with app.app_context():
+        equipo = db.session.get(Equipo, equipo_id)
+        usage_rollups.transition(equipo, 'desconocido', 'encendido', inicio)
+        assert equipo.encendido_desde == inicio
+        usage_rollups.transition(equipo, 'encendido', 'apagado', inicio + datetime.timedelta(hours=1))
+        usage_rollups.flush()
+        db.session.commit()
+
+        fila = db.session.scalars(db.select(UsoEquipoDia).filter_by(equipo_id=equipo_id)).one()
+    assert (fila.segundos_encendido, fila.encendidos) == (3600, 0)
+
+
+def test_sin_flush_un_commit_ajeno_no_escribe_transiciones(app, datos):
+    equipo_id = datos.equipo()
+    with app.app_context():
+        equipo = db.session.get(Equipo, equipo_id)
+        usage_rollups.transition(equipo, 'apagado', 'encendido', datetime.datetime(2025, 3, 1))
+        db.session.commit()
+        assert db.session.scalars(db.select(UsoEquipoDia)).all() == []
@@ -22,6 +22,7 @@ export const useEquipoCard = (equipo: Equipo) => {
     switch (equipo.estado) {
       case 'encendido': return 'Encendido'
       case 'apagado': return 'Apagado'
+      case 'pendiente': return 'Verificando'
       default: return 'Desconocido'
     }
   })
@@ -1,5 +1,6 @@
 import { ref, computed } from 'vue'
 import { useApi } from './useApi'
+import { useConfig } from './useConfig'
 import type { Equipo, CreateEquipoData, UpdateEquipoData, ApiResponse } from '@/types'
 
 export function useEquipos() {
@@ -96,6 +97,83 @@ export function useEquipos() {
     }
   }
 
+  // Suscripción SSE a cambios de estado (evita recargar la lista completa).
+  // Cada stream ocupa un hilo del servidor: solo se mantiene abierto en la
+  // pestaña visible y, si el servidor no tiene cupo (503), se recarga la
+  // lista periódicamente mientras se reintenta el stream
+  function subscribeEstados(intervaloRespaldo = 30000): () => void {
+    const { apiConfig } = useConfig()
+    let source: EventSource | null = null
+    let respaldo: ReturnType<typeof setInterval> | null = null
+
+    function detenerRespaldo() {
+      if (respaldo) {
+        clearInterval(respaldo)
+        respaldo = null
+      }
+    }
+
+    function abrir() {
+      if (source || document.visibilityState !== 'visible') return
+      const token = localStorage.getItem('auth_token') || ''
+      const actual = new EventSource(
+        `${apiConfig.value.baseURL}/equipos/stream?token=${encodeURIComponent(token)}`
+      )
+      source = actual
+
+      actual.addEventListener('open', detenerRespaldo)
+
+      actual.addEventListener('estado', (event) => {
+        const cambio = JSON.parse((event as MessageEvent).data) as Partial<Equipo> & { id: number }
+        const index = equipos.value.findIndex(eq => eq.id === cambio.id)
+        if (index !== -1) {
+          equipos.value[index] = { ...equipos.value[index], ...cambio }
+        }
+      })
+
+      // El buffer del servidor ya no cubre lo perdido: recargar una vez
+      actual.addEventListener('reset', () => {
+        fetchEquipos().catch(() => {})
+      })
+
+      // EventSource no reintenta tras una respuesta distinta de 200 (p. ej. 503 sin cupo)
+      actual.addEventListener('error', () => {
+        if (actual.readyState !== EventSource.CLOSED) return
+        if (source === actual) source = null
+        if (!respaldo) {
+          respaldo = setInterval(() => {
+            fetchEquipos().catch(() => {})
+            abrir()
+          }, intervaloRespaldo)
+        }
+      })
+    }
+
+    function cerrar() {
+      source?.close()
+      source = null
+      detenerRespaldo()
+    }
+
+    // Una pestaña oculta libera su stream; al volver recarga lo que se perdió
+    function cambioVisibilidad() {
+      if (document.visibilityState === 'visible') {
+        fetchEquipos().catch(() => {})
+        abrir()
+      } else {
+        cerrar()
+      }
+    }
+
+    document.addEventListener('visibilitychange', cambioVisibilidad)
+    abrir()
+
+    return () => {
+      document.removeEventListener('visibilitychange', cambioVisibilidad)
+      cerrar()
+    }
+  }
+
   // Función para formatear MAC address
   function formatMacAddress(value: string): string {
     const cleaned = value.replace(/[^a-fA-F0-9]/g, '').toUpperCase()
@@ -120,6 +198,7 @@ export function useEquipos() {
     deleteEquipo,
     wakeEquipo,
     getEquipoStatus,
+    subscribeEstados,
     formatMacAddress,
     validateMacAddress
   }
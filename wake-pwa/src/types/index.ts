@@ -11,7 +11,8 @@ export interface Equipo {
   descripcion?: string
   mac_address: string
   ip_address?: string
-  estado: 'encendido' | 'apagado' | 'desconocido'
+  estado: 'encendido' | 'apagado' | 'desconocido' | 'pendiente'
+  rtt_ms?: number | null
 }
 
 export interface LoginCredentials {